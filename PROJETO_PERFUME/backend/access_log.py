@@ -0,0 +1,155 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+
+class AccessLog:
+    """Log de acesso em JSON lines, gravado em lote por uma thread própria.
+
+    `record` só anexa uma tupla a uma fila em memória; se a fila estiver
+    cheia o registro é descartado (e contado), nunca segurando a
+    requisição. A thread junta os registros a cada `flush_interval`
+    segundos e grava tudo com uma única escrita. O arquivo roda quando
+    passa de `max_bytes` ou a cada `rotate_interval` segundos, mantendo
+    `backups` cópias (.1 é a mais recente). `path` "-" escreve no stdout.
+    """
+
+    def __init__(self, path='-', max_bytes=50 * 1024 * 1024, rotate_interval=0, backups=5,
+                 queue_size=10000, flush_interval=0.5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._writer_pid = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._opened_at = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rotations = 0
+
+    def record(self, client, method, path, status, bytes_sent, seconds, route):
+        """Enfileira um registro (descarta se a fila está cheia)"""
+        if self._writer_pid != os.getpid():
+            self._ensure_writer()
+        if len(self._pending) >= self.queue_size:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), client, method, path, status, bytes_sent, seconds, route))
+
+    def _ensure_writer(self):
+        """Thread de gravação, uma por processo (recriada após fork)"""
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._pending = deque()
+            self._file = None
+            thread = threading.Thread(target=self._write_loop, name="access-log", daemon=True)
+            thread.start()
+            self._writer_pid = os.getpid()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Erro ao gravar o log de acesso: {e}", file=sys.stderr)
+
+    @staticmethod
+    def format(entry):
+        ts, client, method, path, status, bytes_sent, seconds, route = entry
+        return json.dumps({
+            'ts': datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec='milliseconds'),
+            'client': client,
+            'method': method,
+            'path': path,
+            'status': status,
+            'bytes': bytes_sent,
+            'duration_ms': round(seconds * 1000, 3),
+            'route': route
+        }, ensure_ascii=False)
+
+    def flush(self):
+        """Grava de uma vez os registros pendentes; devolve quantos"""
+        pending = self._pending
+        batch = []
+        while pending:
+            try:
+                batch.append(pending.popleft())
+            except IndexError:
+                break
+        if not batch:
+            return 0
+
+        data = ''.join(self.format(entry) + '\n' for entry in batch).encode('utf-8')
+        if self.path == '-':
+            sys.stdout.buffer.write(data)
+            sys.stdout.flush()
+        else:
+            self._open_for_write(len(data)).write(data)
+        self.written += len(batch)
+        self.flushes += 1
+        return len(batch)
+
+    def _open_for_write(self, incoming):
+        """Arquivo atual, rodando antes se o tamanho ou a idade passaram do limite"""
+        if self._file is not None:
+            try:
+                current = os.stat(self.path)
+            except FileNotFoundError:
+                current = None
+            # outro processo (modo PROCESSES) já rodou o arquivo: reabre
+            if current is None or current.st_ino != os.fstat(self._file.fileno()).st_ino:
+                self._file.close()
+                self._file = None
+
+        if self._file is not None:
+            too_big = self.max_bytes and current.st_size + incoming > self.max_bytes
+            too_old = self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval
+            if too_big or too_old:
+                self._file.close()
+                self._file = None
+                self.rotate()
+
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # O_APPEND: escritas de vários processos não se sobrepõem; sem buffer: um write por lote
+            self._file = open(self.path, 'ab', buffering=0)
+            self._opened_at = time.time()
+        return self._file
+
+    def rotate(self):
+        """access.log -> access.log.1 -> ... -> access.log.<backups>"""
+        if self.backups <= 0:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        else:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            if os.path.exists(self.path):
+                os.replace(self.path, f"{self.path}.1")
+        self.rotations += 1
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'pending': len(self._pending),
+            'queue_size': self.queue_size,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'rotations': self.rotations
+        }
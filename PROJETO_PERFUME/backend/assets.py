@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+from urllib.parse import quote, unquote, urlsplit
+
+
+MANIFEST_NAME = 'asset-manifest.json'
+DIST_DIR = 'dist'
+
+# src="..." / href="..." e url(...) em estilos inline
+REFERENCE_PATTERN = re.compile(
+    r'''(?P<prefix>\b(?:src|href)\s*=\s*["'])(?P<url>[^"']+)(?P<suffix>["'])'''
+    r'''|(?P<css_prefix>url\(\s*["']?)(?P<css_url>[^"')]+)(?P<css_suffix>["']?\s*\))''',
+    re.IGNORECASE
+)
+
+
+def file_digest(file_path, chunk_size=64 * 1024):
+    """SHA-256 do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprinted_name(url_path, digest, length=10):
+    """/Styles/a/foto.png -> /Styles/a/foto.<hash>.png"""
+    base, ext = posixpath.splitext(url_path)
+    return f"{base}.{digest[:length]}{ext}"
+
+
+class AssetFingerprinter:
+    """Gera o manifesto de assets com hash de conteúdo e reescreve as páginas HTML.
+
+    As páginas originais não são alteradas: as versões reescritas e o
+    manifesto vão para o diretório de saída (dist/ por padrão), de onde o
+    servidor passa a servir o HTML.
+    """
+    asset_dirs = ('Styles', 'static')
+    # CSS/JS soltos na raiz (styles.css, compra.css...) também são versionados
+    root_suffixes = ('.css', '.js')
+
+    def __init__(self, root, output_dir=DIST_DIR):
+        self.root = os.path.abspath(root)
+        self.output_dir = os.path.join(self.root, output_dir)
+        self.manifest = {}
+
+    def iter_assets(self):
+        """Arquivos versionáveis: tudo em Styles/ e static/, mais CSS/JS da raiz"""
+        for entry in sorted(os.listdir(self.root)):
+            file_path = os.path.join(self.root, entry)
+            if os.path.isfile(file_path) and entry.endswith(self.root_suffixes):
+                yield '/' + entry, file_path
+
+        for asset_dir in self.asset_dirs:
+            for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, asset_dir)):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+                for filename in sorted(filenames):
+                    if filename.startswith('.'):
+                        continue
+                    file_path = os.path.join(dirpath, filename)
+                    relative = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+                    yield '/' + relative, file_path
+
+    def build_manifest(self):
+        """Calcula o hash de cada asset; manifesto: URL original -> {url, sha256}"""
+        manifest = {}
+        for url_path, file_path in self.iter_assets():
+            digest = file_digest(file_path)
+            manifest[url_path] = {
+                'url': fingerprinted_name(url_path, digest),
+                'sha256': digest
+            }
+        self.manifest = manifest
+        return manifest
+
+    def rewrite_reference(self, reference, page_dir='/'):
+        """Troca uma referência por sua URL versionada (ou devolve a original)"""
+        parts = urlsplit(reference)
+        if parts.scheme or parts.netloc or not parts.path or reference.startswith('#'):
+            return reference
+
+        path = unquote(parts.path)
+        if not path.startswith('/'):
+            path = posixpath.join(page_dir, path)
+        path = posixpath.normpath(path)
+
+        entry = self.manifest.get(path)
+        if entry is None:
+            return reference
+
+        new_reference = quote(entry['url'], safe='/')
+        if parts.query:
+            new_reference += '?' + parts.query
+        if parts.fragment:
+            new_reference += '#' + parts.fragment
+        return new_reference
+
+    def rewrite_html(self, html):
+        """Reescreve src/href/url() de uma página da raiz do site"""
+        def replace(match):
+            if match.group('url') is not None:
+                url = self.rewrite_reference(match.group('url'))
+                return match.group('prefix') + url + match.group('suffix')
+            url = self.rewrite_reference(match.group('css_url').strip())
+            return match.group('css_prefix') + url + match.group('css_suffix')
+
+        return REFERENCE_PATTERN.sub(replace, html)
+
+    def build(self):
+        """Gera manifesto e páginas reescritas; retorna (assets, páginas)"""
+        self.build_manifest()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        pages = 0
+        for entry in sorted(os.listdir(self.root)):
+            if not entry.endswith('.html'):
+                continue
+            with open(os.path.join(self.root, entry), 'r', encoding='utf-8') as f:
+                html = f.read()
+            with open(os.path.join(self.output_dir, entry), 'w', encoding='utf-8') as f:
+                f.write(self.rewrite_html(html))
+            pages += 1
+
+        manifest_path = os.path.join(self.output_dir, MANIFEST_NAME)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+        return len(self.manifest), pages
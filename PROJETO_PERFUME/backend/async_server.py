@@ -0,0 +1,568 @@
+import asyncio
+import io
+import os
+import time
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+from urllib.parse import urlparse, parse_qs
+from backend import responses
+from backend.auth import AuthValidator
+from backend.request_body import BodyDecoder, BodyRejected
+from backend.server import BelleHTTPRequestHandler
+from backend.utils import HTTPUtils, FileUtils, ResponseBuilder
+
+
+class AsyncRequest:
+    """Requisição HTTP já lida do socket"""
+    __slots__ = ('method', 'path', 'version', 'headers', 'body', 'rejection', 'client')
+
+    def __init__(self, method, path, version, headers, body, rejection=None):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+        # BodyRejected quando o corpo foi recusado antes/durante a leitura
+        self.rejection = rejection
+        # IP do cliente (preenchido por handle_connection)
+        self.client = '-'
+
+
+class StaticBody:
+    """Corpo de resposta estática: partes vindas da memória ou do arquivo"""
+    __slots__ = ('parts', 'content', 'file_obj', 'length')
+
+    def __init__(self, parts, content, file_obj, length):
+        self.parts = parts
+        self.content = content
+        self.file_obj = file_obj
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    async def send(self, writer):
+        """Escreve as partes; trechos do arquivo vão por loop.sendfile"""
+        loop = asyncio.get_running_loop()
+        view = memoryview(self.content) if self.content is not None else None
+        for part in self.parts:
+            if isinstance(part, bytes):
+                writer.write(part)
+                continue
+
+            offset, count = part
+            if view is not None:
+                writer.write(view[offset:offset + count])
+            else:
+                await writer.drain()
+                await loop.sendfile(writer.transport, self.file_obj, offset, count, fallback=True)
+        await writer.drain()
+
+    def close(self):
+        if self.file_obj is not None:
+            self.file_obj.close()
+
+
+class AsyncBelleServer:
+    """Servidor HTTP em asyncio com as mesmas rotas do BelleHTTPRequestHandler.
+
+    Conexões ociosas custam apenas uma corrotina; trabalho bloqueante
+    (SQLite, hash de senha, leitura de arquivos) roda no executor.
+    """
+    max_header_size = 65536
+    json_gzip_min_size = 1024
+
+    def __init__(self, port=8000, executor_workers=8, backlog=128, idle_timeout=15,
+                 max_requests=100):
+        self.port = port
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        # Mesmo banco, sessões e contadores do handler clássico
+        self.db = BelleHTTPRequestHandler.db
+        self.session_manager = BelleHTTPRequestHandler.session_manager
+        self.token_manager = BelleHTTPRequestHandler.token_manager
+        self.connection_stats = BelleHTTPRequestHandler.connection_stats
+        self.static_cache = BelleHTTPRequestHandler.static_cache
+        self.body_policy = BelleHTTPRequestHandler.body_policy
+        self.metrics = BelleHTTPRequestHandler.metrics
+        self.access_log = BelleHTTPRequestHandler.access_log
+        self.catalog = BelleHTTPRequestHandler.catalog
+        self.search = BelleHTTPRequestHandler.search
+        self.carts = BelleHTTPRequestHandler.carts
+        self.checkout = BelleHTTPRequestHandler.checkout
+        self.rate_limiter = BelleHTTPRequestHandler.rate_limiter
+        self.executor = ThreadPoolExecutor(
+            max_workers=executor_workers,
+            thread_name_prefix='belle-async'
+        )
+
+    async def run_blocking(self, func, *args):
+        """Executa função bloqueante no executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def serve_forever(self, sock=None, reuse_port=False):
+        """Abre o socket (ou usa um herdado) e atende conexões até ser cancelado"""
+        if sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(
+                self.handle_connection,
+                host='',
+                port=self.port,
+                backlog=self.backlog,
+                reuse_address=True,
+                reuse_port=reuse_port or None
+            )
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Atende uma conexão, com keep-alive"""
+        peer = writer.get_extra_info('peername')
+        served = 0
+        self.connection_stats.connection_opened()
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                request.client = peer[0] if peer else '-'
+
+                route = self.metrics.route_label(urlparse(request.path).path)
+                self.metrics.request_started(route)
+                start = time.perf_counter()
+                status, bytes_sent = 500, 0
+                try:
+                    if request.rejection is not None:
+                        status, headers, body = self.json_response(
+                            ResponseBuilder.error(request.rejection.message), request.rejection.status)
+                    else:
+                        status, headers, body = await self.dispatch(request)
+                    served += 1
+                    hit_limit = served >= self.max_requests
+                    keep_alive = (self.should_keep_alive(request) and not hit_limit
+                                  and request.rejection is None)
+                    self.connection_stats.request_served(served > 1, hit_limit)
+                    try:
+                        bytes_sent = await self.write_response(writer, request, status, headers, body, keep_alive)
+                    finally:
+                        if isinstance(body, StaticBody):
+                            body.close()
+                finally:
+                    elapsed = time.perf_counter() - start
+                    self.metrics.request_finished(route, request.method, status, elapsed, bytes_sent)
+                    if self.access_log is not None:
+                        self.access_log.record(request.client, request.method, request.path,
+                                               status, bytes_sent, elapsed, route)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self.connection_stats.connection_closed()
+            writer.close()
+
+    async def read_request(self, reader):
+        """Lê linha de requisição, cabeçalhos e corpo; None encerra a conexão"""
+        try:
+            head = await asyncio.wait_for(
+                reader.readuntil(b'\r\n\r\n'),
+                timeout=self.idle_timeout
+            )
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+
+        if len(head) > self.max_header_size:
+            return None
+
+        request_line, _, raw_headers = head.partition(b'\r\n')
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            return None
+        method, path, version = parts
+
+        headers = http.client.parse_headers(io.BytesIO(raw_headers))
+
+        try:
+            # só POST tem o tipo conferido; nos demais métodos vale o limite de tamanho
+            length = self.body_policy.check(urlparse(path).path, headers, check_type=method == 'POST')
+            body = await asyncio.wait_for(self.read_body(reader, length), timeout=self.body_policy.timeout)
+        except asyncio.TimeoutError:
+            rejection = self.body_policy.rejection(408, "Tempo esgotado ao receber o corpo")
+            return AsyncRequest(method, path, version, headers, b'', rejection)
+        except BodyRejected as e:
+            return AsyncRequest(method, path, version, headers, b'', e)
+
+        return AsyncRequest(method, path, version, headers, body)
+
+    async def read_body(self, reader, length):
+        """Lê o corpo em pedaços, decodificando em UTF-8 à medida que chega"""
+        if not length:
+            return ''
+        decoder = BodyDecoder(self.body_policy)
+        remaining = length
+        while remaining:
+            chunk = await reader.read(min(remaining, self.body_policy.chunk_size))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b'', remaining)
+            decoder.feed(chunk)
+            remaining -= len(chunk)
+        return decoder.finish()
+
+    def should_keep_alive(self, request):
+        """Decide se a conexão continua aberta após a resposta"""
+        connection = request.headers.get('Connection', '').lower()
+        if request.version == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+    async def write_response(self, writer, request, status, headers, body, keep_alive):
+        """Escreve status, cabeçalhos e corpo (bytes ou StaticBody); devolve os bytes enviados"""
+        precompressed = any(header == 'Content-Encoding' for header, _ in headers)
+        if not isinstance(body, StaticBody) and not precompressed and ('Content-Type', 'application/json') in headers:
+            body, compressed = HTTPUtils.compress_response_body(
+                body, request.headers.get('Accept-Encoding'), self.json_gzip_min_size
+            )
+            if compressed:
+                headers = headers + [('Content-Encoding', 'gzip'), ('Vary', 'Accept-Encoding')]
+
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines.append(f"Date: {formatdate(usegmt=True)}")
+        for header, value in headers:
+            lines.append(f"{header}: {value}")
+        if status != 304:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+        if request.method == 'HEAD':
+            writer.write(head)
+            body = b''
+        elif isinstance(body, StaticBody):
+            writer.write(head)
+            await body.send(writer)
+            return len(head) + len(body)
+        else:
+            writer.write(head + body)
+        await writer.drain()
+        return len(head) + len(body)
+
+    async def dispatch(self, request):
+        """Roteia a requisição e retorna (status, cabeçalhos, corpo)"""
+        path = urlparse(request.path).path
+
+        if request.method in ('GET', 'HEAD'):
+            if path.startswith('/api/'):
+                return await self.handle_api_get(request, path)
+            return await self.serve_static_file(request, path)
+
+        if request.method == 'POST':
+            if path.startswith('/api/'):
+                return await self.handle_api_post(request, path)
+            return self.error_response(404, "Not Found")
+
+        if request.method == 'OPTIONS':
+            return 200, [
+                ('Access-Control-Allow-Origin', '*'),
+                ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
+                ('Access-Control-Allow-Headers', 'Content-Type, Authorization, Idempotency-Key'),
+            ], b''
+
+        return self.error_response(501, "Unsupported method")
+
+    async def handle_api_get(self, request, path):
+        """Rotas GET da API"""
+        if path == '/api/profile':
+            return await self.get_profile(request)
+        elif path == '/api/check-auth':
+            return await self.check_auth(request)
+        elif path == '/api/metrics':
+            body = self.metrics.render().encode('utf-8')
+            return 200, [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')], body
+        elif path == '/api/products' or path.startswith('/api/products/'):
+            return self.get_products(request, path)
+        elif path in ('/api/search', '/api/suggest'):
+            return await self.get_search(request, path)
+        elif path == '/api/cart':
+            return await self.with_user(request, self.carts.get)
+        elif path.startswith('/api/orders/'):
+            return await self.with_user(request, self.checkout.order_action, 'GET', path)
+        elif path == '/api/server-stats':
+            if self.session_manager.blocking:
+                sessions = await self.run_blocking(self.session_manager.stats)
+            else:
+                sessions = self.session_manager.stats()
+            return self.json_response(ResponseBuilder.success(data={
+                'connections': self.connection_stats.snapshot(),
+                'static_cache': self.static_cache.stats(),
+                'database': self.db.pool.stats(),
+                'password_hashing': self.db.hash_pool.stats(),
+                'sessions': sessions,
+                'profile_cache': self.db.profile_cache.stats(),
+                'tokens': self.token_manager.stats() if self.token_manager else None,
+                'request_body': self.body_policy.stats(),
+                'latency': self.metrics.snapshot(),
+                'access_log': self.access_log.stats() if self.access_log else None,
+                'catalog': self.catalog.stats(),
+                'search': self.search.stats(),
+                'cart': self.carts.stats(),
+                'checkout': self.checkout.stats(),
+                'rate_limit': self.rate_limiter.stats() if self.rate_limiter else None
+            }))
+        return self.json_response(responses.ENDPOINT_NOT_FOUND, 404)
+
+    async def handle_api_post(self, request, path):
+        """Rotas POST da API"""
+        content_type = request.headers.get('Content-Type', '')
+        data = HTTPUtils.parse_post_data(content_type, request.body)
+
+        limited = self.rate_limiter.check(path, request.client, data) if self.rate_limiter else None
+        if limited is not None:
+            return self.busy_response(limited, 429)
+
+        if path == '/api/register':
+            return await self.register_user(data)
+        elif path == '/api/login':
+            return await self.login_user(data)
+        elif path == '/api/logout':
+            return await self.logout_user(request)
+        elif path == '/api/cart':
+            return await self.with_user(request, self.carts.apply, data)
+        elif path == '/api/checkout':
+            key = request.headers.get('Idempotency-Key') or (
+                data.get('idempotency_key') if isinstance(data, dict) else None)
+            return await self.with_user(request, self.checkout.checkout, key)
+        elif path.startswith('/api/orders/'):
+            return await self.with_user(request, self.checkout.order_action, 'POST', path)
+        return self.json_response(responses.ENDPOINT_NOT_FOUND, 404)
+
+    async def register_user(self, data):
+        """Registra novo usuário"""
+        validation = AuthValidator.validate_registration_data(data)
+        if not validation['valid']:
+            return self.json_response(ResponseBuilder.validation_error(validation['errors']), 400)
+
+        result = await self.run_blocking(
+            lambda: self.db.create_user(
+                nome=data['nome'].strip(),
+                sobrenome=data['sobrenome'].strip(),
+                cpf=data['cpf'].strip(),
+                telefone=data['telefone'].strip(),
+                data_nascimento=data['data_nascimento'],
+                email=data['email'].strip().lower(),
+                senha=data['senha']
+            )
+        )
+
+        if result['success']:
+            return self.json_response(ResponseBuilder.success(message="Cadastro realizado com sucesso!"))
+        if 'retry_after' in result:
+            return self.busy_response(result)
+        return self.json_response(ResponseBuilder.error(result['error']), 400)
+
+    async def login_user(self, data):
+        """Autentica usuário"""
+        validation = AuthValidator.validate_login_data(data)
+        if not validation['valid']:
+            return self.json_response(ResponseBuilder.validation_error(validation['errors']), 400)
+
+        result = await self.run_blocking(
+            self.db.authenticate_user, data['login'].strip(), data['senha']
+        )
+
+        if 'retry_after' in result:
+            return self.busy_response(result)
+        if not result['success']:
+            return self.json_response(ResponseBuilder.error(result['error']), 401)
+
+        response = ResponseBuilder.success(
+            data=result['user'],
+            message="Login realizado com sucesso!"
+        )
+        if self.token_manager is not None:
+            # Modo token: cookie assinado, nada guardado no servidor
+            token = self.token_manager.issue(result['user'])
+            return self.json_response(response, cookie=HTTPUtils.create_cookie(
+                self.token_manager.cookie_name, token, max_age=self.token_manager.ttl))
+
+        # sessões em SQLite gravam no banco: fora do event loop
+        with self.metrics.timer('session'):
+            session_id = await self.run_blocking(
+                self.session_manager.create_session, result['user']['id'], result['user']
+            )
+        return self.json_response(response, cookie=HTTPUtils.create_cookie(
+            'session_id', session_id, max_age=self.session_manager.session_timeout))
+
+    async def logout_user(self, request):
+        """Faz logout do usuário"""
+        response = responses.LOGOUT_OK
+
+        if self.token_manager is not None:
+            token = self.get_cookie(request, self.token_manager.cookie_name)
+            if token:
+                await self.run_blocking(self.token_manager.revoke, token)
+            return self.json_response(response, cookie=HTTPUtils.create_cookie(
+                self.token_manager.cookie_name, '', max_age=0))
+
+        session_id = self.get_session_id(request)
+        if session_id:
+            with self.metrics.timer('session'):
+                await self.run_blocking(self.session_manager.destroy_session, session_id)
+
+        return self.json_response(response, cookie=HTTPUtils.create_cookie('session_id', '', max_age=0))
+
+    async def get_profile(self, request):
+        """Retorna dados do perfil do usuário"""
+        credential = self.get_auth_cookie(request)
+        if not credential:
+            return self.json_response(responses.NOT_AUTHENTICATED, 401)
+
+        user_data = await self.get_authenticated_user(credential)
+        if not user_data:
+            return self.json_response(responses.INVALID_SESSION, 401)
+
+        result = await self.run_blocking(self.db.get_user_by_id, user_data['id'])
+        if result['success']:
+            return self.json_response(ResponseBuilder.success(data=result['user']))
+        return self.json_response(ResponseBuilder.error(result['error']), 404)
+
+    async def check_auth(self, request):
+        """Verifica se usuário está autenticado (no modo token, só pelo cookie)"""
+        user_data = await self.get_authenticated_user(self.get_auth_cookie(request))
+
+        if user_data:
+            return self.json_response(ResponseBuilder.success(data={
+                'authenticated': True,
+                'user': user_data
+            }))
+        return self.json_response(responses.ANONYMOUS)
+
+    def get_products(self, request, path):
+        """Catálogo: listagem paginada ou detalhe, com ETag (304 se nada mudou)"""
+        response = self.catalog.respond(path, parse_qs(urlparse(request.path).query), request.headers)
+        if response.status == 304:
+            return 304, response.headers, b''
+        headers = list(response.headers)
+        if response.compressed:
+            headers += [('Content-Encoding', 'gzip'), ('Vary', 'Accept-Encoding')]
+        return self.json_response(response.body, response.status, extra_headers=headers)
+
+    async def get_search(self, request, path):
+        """Busca por relevância (/api/search) ou sugestões enquanto se digita (/api/suggest)"""
+        status, result = await self.run_blocking(
+            self.search.respond, path, parse_qs(urlparse(request.path).query)
+        )
+        return self.json_response(result, status)
+
+    async def with_user(self, request, func, *args):
+        """Carrinho/pedidos: func(user_id, *args) fora do event loop, só para usuário autenticado"""
+        credential = self.get_auth_cookie(request)
+        user_data = await self.get_authenticated_user(credential)
+        if not user_data:
+            return self.json_response(responses.INVALID_SESSION if credential else responses.NOT_AUTHENTICATED, 401)
+        status, result = await self.run_blocking(func, user_data['id'], *args)
+        if status == 503:
+            return self.busy_response(result)
+        return self.json_response(result, status)
+
+    async def serve_static_file(self, request, path):
+        """Serve arquivos estáticos: pequenos da memória, grandes por sendfile"""
+        if path == '/':
+            path = '/index.html'
+
+        start = time.perf_counter()
+        asset, immutable = self.static_cache.resolve(path)
+        if asset is None:
+            return self.error_response(404, "File Not Found")
+
+        content = None
+        file_obj = None
+        if self.static_cache.is_cacheable(asset):
+            content = self.static_cache.get_cached(asset)
+            if content is None:
+                content = await self.run_blocking(self.static_cache.get_content, asset)
+            if content is None:
+                return self.error_response(500, "Internal Server Error")
+        else:
+            file_obj = FileUtils.open_file(asset.file_path)
+            if file_obj is None:
+                return self.error_response(404, "File Not Found")
+            if os.fstat(file_obj.fileno()).st_size != asset.size:
+                asset = self.static_cache.refresh(asset) or asset
+        self.metrics.observe_operation('static', time.perf_counter() - start)
+
+        status, headers, parts, body = self.static_cache.plan_response(
+            asset, request.headers, content, immutable
+        )
+        return status, headers, StaticBody(parts, body, file_obj, self.static_cache.body_length(parts))
+
+    def get_cookie(self, request, name):
+        """Valor de um cookie da requisição"""
+        cookie_header = request.headers.get('Cookie')
+        if cookie_header:
+            return HTTPUtils.parse_cookies(cookie_header).get(name)
+        return None
+
+    def get_session_id(self, request):
+        """Extrai session_id dos cookies"""
+        return self.get_cookie(request, 'session_id')
+
+    def get_auth_cookie(self, request):
+        """Credencial do modo atual: token assinado ou session_id"""
+        if self.token_manager is not None:
+            return self.get_cookie(request, self.token_manager.cookie_name)
+        return self.get_session_id(request)
+
+    async def get_authenticated_user(self, credential):
+        """Dados do usuário para a credencial, ou None se inválida"""
+        if not credential:
+            return None
+        with self.metrics.timer('session'):
+            if self.token_manager is not None:
+                return self.token_manager.get_user_data(credential)
+            if self.session_manager.blocking:
+                # SQLite: a leitura (e a falta no cache) não pode parar o event loop
+                return await self.run_blocking(self.session_manager.get_user_data, credential)
+            return self.session_manager.get_user_data(credential)
+
+    def json_response(self, data, status_code=200, cookie=None, extra_headers=()):
+        """Monta resposta JSON com os mesmos cabeçalhos do handler clássico (`data` pode vir em bytes)"""
+        body = data if isinstance(data, bytes) else responses.encode_json(data)
+        headers = list(responses.JSON_HEADERS)
+        headers.extend(extra_headers)
+        if cookie:
+            headers.append(('Set-Cookie', cookie))
+        return status_code, headers, body
+
+    def busy_response(self, result, status_code=503):
+        """Retry-After: 503 com o servidor saturado, 429 com o cliente acima do limite"""
+        return self.json_response(ResponseBuilder.error(result['error']), status_code,
+                                  extra_headers=[('Retry-After', str(result['retry_after']))])
+
+    def error_response(self, status_code, message):
+        """Resposta de erro em texto simples"""
+        body = f"{status_code} {message}".encode('utf-8')
+        return status_code, [('Content-Type', 'text/plain; charset=utf-8')], body
+
+
+def start_async_server(port=8000, workers=8, backlog=128, sock=None, reuse_port=False,
+                       keepalive_timeout=15, max_requests=100):
+    """Inicia o servidor assíncrono"""
+    server = AsyncBelleServer(port, executor_workers=workers, backlog=backlog,
+                              idle_timeout=keepalive_timeout, max_requests=max_requests)
+
+    print(f"Servidor Belle Parfum (asyncio) iniciado em http://localhost:{port}")
+    print(f"Executor com {workers} threads para SQLite e arquivos")
+    print("Pressione Ctrl+C para parar o servidor")
+
+    try:
+        asyncio.run(server.serve_forever(sock, reuse_port))
+    except KeyboardInterrupt:
+        print("\nServidor parado pelo usuário")
+    finally:
+        server.executor.shutdown(wait=False)
@@ -1,7 +1,16 @@
 import re
 from datetime import datetime
+from operator import mul
+
+# Pesos dos dígitos verificadores do CPF
+CPF_WEIGHTS_1 = tuple(range(10, 1, -1))
+CPF_WEIGHTS_2 = tuple(range(11, 1, -1))
 
 class AuthValidator:
+    email_pattern = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    name_pattern = re.compile(r'^[a-zA-ZÀ-ÿ\s]+$')
+    non_digits = re.compile(r'[^0-9]')
+    
     @staticmethod
     def validate_email(email):
         """Valida formato do email"""
@@ -37,6 +46,16 @@ class AuthValidator:
         
         return int(cpf[10]) == digito2
     
+    @staticmethod
+    def normalize_cpf(cpf):
+        """CPF só com dígitos (forma gravada no banco)"""
+        return AuthValidator.non_digits.sub('', cpf)
+    
+    @staticmethod
+    def normalize_email(email):
+        """Email sem espaços e em minúsculas (forma gravada no banco)"""
+        return email.strip().lower()
+    
     @staticmethod
     def validate_phone(phone):
         """Valida telefone brasileiro"""
@@ -124,4 +143,86 @@ class AuthValidator:
             "valid": len(errors) == 0,
             "errors": errors
         }
-
+    
+    @classmethod
+    def classify_login(cls, login):
+        """Identifica o login: ('email', email normalizado), ('cpf', dígitos) ou (None, None).
+        
+        Só decide a coluna da busca; o formato já foi validado em validate_login_data.
+        """
+        if '@' in login:
+            return 'email', cls.normalize_email(login)
+        cpf = cls.normalize_cpf(login)
+        if len(cpf) == 11:
+            return 'cpf', cpf
+        return None, None
+    
+    @classmethod
+    def validate_cpfs(cls, cpfs):
+        """Valida uma coluna de CPFs de uma vez.
+        
+        As somas ponderadas dos dígitos verificadores saem de map(mul, ...)
+        sobre os bytes ASCII, sem laço Python por dígito; o resultado é o
+        mesmo de validate_cpf para cada item.
+        """
+        offset_1 = 48 * sum(CPF_WEIGHTS_1)
+        offset_2 = 48 * sum(CPF_WEIGHTS_2)
+        results = []
+        for cpf in cpfs:
+            digits = cls.non_digits.sub('', cpf or '').encode('ascii')
+            if len(digits) != 11 or digits == digits[:1] * 11:
+                results.append(False)
+                continue
+            check_1 = (sum(map(mul, CPF_WEIGHTS_1, digits)) - offset_1) * 10 % 11 % 10
+            check_2 = (sum(map(mul, CPF_WEIGHTS_2, digits)) - offset_2) * 10 % 11 % 10
+            results.append(digits[9] - 48 == check_1 and digits[10] - 48 == check_2)
+        return results
+    
+    @classmethod
+    def validate_registration_batch(cls, rows, check_passwords=True):
+        """validate_registration_data para uma lista de cadastros.
+        
+        Mesmas regras e mensagens, com os padrões compilados uma vez, a data
+        de hoje calculada uma vez, datas repetidas validadas uma vez e os
+        CPFs checados em coluna. check_passwords=False pula senha e
+        confirmação (importação de hashes já prontos).
+        """
+        cpf_ok = cls.validate_cpfs([row.get('cpf') for row in rows])
+        today = datetime.now()
+        dates = {}
+        
+        def valid_date(value):
+            if value not in dates:
+                try:
+                    born = datetime.strptime(value, '%Y-%m-%d')
+                    age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+                    dates[value] = age >= 13
+                except (TypeError, ValueError):
+                    dates[value] = False
+            return dates[value]
+        
+        def valid_name(value):
+            return bool(value) and len(value.strip()) >= 2 and cls.name_pattern.match(value.strip())
+        
+        results = []
+        for row, cpf_valid in zip(rows, cpf_ok):
+            errors = []
+            if not valid_name(row.get('nome')):
+                errors.append("Nome deve ter pelo menos 2 caracteres e conter apenas letras")
+            if not valid_name(row.get('sobrenome')):
+                errors.append("Sobrenome deve ter pelo menos 2 caracteres e conter apenas letras")
+            if not cpf_valid:
+                errors.append("CPF inválido")
+            if not row.get('telefone') or not cls.validate_phone(row['telefone']):
+                errors.append("Telefone deve ter 10 ou 11 dígitos")
+            if not row.get('data_nascimento') or not valid_date(row['data_nascimento']):
+                errors.append("Data de nascimento inválida ou idade menor que 13 anos")
+            if not row.get('email') or not cls.email_pattern.match(row['email']):
+                errors.append("Email inválido")
+            if check_passwords:
+                if not row.get('senha') or not cls.validate_password(row['senha']):
+                    errors.append("Senha deve ter pelo menos 6 caracteres")
+                if row.get('senha') != row.get('confirmar_senha'):
+                    errors.append("Senhas não coincidem")
+            results.append({"valid": not errors, "errors": errors})
+        return results
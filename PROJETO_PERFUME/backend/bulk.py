@@ -0,0 +1,314 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.auth import AuthValidator
+
+# Colunas de cadastro lidas na importação e gravadas na exportação
+USER_COLUMNS = ('nome', 'sobrenome', 'cpf', 'telefone', 'data_nascimento', 'email')
+
+# Raiz do site (diretório PROJETO_PERFUME) e onde ficam relatórios e exportações:
+# têm CPF, email e hashes de senha, então nunca vão para o que o servidor publica
+SITE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPORT_DIR = os.path.join(SITE_ROOT, 'exports')
+
+
+def _inside(path, root):
+    return os.path.commonpath([path, root]) == root
+
+
+def output_path(path):
+    """Caminho de saída: nome sem diretório vai para exports/; dentro do site, só em exports/"""
+    if not os.path.dirname(path):
+        path = os.path.join(EXPORT_DIR, path)
+    real = os.path.realpath(path)
+    export_dir = os.path.realpath(EXPORT_DIR)
+    if _inside(real, os.path.realpath(SITE_ROOT)) and not _inside(real, export_dir):
+        raise ValueError(f"{path} fica dentro do site; grave em exports/ ou fora de {SITE_ROOT}")
+    if _inside(real, export_dir):
+        os.makedirs(export_dir, exist_ok=True)
+    return path
+
+
+def detect_format(path, fmt=None):
+    """'csv' ou 'jsonl', pelo argumento ou pela extensão do arquivo"""
+    if fmt:
+        return fmt
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_records(stream, fmt):
+    """Gera (linha, registro) do CSV (com cabeçalho) ou JSON lines.
+
+    Linhas de JSON inválido viram (linha, None) para entrar no relatório.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_no, record if isinstance(record, dict) else None
+
+
+def source_fingerprint(path):
+    """Identifica o arquivo para a retomada: nome + SHA-256 do primeiro MB"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read(1024 * 1024))
+    return f"{os.path.basename(path)}:{digest.hexdigest()[:16]}"
+
+
+class UserImporter:
+    """Importação em massa de usuários a partir de CSV ou JSON lines.
+
+    Os registros são processados em lotes de `batch_size`: validação em
+    lote (AuthValidator.validate_registration_batch), CPF/email repetidos
+    barrados em memória antes do UNIQUE do banco, senhas em texto
+    hasheadas em paralelo e um executemany por lote, na mesma transação
+    que grava o checkpoint em `bulk_imports`. Se o processo cair, a
+    próxima execução com o mesmo arquivo continua do último lote gravado.
+    Registros recusados vão para um relatório CSV (linha, cpf, email,
+    erros). Um registro pode trazer `senha` (texto) ou `senha_hash`
+    (formato aceito por PasswordHasher.verify, vindo de uma exportação).
+    """
+
+    def __init__(self, db, batch_size=1000, hash_workers=None, progress_interval=1.0, out=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers or os.cpu_count() or 1
+        self.progress_interval = progress_interval
+        self.out = out or sys.stdout
+        self.cpfs = {}    # cpf -> linha do arquivo (None se já estava no banco)
+        self.emails = {}
+        self.records = 0
+        self.imported = 0
+        self.rejected = 0
+
+    def create_checkpoint_table(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bulk_imports (
+                source TEXT PRIMARY KEY,
+                records INTEGER NOT NULL,
+                imported INTEGER NOT NULL,
+                rejected INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+
+    def load_existing(self, conn):
+        """CPFs e emails já cadastrados, para barrar duplicados sem ir ao banco"""
+        for cpf, email in conn.execute("SELECT cpf, email FROM users"):
+            self.cpfs[cpf] = None
+            self.emails[email] = None
+
+    def run(self, path, fmt=None, report_path=None, restart=False):
+        """Importa o arquivo; devolve o resumo {"success", "records", "imported", "rejected", ...}"""
+        fmt = detect_format(path, fmt)
+        source = source_fingerprint(path)
+        report_path = output_path(report_path or f"{os.path.basename(path)}.erros.csv")
+        started = time.perf_counter()
+
+        with self.db.pool.connection() as conn:
+            self.create_checkpoint_table(conn)
+            if restart:
+                conn.execute("DELETE FROM bulk_imports WHERE source = ?", (source,))
+                conn.commit()
+            checkpoint = conn.execute(
+                "SELECT records, imported, rejected FROM bulk_imports WHERE source = ?", (source,)
+            ).fetchone()
+            skip = 0
+            if checkpoint:
+                skip, self.imported, self.rejected = checkpoint
+                print(f"↩️  Retomando {path} a partir do registro {skip + 1}", file=self.out)
+            self.load_existing(conn)
+
+            with open(path, newline='', encoding='utf-8-sig') as stream, \
+                    open(report_path, 'a' if checkpoint else 'w', newline='', encoding='utf-8') as report_file, \
+                    ThreadPoolExecutor(self.hash_workers, thread_name_prefix='import-hash') as hashers:
+                report = csv.writer(report_file)
+                if not checkpoint:
+                    report.writerow(('linha', 'cpf', 'email', 'erros'))
+
+                batch = []
+                last_progress = time.perf_counter()
+                for self.records, (line_no, record) in enumerate(read_records(stream, fmt), 1):
+                    if self.records <= skip:
+                        continue
+                    batch.append((line_no, record))
+                    if len(batch) >= self.batch_size:
+                        self.import_batch(conn, source, batch, hashers, report)
+                        report_file.flush()
+                        batch = []
+                        if time.perf_counter() - last_progress >= self.progress_interval:
+                            self.print_progress(started, skip)
+                            last_progress = time.perf_counter()
+                if batch:
+                    self.import_batch(conn, source, batch, hashers, report)
+
+        self.print_progress(started, skip)
+        return {
+            "success": True,
+            "records": self.records,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "report": report_path,
+            "seconds": round(time.perf_counter() - started, 2)
+        }
+
+    def prepare(self, batch):
+        """Valida e normaliza o lote: ([(linha, registro normalizado)], [(linha, registro, erros)])"""
+        records = [record or {} for _, record in batch]
+        for record in records:
+            for key, value in record.items():
+                if value is not None and not isinstance(value, str):
+                    record[key] = str(value)
+        results = AuthValidator.validate_registration_batch(records, check_passwords=False)
+
+        accepted, rejected = [], []
+        for (line_no, original), record, result in zip(batch, records, results):
+            errors = list(result['errors']) if original is not None else ["Registro inválido (JSON malformado)"]
+            senha_hash = record.get('senha_hash')
+            if senha_hash:
+                if not self.db.hasher.is_supported(senha_hash):
+                    errors.append("senha_hash em formato desconhecido")
+            elif not record.get('senha') or not AuthValidator.validate_password(record['senha']):
+                errors.append("Senha deve ter pelo menos 6 caracteres")
+            elif 'confirmar_senha' in record and record['senha'] != record['confirmar_senha']:
+                errors.append("Senhas não coincidem")
+
+            if not errors:
+                record['cpf'] = AuthValidator.normalize_cpf(record['cpf'])
+                record['email'] = AuthValidator.normalize_email(record['email'])
+                for key, seen, label in ((record['cpf'], self.cpfs, 'CPF'), (record['email'], self.emails, 'Email')):
+                    if key in seen:
+                        previous = seen[key]
+                        errors.append(f"{label} já cadastrado" if previous is None
+                                      else f"{label} repetido no arquivo (linha {previous})")
+
+            if errors:
+                rejected.append((line_no, record, errors))
+            else:
+                self.cpfs[record['cpf']] = line_no
+                self.emails[record['email']] = line_no
+                accepted.append((line_no, record))
+        return accepted, rejected
+
+    def import_batch(self, conn, source, batch, hashers, report):
+        accepted, rejected = self.prepare(batch)
+
+        # hashes em paralelo: scrypt/PBKDF2 liberam o GIL
+        plain = [record['senha'] for _, record in accepted if not record.get('senha_hash')]
+        hashes = iter(hashers.map(self.db.hasher.hash, plain))
+        rows = [
+            tuple(record[column].strip() if column in ('nome', 'sobrenome', 'telefone') else record[column]
+                  for column in USER_COLUMNS) + (record.get('senha_hash') or next(hashes),)
+            for _, record in accepted
+        ]
+
+        insert = '''
+            INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        '''
+        try:
+            conn.executemany(insert, rows)
+        except sqlite3.IntegrityError:
+            # alguém cadastrou o mesmo CPF/email durante a importação: linha a linha
+            conn.rollback()
+            still_ok = []
+            for (line_no, record), row in zip(accepted, rows):
+                try:
+                    conn.execute(insert, row)
+                    still_ok.append((line_no, record))
+                except sqlite3.IntegrityError as e:
+                    label = 'CPF' if 'cpf' in str(e).lower() else 'Email'
+                    rejected.append((line_no, record, [f"{label} já cadastrado"]))
+            accepted = still_ok
+
+        self.imported += len(accepted)
+        self.rejected += len(rejected)
+        conn.execute('''
+            INSERT INTO bulk_imports (source, records, imported, rejected, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(source) DO UPDATE SET records = excluded.records, imported = excluded.imported,
+                rejected = excluded.rejected, updated_at = excluded.updated_at
+        ''', (source, self.records, self.imported, self.rejected))
+        conn.commit()
+
+        for line_no, record, errors in sorted(rejected, key=lambda item: item[0]):
+            report.writerow((line_no, record.get('cpf', ''), record.get('email', ''), '; '.join(errors)))
+
+    def print_progress(self, started, skipped):
+        elapsed = time.perf_counter() - started
+        rate = (self.records - skipped) / elapsed if elapsed else 0.0
+        print(f"📥 {self.records} registros | ✅ {self.imported} importados | "
+              f"⚠️  {self.rejected} recusados | {rate:.0f} registros/s", file=self.out)
+
+
+class UserExporter:
+    """Exporta `users` para CSV ou JSON lines, em páginas por id (sem OFFSET).
+
+    Com include_hash=True o arquivo leva `senha_hash` e pode ser importado
+    de volta (UserImporter) mantendo as senhas.
+    """
+
+    def __init__(self, db, batch_size=5000, include_hash=False):
+        self.db = db
+        self.batch_size = batch_size
+        self.include_hash = include_hash
+
+    def columns(self):
+        return ('id',) + USER_COLUMNS + ('created_at',) + (('senha_hash',) if self.include_hash else ())
+
+    def pages(self):
+        """Gera listas de linhas, batch_size por vez, em ordem de id"""
+        columns = self.columns()
+        query = f"SELECT {', '.join(columns)} FROM users WHERE id > ? ORDER BY id LIMIT ?"
+        last_id = 0
+        with self.db.pool.connection() as conn:
+            while True:
+                rows = conn.execute(query, (last_id, self.batch_size)).fetchall()
+                if not rows:
+                    return
+                yield rows
+                last_id = rows[-1][0]
+
+    def run(self, path, fmt=None):
+        """Grava o arquivo ('-' = stdout); devolve o resumo"""
+        fmt = detect_format(path, fmt)
+        if path != '-':
+            path = output_path(path)
+        columns = self.columns()
+        exported = 0
+        stream = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='') if path == '-' \
+            else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            writer = csv.writer(stream) if fmt == 'csv' else None
+            if writer:
+                writer.writerow(columns)
+            for rows in self.pages():
+                if writer:
+                    writer.writerows(rows)
+                else:
+                    stream.write(''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+                                         for row in rows))
+                exported += len(rows)
+        finally:
+            if path == '-':
+                stream.detach()
+            else:
+                stream.close()
+        return {"success": True, "exported": exported, "path": path}
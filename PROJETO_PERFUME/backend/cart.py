@@ -0,0 +1,212 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from backend.metrics import REGISTRY
+from backend.utils import ResponseBuilder
+
+_DEVICE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def compact_json(value):
+    """JSON sem espaços, como os carrinhos ficam gravados"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+class CartStore:
+    """Carrinho de cada usuário guardado no servidor, sincronizado em lotes.
+
+    O navegador acumula as alterações (operações com número de sequência
+    por dispositivo) e manda várias de uma vez; cada lote vira uma única
+    transação com uma única escrita da linha do usuário em `carts`, que
+    guarda os itens como {"id": quantidade} em JSON compacto. O último
+    `seq` aplicado de cada dispositivo fica na mesma linha: operações
+    reenviadas (resposta perdida, nova tentativa) são ignoradas. Preço,
+    nome e imagem vêm sempre do catálogo, nunca do cliente.
+
+    Operações: add (soma), set (define), remove, merge (maior quantidade
+    entre servidor e cliente, usada ao mesclar o carrinho local no login)
+    e clear.
+    """
+
+    operations = ('add', 'set', 'remove', 'merge', 'clear')
+    max_items = 50
+    max_quantity = 99
+    max_ops = 100
+    # Dispositivos lembrados por carrinho (o menos recente sai primeiro)
+    max_devices = 8
+
+    def __init__(self, db, catalog):
+        self.db = db
+        self.catalog = catalog
+        self.batches = 0
+        self.operations_applied = 0
+        self.duplicates = 0
+        self.writes = 0
+        self.busy = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(conn, user_id):
+        """(itens, dispositivos) gravados para o usuário"""
+        row = conn.execute("SELECT itens, dispositivos FROM carts WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return {}, {}
+        return json.loads(row[0]), json.loads(row[1])
+
+    @staticmethod
+    def save(conn, user_id, items, devices):
+        conn.execute('''
+            INSERT INTO carts (user_id, itens, dispositivos, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET itens = excluded.itens, dispositivos = excluded.dispositivos,
+                updated_at = excluded.updated_at
+        ''', (user_id, compact_json(items), compact_json(devices), time.time()))
+
+    def get(self, user_id):
+        """(status, corpo) com o carrinho atual"""
+        with self.db.pool.connection() as conn:
+            items, _ = self.load(conn, user_id)
+        return 200, ResponseBuilder.success(data={'cart': self.view(items)})
+
+    def view(self, items):
+        """Itens com os dados do catálogo, na ordem em que foram adicionados, e os totais"""
+        snapshot = self.catalog.snapshot()
+        lines = []
+        total = 0
+        for product_id, quantity in items.items():
+            product = snapshot.by_id.get(product_id)
+            if product is None:
+                continue
+            total += product['preco_centavos'] * quantity
+            lines.append({
+                'id': product_id,
+                'nome': product['nome'],
+                'descricao': product['descricao'],
+                'preco': product['preco'],
+                'imagem': product['imagem'],
+                'pagina': product['pagina'],
+                'quantidade': quantity
+            })
+        return {
+            'items': lines,
+            'quantidade': sum(line['quantidade'] for line in lines),
+            'total': total / 100,
+            'total_centavos': total
+        }
+
+    def parse_ops(self, data):
+        """(dispositivo, operações ordenadas por seq) ou uma mensagem de erro"""
+        if not isinstance(data, dict):
+            return None, "Envie um objeto JSON com dispositivo e ops"
+        device, ops = data.get('dispositivo'), data.get('ops')
+        if not isinstance(device, str) or not _DEVICE.match(device):
+            return None, "dispositivo inválido"
+        if not isinstance(ops, list) or not 1 <= len(ops) <= self.max_ops:
+            return None, f"ops deve ter entre 1 e {self.max_ops} operações"
+
+        parsed = []
+        for op in ops:
+            if not isinstance(op, dict) or op.get('op') not in self.operations:
+                return None, "Operação inválida"
+            seq, product_id, quantity = op.get('seq'), op.get('id'), op.get('qty', 1)
+            if type(seq) is not int or seq < 1:
+                return None, "seq deve ser um inteiro positivo"
+            if op['op'] != 'clear' and not isinstance(product_id, str):
+                return None, "Operação sem id do produto"
+            if op['op'] in ('add', 'set', 'merge') and (type(quantity) is not int
+                                                      or not 1 <= quantity <= self.max_quantity):
+                return None, f"qty deve estar entre 1 e {self.max_quantity}"
+            parsed.append((seq, op['op'], product_id, quantity))
+        parsed.sort(key=lambda op: op[0])
+        return (device, parsed), None
+
+    def apply(self, user_id, data):
+        """Aplica um lote de operações; (status, corpo) com o carrinho e o último seq aplicado"""
+        parsed, error = self.parse_ops(data)
+        if error:
+            return 400, ResponseBuilder.error(error)
+        device, ops = parsed
+        by_id = self.catalog.snapshot().by_id
+
+        try:
+            with REGISTRY.timer('cart'), self.db.pool.connection() as conn:
+                items, last_seq, applied, ignored = self._apply(conn, user_id, device, ops, by_id)
+        except sqlite3.OperationalError:
+            # banco travado além do busy_timeout: nada foi gravado e o reenvio (mesmos seq) é seguro
+            with self._lock:
+                self.busy += 1
+            return 503, {"success": False, "error": "Carrinho ocupado, tente novamente em instantes",
+                         "retry_after": 1}
+
+        with self._lock:
+            self.batches += 1
+            self.operations_applied += applied
+            self.duplicates += len(ops) - applied
+            if applied:
+                self.writes += 1
+        data = {'cart': self.view(items), 'ack': last_seq}
+        if ignored:
+            data['ignorados'] = ignored
+        return 200, ResponseBuilder.success(data=data)
+
+    def _apply(self, conn, user_id, device, ops, by_id):
+        """Transação do lote; (itens, último seq, operações aplicadas, ids ignorados)"""
+        # IMMEDIATE: dois lotes do mesmo usuário não leem a mesma versão
+        conn.execute("BEGIN IMMEDIATE")
+        items, devices = self.load(conn, user_id)
+        last_seq = devices.get(device, 0)
+        ignored = []
+        applied = 0
+        for seq, op, product_id, quantity in ops:
+            if seq <= last_seq:
+                continue
+            last_seq = seq
+            applied += 1
+            if op == 'clear':
+                items.clear()
+            elif op == 'remove':
+                items.pop(product_id, None)
+            elif product_id not in by_id:
+                ignored.append(product_id)
+            elif product_id not in items and len(items) >= self.max_items:
+                ignored.append(product_id)
+            else:
+                current = items.get(product_id, 0)
+                if op == 'add':
+                    quantity += current
+                elif op == 'merge':
+                    quantity = max(quantity, current)
+                items[product_id] = min(quantity, self.max_quantity)
+
+        if applied:
+            devices.pop(device, None)
+            devices[device] = last_seq
+            while len(devices) > self.max_devices:
+                devices.pop(next(iter(devices)))
+            self.save(conn, user_id, items, devices)
+        conn.commit()
+        return items, last_seq, applied, ignored
+
+    def remove_items(self, conn, user_id, quantities):
+        """Tira do carrinho o que foi comprado (na transação de quem chama)"""
+        items, devices = self.load(conn, user_id)
+        for product_id, quantity in quantities:
+            remaining = items.get(product_id, 0) - quantity
+            if remaining > 0:
+                items[product_id] = remaining
+            else:
+                items.pop(product_id, None)
+        self.save(conn, user_id, items, devices)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'operations': self.operations_applied,
+                'duplicates_ignored': self.duplicates,
+                'writes': self.writes,
+                'busy': self.busy,
+                'operations_per_write': round(self.operations_applied / self.writes, 2) if self.writes else 0.0
+            }
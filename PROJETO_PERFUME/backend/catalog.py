@@ -0,0 +1,291 @@
+import base64
+import bisect
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+from backend import responses
+from backend.metrics import REGISTRY
+from backend.utils import HTTPUtils, ResponseBuilder
+
+# Produtos que estavam fixos no HTML (index.html e páginas de compra), na ordem da vitrine:
+# (id, nome, descrição, preço em centavos, desconto %, categoria, imagem, página do produto)
+SEED_PRODUCTS = (
+    ('carolina-herrera-la-bomba', 'Carolina Herrera',
+     'perfume carolina herrera la bomba feminino eau de parfum 80ml', 95000, None, 'lancamento',
+     './Styles/compra_carolina/perfume-carolina.png', 'compracarolina.html'),
+    ('dior-jadore', 'DIOR', "j'adore feminino eau de toilette 100ml", 91500, None, 'catalogo',
+     './Styles/compra/perfumecerto1.PNG', 'compra.html'),
+    ('jean-paul-gaultier-scandal', 'JEAN PAUL GAULTIER', 'Perfume scandal feminino eau de parfum 80ml',
+     80000, None, 'catalogo', './Styles/compra/perfume2.png', None),
+    ('ysl-mon-paris', 'YVES SAINT LAUREN', 'Perfume Mon Paris feminino eau de parfum 30ml',
+     42000, None, 'catalogo', './Styles/compra/perfume3.png', None),
+    ('kayali-yum-boujee-marshmallow', 'KAIALI', 'Perfume Kayali Yum Boujee Marshmallow 81 eau de parfum 100ml',
+     111900, None, 'catalogo', './Styles/compra/perfume4.png', None),
+    ('shakira-dance-stellar', 'SHAKIRA', 'perfume shakira dance stellar feminino eau de toilette 80ml',
+     21900, None, 'catalogo', './Styles/compra/perfume5.png', None),
+    ('versace-bright-crystal', 'VERSACE', 'perfume versace bright crystal feminino parfum 90ml',
+     102900, None, 'catalogo', './Styles/compra/perfume6.png', None),
+    ('carolina-herrera-212-vip-rose', 'CAROLINA HERRERA',
+     'perfume carolina herrera 212 vip rosé feminino eau de parfum 80ml', 67120, None, 'catalogo',
+     './Styles/compra/perfume7.png', None),
+    ('guerlain-la-petite-robe-noire', 'GUERLAIN',
+     'perfume guerlain la petite robe noire feminino eau de toilette 100ml', 58030, None, 'catalogo',
+     './Styles/compra/perfume8.png', None),
+    ('prada-paradoxe-virtual-flower', 'PARADOXE VIRTUAL FLOWER',
+     'perfume prada paradoxe virtual flower feminino eau de parfum', 81090, 10, 'promocao',
+     './Styles/compra/perfume9.avif', 'comprapromo.html'),
+    ('miss-dior', 'MISS DIOR', 'perfume dior miss dior feminino eau de parfum', 99090, 15, 'promocao',
+     './Styles/compra/perfume10.avif', None),
+    ('carolina-herrera-good-girl', 'CAROLINA HERRERA GOOD GIRL',
+     'perfume carolina herrera good girl feminino eau de parfum 80ml', 85090, 15, 'promocao',
+     './Styles/compra/perfume11.avif', None),
+    ('lancome-la-vie-est-belle', 'LANCOME LA VIE EST BELLE',
+     'perfume lancôme la vie est belle feminino eau de parfum 75ml', 75090, 10, 'promocao',
+     './Styles/compra/perfume12.avif', None),
+)
+
+# Marca e notas olfativas dos produtos semeados (migração 3, busca); só a página
+# do J'adore descreve a pirâmide olfativa
+SEED_SEARCH_FIELDS = {
+    'carolina-herrera-la-bomba': ('Carolina Herrera', ''),
+    'dior-jadore': ('Dior', 'laranja sanguínea, rosa damascena, neroli'),
+    'jean-paul-gaultier-scandal': ('Jean Paul Gaultier', ''),
+    'ysl-mon-paris': ('Yves Saint Laurent', ''),
+    'kayali-yum-boujee-marshmallow': ('Kayali', ''),
+    'shakira-dance-stellar': ('Shakira', ''),
+    'versace-bright-crystal': ('Versace', ''),
+    'carolina-herrera-212-vip-rose': ('Carolina Herrera', ''),
+    'guerlain-la-petite-robe-noire': ('Guerlain', ''),
+    'prada-paradoxe-virtual-flower': ('Prada', ''),
+    'miss-dior': ('Dior', ''),
+    'carolina-herrera-good-girl': ('Carolina Herrera', ''),
+    'lancome-la-vie-est-belle': ('Lancôme', ''),
+}
+
+# Resposta pronta: status, corpo (bytes), cabeçalhos extras e se o corpo está em gzip
+CatalogResponse = namedtuple('CatalogResponse', 'status body headers compressed')
+
+PRODUCT_NOT_FOUND = responses.encode_json(ResponseBuilder.error("Produto não encontrado"))
+
+
+class _Snapshot:
+    """Catálogo de uma versão do banco, imutável depois de montado"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.products = [self.product_dict(row) for row in rows]
+        self.by_id = {product['id']: product for product in self.products}
+        self.order = {product['id']: index for index, product in enumerate(self.products)}
+        # chaves de ordenação (posição, id) da listagem completa e de cada categoria
+        self.listings = {None: ([(row[-1], row[0]) for row in rows], self.products)}
+        for row, product in zip(rows, self.products):
+            keys, items = self.listings.setdefault(product['categoria'], ([], []))
+            keys.append((row[-1], row[0]))
+            items.append(product)
+        digest = hashlib.sha256(responses.encode_json(self.products)).hexdigest()
+        # ETag forte, igual em todos os workers que leem o mesmo catálogo
+        self.etag = f'"catalog-{digest[:24]}"'
+        self.responses = {}
+
+    @staticmethod
+    def product_dict(row):
+        product_id, nome, marca, descricao, notas, preco_centavos, desconto, categoria, imagem, pagina, _ = row
+        return {
+            'id': product_id,
+            'nome': nome,
+            'marca': marca,
+            'descricao': descricao,
+            'notas': notas,
+            'preco': preco_centavos / 100,
+            'preco_centavos': preco_centavos,
+            'desconto': desconto,
+            'categoria': categoria,
+            'imagem': imagem,
+            'pagina': pagina,
+        }
+
+
+class ProductCatalog:
+    """Catálogo de produtos servido de um snapshot em memória.
+
+    O snapshot é montado a partir da tabela `products` e trocado inteiro
+    quando o catálogo muda: uma thread de cada processo confere a cada
+    `refresh_interval` segundos o contador de `catalog_version`, que os
+    triggers do banco incrementam em qualquer escrita. As respostas já
+    serializadas (e em gzip, se passarem de `gzip_min_size`) ficam no
+    próprio snapshot, então navegar no catálogo não toca no SQLite. O ETag
+    vem do conteúdo do snapshot e vale para todas as URLs do catálogo.
+    """
+
+    fields = ('id', 'nome', 'marca', 'descricao', 'notas', 'preco', 'preco_centavos', 'desconto',
+              'categoria', 'imagem', 'pagina')
+    default_limit = 20
+    max_limit = 100
+    # Respostas de listagem guardadas por snapshot (combinações de parâmetros)
+    max_cached_responses = 512
+
+    def __init__(self, db, refresh_interval=2.0, gzip_min_size=1024):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.gzip_min_size = gzip_min_size
+        self._snapshot = None
+        self._refresher_pid = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.not_modified = 0
+
+    def snapshot(self):
+        if self._refresher_pid != os.getpid():
+            self._ensure_refresher()
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.rebuild()
+                snapshot = self._snapshot
+        return snapshot
+
+    def _ensure_refresher(self):
+        """Thread que acompanha a versão do catálogo, uma por processo (recriada após fork)"""
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._refresh_loop, name="catalog-refresh", daemon=True)
+            thread.start()
+            self._refresher_pid = os.getpid()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️  Erro ao atualizar o catálogo: {e}")
+
+    def refresh(self):
+        """Remonta o snapshot se a versão do catálogo no banco mudou"""
+        snapshot = self._snapshot
+        if snapshot is None or self.db.get_catalog_version() != snapshot.version:
+            self.rebuild()
+
+    def rebuild(self):
+        with REGISTRY.timer('catalog'):
+            version, rows = self.db.get_catalog()
+            self._snapshot = _Snapshot(version, rows)
+        self.rebuilds += 1
+        return self._snapshot
+
+    @staticmethod
+    def encode_cursor(key):
+        position, product_id = key
+        return base64.urlsafe_b64encode(f"{position}:{product_id}".encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+            position, product_id = raw.split(':', 1)
+            return int(position), product_id
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    def parse_query(self, query):
+        """Parâmetros da listagem normalizados, ou (None, mensagem de erro)"""
+        def single(name):
+            values = query.get(name)
+            return values[-1] if values else None
+
+        try:
+            limit = int(single('limit') or self.default_limit)
+        except ValueError:
+            return None, "limit deve ser um número"
+        if not 1 <= limit <= self.max_limit:
+            return None, f"limit deve estar entre 1 e {self.max_limit}"
+
+        after = single('after')
+        after_key = None
+        if after:
+            after_key = self.decode_cursor(after)
+            if after_key is None:
+                return None, "Cursor inválido"
+
+        fields = None
+        if single('fields'):
+            requested = [field.strip() for field in single('fields').split(',') if field.strip()]
+            unknown = [field for field in requested if field not in self.fields]
+            if unknown:
+                return None, f"Campos desconhecidos: {', '.join(unknown)}"
+            # id sempre presente, demais na ordem canônica
+            fields = tuple(field for field in self.fields if field == 'id' or field in requested)
+
+        return (single('categoria') or None, after_key, limit, fields), None
+
+    def list_body(self, snapshot, categoria, after_key, limit, fields):
+        keys, items = snapshot.listings.get(categoria, ((), ()))
+        start = bisect.bisect_right(keys, after_key) if after_key else 0
+        page = items[start:start + limit]
+        if fields is not None:
+            page = [{field: product[field] for field in fields} for product in page]
+        has_more = start + limit < len(items)
+        return responses.encode_json(ResponseBuilder.success(data={
+            'products': page,
+            'next_cursor': self.encode_cursor(keys[start + limit - 1]) if has_more else None,
+            'total': len(items),
+        }))
+
+    def cached(self, snapshot, key, build):
+        """(corpo, corpo em gzip ou None) do cache do snapshot, montando se preciso"""
+        entry = snapshot.responses.get(key)
+        if entry is None:
+            body = build()
+            compressed = gzip.compress(body, 6) if len(body) >= self.gzip_min_size else None
+            entry = (body, compressed)
+            if len(snapshot.responses) < self.max_cached_responses:
+                snapshot.responses[key] = entry
+        return entry
+
+    def respond(self, path, query, request_headers):
+        """Resposta de GET /api/products (listagem) ou /api/products/<id> (detalhe)"""
+        snapshot = self.snapshot()
+        if path == '/api/products':
+            params, error = self.parse_query(query)
+            if error:
+                return CatalogResponse(400, responses.encode_json(ResponseBuilder.error(error)), [], False)
+            body, compressed = self.cached(snapshot, params, lambda: self.list_body(snapshot, *params))
+        else:
+            product = snapshot.by_id.get(path[len('/api/products/'):])
+            if product is None:
+                return CatalogResponse(404, PRODUCT_NOT_FOUND, [], False)
+            body, compressed = self.cached(snapshot, product['id'],
+                                           lambda: responses.encode_json(ResponseBuilder.success(data=product)))
+
+        etag = snapshot.etag
+        use_gzip = compressed is not None and HTTPUtils.accepts_encoding(
+            request_headers.get('Accept-Encoding'), 'gzip')
+        if use_gzip:
+            # variante gzip tem ETag próprio, como nos arquivos estáticos
+            body, etag = compressed, etag[:-1] + '-gzip"'
+        headers = [('ETag', etag), ('Cache-Control', 'no-cache')]
+        if compressed is not None and not use_gzip:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if HTTPUtils.etag_matches(request_headers.get('If-None-Match'), etag):
+            self.not_modified += 1
+            return CatalogResponse(304, b'', headers, False)
+        return CatalogResponse(200, body, headers, use_gzip)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'products': len(snapshot.products) if snapshot else 0,
+            'etag': snapshot.etag if snapshot else None,
+            'cached_responses': len(snapshot.responses) if snapshot else 0,
+            'rebuilds': self.rebuilds,
+            'not_modified': self.not_modified,
+            'refresh_interval': self.refresh_interval
+        }
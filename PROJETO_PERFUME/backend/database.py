@@ -1,64 +1,428 @@
 import sqlite3
-import hashlib
 import os
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from backend.auth import AuthValidator
+from backend.hashing import PasswordHasher, HashingPool, HashingBusy
+from backend.cache import TTLCache
+from backend.metrics import REGISTRY
+from backend.catalog import SEED_PRODUCTS, SEED_SEARCH_FIELDS
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite reutilizáveis, seguro entre threads e após fork.
+
+    Cada conexão é aberta uma única vez com os PRAGMAs de desempenho e volta
+    para a fila ao fim do uso. Depois de um fork (modo PROCESSES) o worker
+    descarta as conexões herdadas do pai e abre as suas.
+    """
+    # Aplicados em toda conexão nova (journal_mode=WAL fica gravado no arquivo)
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-8000",       # ~8 MB de páginas em cache
+        "PRAGMA mmap_size=67108864",     # 64 MB mapeados em memória
+        "PRAGMA temp_store=MEMORY",
+    )
+    cached_statements = 256
+
+    def __init__(self, db_path, max_size=8, timeout=10.0, metrics_name='db'):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        # operação nas métricas: tempo com a conexão em mãos (espera + uso)
+        self.metrics_name = metrics_name
+        self._lock = threading.Lock()
+        self._inherited = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # LIFO: reaproveita primeiro as conexões mais "quentes"
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def _check_fork(self):
+        """Após fork, abandona (sem fechar) as conexões herdadas do processo pai"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Fechar aqui mexeria nos locks/WAL que ainda são do pai
+                    self._inherited = self._idle
+                    self._reset()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """Retira uma conexão livre, abrindo outra se o limite permitir"""
+        self._check_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Pool de conexões esgotado")
+
+    def release(self, conn):
+        """Devolve a conexão ao pool (conexões de outro processo são descartadas)"""
+        if self._pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self.discard(conn)
+            return
+        self._idle.put(conn)
+
+    def discard(self, conn):
+        """Fecha uma conexão com problema e libera sua vaga no pool"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... (transação pendente sofre rollback)"""
+        with REGISTRY.timer(self.metrics_name):
+            conn = self.acquire()
+            try:
+                yield conn
+            finally:
+                self.release(conn)
+
+    def close_all(self):
+        """Fecha as conexões ociosas do processo atual"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+    def stats(self):
+        return {
+            "open": self._created,
+            "idle": self._idle.qsize(),
+            "max_size": self.max_size
+        }
+
 
 class Database:
-    def __init__(self, db_path="users.db"):
+    # PRAGMA user_version: 1 = CPF só com dígitos e email em minúsculas,
+    # 2 = catálogo de produtos semeado com os produtos das páginas,
+    # 3 = marca/notas dos produtos e índice de busca FTS5,
+    # 4 = estoque inicial dos produtos do catálogo
+    schema_version = 4
+    # Unidades de cada produto do catálogo ao criar a tabela de estoque
+    initial_stock = 100
+
+    # Atualiza hashes antigos (SHA-256 ou parâmetros velhos) no login
+    rehash_on_login = True
+
+    def __init__(self, db_path="users.db", timeout=10.0, pool_size=8, hasher=None, hash_pool=None):
         self.db_path = db_path
+        # Tempo de espera por locks do SQLite quando há escritas concorrentes
+        self.timeout = timeout
+        self.pool = ConnectionPool(db_path, max_size=pool_size, timeout=timeout)
+        self.hasher = hasher or PasswordHasher()
+        # hashing fora das threads de atendimento, com fila limitada
+        self.hash_pool = hash_pool or HashingPool()
+        self._dummy_hash = None
+        # perfis por id; toda escrita num usuário passa por invalidate_user
+        self.profile_cache = TTLCache(max_entries=10000, ttl=60.0)
         self.init_database()
     
     def init_database(self):
         """Inicializa o banco de dados e cria as tabelas necessárias"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL,
+                    sobrenome TEXT NOT NULL,
+                    cpf TEXT UNIQUE NOT NULL,
+                    telefone TEXT NOT NULL,
+                    data_nascimento TEXT NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    senha_hash TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            self.init_catalog(conn)
+            self.init_orders(conn)
+            conn.commit()
+            
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                self.migrate_normalize_logins(conn)
+            if version < 2:
+                self.seed_products(conn)
+            if version < 3:
+                self.migrate_product_search(conn)
+            if version < 4:
+                self.seed_inventory(conn)
+            if version < self.schema_version:
+                conn.execute(f"PRAGMA user_version={self.schema_version}")
+                conn.commit()
+    
+    def init_catalog(self, conn):
+        """Tabela de produtos e o contador de versão que os triggers mantêm"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS products (
+                id TEXT PRIMARY KEY,
+                nome TEXT NOT NULL,
+                descricao TEXT NOT NULL,
+                preco_centavos INTEGER NOT NULL CHECK (preco_centavos >= 0),
+                desconto INTEGER,
+                categoria TEXT NOT NULL,
+                imagem TEXT NOT NULL,
+                pagina TEXT,
+                posicao INTEGER NOT NULL DEFAULT 0,
+                ativo INTEGER NOT NULL DEFAULT 1,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_products_posicao ON products (posicao, id)")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        ''')
+        conn.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+        # qualquer escrita em products (servidor, scripts, sqlite3) muda a versão
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS products_{event.lower()}_version AFTER {event} ON products
+                BEGIN
+                    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+    
+    def init_orders(self, conn):
+        """Carrinhos, estoque e pedidos.
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
+        O estoque fica fora de `products` para que cada venda não mude a
+        versão do catálogo (e não remonte o snapshot em todos os workers).
+        """
+        # itens e dispositivos em JSON compacto: {"dior-jadore":2} e {"<dispositivo>":<último seq>}
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS carts (
+                user_id INTEGER PRIMARY KEY,
+                itens TEXT NOT NULL DEFAULT '{}',
+                dispositivos TEXT NOT NULL DEFAULT '{}',
+                updated_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS inventory (
+                product_id TEXT PRIMARY KEY,
+                disponivel INTEGER NOT NULL CHECK (disponivel >= 0)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS orders (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                sobrenome TEXT NOT NULL,
-                cpf TEXT UNIQUE NOT NULL,
-                telefone TEXT NOT NULL,
-                data_nascimento TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                senha_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                user_id INTEGER NOT NULL,
+                idempotency_key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total_centavos INTEGER NOT NULL,
+                expires_at REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (user_id, idempotency_key)
             )
         ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS order_items (
+                order_id INTEGER NOT NULL,
+                product_id TEXT NOT NULL,
+                quantidade INTEGER NOT NULL CHECK (quantidade > 0),
+                preco_centavos INTEGER NOT NULL,
+                PRIMARY KEY (order_id, product_id)
+            ) WITHOUT ROWID
+        ''')
+        # só as reservas em aberto, para a varredura de expiração
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_reserved ON orders (expires_at) WHERE status = 'reservado'")
+    
+    def seed_products(self, conn):
+        """Migração 2: produtos que estavam fixos no HTML"""
+        conn.executemany('''
+            INSERT OR IGNORE INTO products
+                (id, nome, descricao, preco_centavos, desconto, categoria, imagem, pagina, posicao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [product + ((position + 1) * 10,) for position, product in enumerate(SEED_PRODUCTS)])
+        print(f"🛍️  Catálogo: {len(SEED_PRODUCTS)} produtos cadastrados")
+    
+    def migrate_product_search(self, conn):
+        """Migração 3: colunas marca/notas e o índice FTS5 sobre nome, marca, notas e descrição.
+        
+        O índice usa `products` como conteúdo externo (ligado pelo rowid) e os
+        triggers o mantêm em dia; `INSERT INTO products_fts(products_fts)
+        VALUES('rebuild')` o refaz do zero se for preciso.
+        """
+        conn.execute("ALTER TABLE products ADD COLUMN marca TEXT NOT NULL DEFAULT ''")
+        conn.execute("ALTER TABLE products ADD COLUMN notas TEXT NOT NULL DEFAULT ''")
+        conn.executemany("UPDATE products SET marca = ?, notas = ? WHERE id = ?",
+                         [(marca, notas, product_id) for product_id, (marca, notas) in SEED_SEARCH_FIELDS.items()])
         
-        conn.commit()
-        conn.close()
+        # remove_diacritics: "lancome" acha "Lancôme"; prefixos de 2 e 3 letras indexados para o autocomplete
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                nome, marca, notas, descricao,
+                content='products', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products
+            BEGIN
+                INSERT INTO products_fts (rowid, nome, marca, notas, descricao)
+                VALUES (new.rowid, new.nome, new.marca, new.notas, new.descricao);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products
+            BEGIN
+                INSERT INTO products_fts (products_fts, rowid, nome, marca, notas, descricao)
+                VALUES ('delete', old.rowid, old.nome, old.marca, old.notas, old.descricao);
+            END
+        ''')
+        # só os campos indexados: mudar preço ou estoque não mexe no índice
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF nome, marca, notas, descricao ON products
+            BEGIN
+                INSERT INTO products_fts (products_fts, rowid, nome, marca, notas, descricao)
+                VALUES ('delete', old.rowid, old.nome, old.marca, old.notas, old.descricao);
+                INSERT INTO products_fts (rowid, nome, marca, notas, descricao)
+                VALUES (new.rowid, new.nome, new.marca, new.notas, new.descricao);
+            END
+        ''')
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    
+    def seed_inventory(self, conn):
+        """Migração 4: estoque inicial dos produtos já cadastrados"""
+        conn.execute("INSERT OR IGNORE INTO inventory (product_id, disponivel) SELECT id, ? FROM products",
+                     (self.initial_stock,))
+        print(f"📦 Estoque: {self.initial_stock} unidades de cada produto do catálogo")
+    
+    def migrate_normalize_logins(self, conn):
+        """Migração 1: grava CPF só com dígitos e email em minúsculas.
+        
+        Linhas que colidiriam com outra já normalizada ficam como estão
+        (UPDATE OR IGNORE) e são reportadas.
+        """
+        changes = []
+        for user_id, cpf, email in conn.execute("SELECT id, cpf, email FROM users"):
+            normalized = (AuthValidator.normalize_cpf(cpf), AuthValidator.normalize_email(email))
+            if normalized != (cpf, email):
+                changes.append(normalized + (user_id,))
+        
+        before = conn.total_changes
+        conn.executemany("UPDATE OR IGNORE users SET cpf = ?, email = ? WHERE id = ?", changes)
+        skipped = len(changes) - (conn.total_changes - before)
+        
+        if changes:
+            print(f"🔄 Migração de logins: {len(changes) - skipped} usuários normalizados")
+        if skipped:
+            print(f"⚠️  {skipped} usuários não normalizados (CPF/email duplicado após normalização)")
 
         
     
     def hash_password(self, password):
-        """Gera hash da senha usando SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Gera hash da senha com sal (scrypt/PBKDF2) no pool de hashing"""
+        return self.hash_pool.run(self.hasher.hash, password)
+    
+    def verify_password(self, password, stored):
+        """Confere a senha no pool de hashing (aceita hashes SHA-256 antigos)"""
+        return self.hash_pool.run(self.hasher.verify, password, stored)
+    
+    def dummy_hash(self):
+        """Hash descartável para conferir senhas de logins inexistentes"""
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash_password(os.urandom(16).hex())
+        return self._dummy_hash
+    
+    def rehash_password(self, user_id, password, stored):
+        """Regrava o hash no formato atual, em segundo plano, se o pool tiver folga"""
+        def rehash():
+            new_hash = self.hasher.hash(password)
+            with self.pool.connection() as conn:
+                # só troca se ninguém alterou o hash nesse meio tempo
+                conn.execute("UPDATE users SET senha_hash = ? WHERE id = ? AND senha_hash = ?",
+                             (new_hash, user_id, stored))
+                conn.commit()
+            self.invalidate_user(user_id)
+        
+        try:
+            self.hash_pool.submit(rehash)
+        except HashingBusy:
+            pass  # fica para o próximo login
+    
+    def invalidate_user(self, user_id):
+        """Descarta o perfil em cache depois de qualquer escrita no usuário"""
+        self.profile_cache.invalidate(user_id)
+    
+    @staticmethod
+    def busy_result(error):
+        """Resultado padrão quando o pool de hashing recusa o pedido"""
+        return {"success": False, "error": "Servidor ocupado, tente novamente em instantes",
+                "retry_after": error.retry_after}
     
 
 
     def create_user(self, nome, sobrenome, cpf, telefone, data_nascimento, email, senha):
         """Cria um novo usuário no banco de dados"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             senha_hash = self.hash_password(senha)
+            cpf = AuthValidator.normalize_cpf(cpf)
+            email = AuthValidator.normalize_email(email)
             
-            cursor.execute('''
-                INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash))
-            
-            user_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash))
+                
+                user_id = cursor.lastrowid
+                conn.commit()
             
             return {"success": True, "user_id": user_id}
         
+        except HashingBusy as e:
+            return self.busy_result(e)
+        
         except sqlite3.IntegrityError as e:
-            conn.close()
             if "cpf" in str(e).lower():
                 return {"success": False, "error": "CPF já cadastrado"}
             elif "email" in str(e).lower():
@@ -67,26 +431,30 @@ class Database:
                 return {"success": False, "error": "Dados já existem no sistema"}
         
         except Exception as e:
-            conn.close()
             return {"success": False, "error": f"Erro interno: {str(e)}"}
         
     
     def authenticate_user(self, login, senha):
         """Autentica usuário por email ou CPF"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            senha_hash = self.hash_password(senha)
+            login_type, login_key = AuthValidator.classify_login(login)
+            if login_type is None:
+                return {"success": False, "error": "Email/CPF ou senha incorretos"}
             
-            #busca por email ou CPF
-            cursor.execute('''
-                SELECT id, nome, sobrenome, email, cpf FROM users 
-                WHERE (email = ? OR cpf = ?) AND senha_hash = ?
-            ''', (login, login, senha_hash))
+            # uma busca pontual no índice UNIQUE da coluna certa
+            with self.pool.connection() as conn:
+                user = conn.execute(
+                    f"SELECT id, nome, sobrenome, email, cpf, senha_hash FROM users WHERE {login_type} = ?",
+                    (login_key,)
+                ).fetchone()
             
-            user = cursor.fetchone()
-            conn.close()
+            # senha conferida fora do SQL; login inexistente também paga um hash
+            if user is None:
+                self.verify_password(senha, self.dummy_hash())
+            elif not self.verify_password(senha, user[5]):
+                user = None
+            elif self.rehash_on_login and self.hasher.needs_rehash(user[5]):
+                self.rehash_password(user[0], senha, user[5])
             
             if user:
                 return {
@@ -102,6 +470,9 @@ class Database:
             else:
                 return {"success": False, "error": "Email/CPF ou senha incorretos"}
         
+        except HashingBusy as e:
+            return self.busy_result(e)
+        
         except Exception as e:
             return {"success": False, "error": f"Erro interno: {str(e)}"}
         
@@ -109,37 +480,51 @@ class Database:
 
 
     
+    def get_catalog_version(self):
+        """Contador de versão do catálogo (muda a cada escrita em products)"""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+    
+    def get_catalog(self):
+        """(versão, produtos ativos na ordem da vitrine) para o snapshot do catálogo"""
+        with self.pool.connection() as conn:
+            # versão lida antes: no pior caso o próximo refresh remonta de novo
+            version = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+            rows = conn.execute('''
+                SELECT id, nome, marca, descricao, notas, preco_centavos, desconto, categoria, imagem,
+                       pagina, posicao
+                FROM products WHERE ativo = 1 ORDER BY posicao, id
+            ''').fetchall()
+        return version, rows
+    
     def get_user_by_id(self, user_id):
-        """Busca usurio por ID"""
+        """Busca usurio por ID (cache de perfis na frente do SQLite)"""
+        cached = self.profile_cache.get(user_id)
+        if cached is not None:
+            return {"success": True, "user": dict(cached)}
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, nome, sobrenome, email, cpf, telefone, data_nascimento, created_at 
-                FROM users WHERE id = ?
-            ''', (user_id,))
-            
-            user = cursor.fetchone()
-            conn.close()
+            with self.pool.connection() as conn:
+                user = conn.execute('''
+                    SELECT id, nome, sobrenome, email, cpf, telefone, data_nascimento, created_at 
+                    FROM users WHERE id = ?
+                ''', (user_id,)).fetchone()
             
             if user:
-                return {
-                    "success": True,
-                    "user": {
-                        "id": user[0],
-                        "nome": user[1],
-                        "sobrenome": user[2],
-                        "email": user[3],
-                        "cpf": user[4],
-                        "telefone": user[5],
-                        "data_nascimento": user[6],
-                        "created_at": user[7]
-                    }
+                profile = {
+                    "id": user[0],
+                    "nome": user[1],
+                    "sobrenome": user[2],
+                    "email": user[3],
+                    "cpf": user[4],
+                    "telefone": user[5],
+                    "data_nascimento": user[6],
+                    "created_at": user[7]
                 }
+                self.profile_cache.put(user_id, profile)
+                return {"success": True, "user": dict(profile)}
             else:
                 return {"success": False, "error": "Usuário não encontrado"}
         
         except Exception as e:
             return {"success": False, "error": f"Erro interno: {str(e)}"}
-
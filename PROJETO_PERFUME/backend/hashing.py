@@ -0,0 +1,244 @@
+import base64
+import hashlib
+import hmac
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from backend.metrics import REGISTRY
+
+
+# Hash antigo: SHA-256 puro, sem sal, em hexadecimal
+LEGACY_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class HashingBusy(Exception):
+    """Fila de hashing cheia: o cliente deve tentar de novo mais tarde"""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Fila de hashing de senhas cheia")
+        self.retry_after = retry_after
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """Hash de senha com sal e fator de custo configurável.
+
+    Formatos gravados no banco:
+        scrypt$<n>$<r>$<p>$<sal>$<hash>
+        pbkdf2_sha256$<iterações>$<sal>$<hash>
+    Hashes SHA-256 antigos (64 hex) ainda são aceitos na verificação e
+    marcados para rehash.
+    """
+    algorithms = ('scrypt', 'pbkdf2_sha256')
+    salt_size = 16
+    key_size = 32
+
+    def __init__(self, algorithm='scrypt', scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1,
+                 pbkdf2_iterations=600000):
+        if algorithm not in self.algorithms:
+            raise ValueError(f"Algoritmo de hash desconhecido: {algorithm}")
+        if scrypt_n < 2 or scrypt_n & (scrypt_n - 1):
+            raise ValueError("SCRYPT_N deve ser potência de 2")
+        self.algorithm = algorithm
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+
+    def describe(self):
+        """Resumo dos parâmetros atuais (para logs e estatísticas)"""
+        if self.algorithm == 'scrypt':
+            return f"scrypt (n={self.scrypt_n}, r={self.scrypt_r}, p={self.scrypt_p})"
+        return f"pbkdf2_sha256 ({self.pbkdf2_iterations} iterações)"
+
+    @staticmethod
+    def _scrypt(password, salt, n, r, p, key_size):
+        # memória usada pelo scrypt ~ 128 * r * n bytes
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * r * (n + p), dklen=key_size)
+
+    def hash(self, password):
+        """Gera o hash no formato atual, com sal aleatório"""
+        salt = secrets.token_bytes(self.salt_size)
+        if self.algorithm == 'scrypt':
+            key = self._scrypt(password, salt, self.scrypt_n, self.scrypt_r, self.scrypt_p, self.key_size)
+            return (f"scrypt${self.scrypt_n}${self.scrypt_r}${self.scrypt_p}$"
+                    f"{_b64encode(salt)}${_b64encode(key)}")
+
+        key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.pbkdf2_iterations, self.key_size)
+        return f"pbkdf2_sha256${self.pbkdf2_iterations}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password, stored):
+        """Confere a senha com o hash gravado (qualquer formato suportado)"""
+        if LEGACY_SHA256_PATTERN.match(stored):
+            candidate = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(candidate, stored)
+
+        try:
+            parts = stored.split('$')
+            if parts[0] == 'scrypt' and len(parts) == 6:
+                n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+                expected = _b64decode(parts[5])
+                key = self._scrypt(password, _b64decode(parts[4]), n, r, p, len(expected))
+            elif parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+                expected = _b64decode(parts[3])
+                key = hashlib.pbkdf2_hmac('sha256', password.encode(), _b64decode(parts[2]),
+                                          int(parts[1]), len(expected))
+            else:
+                return False
+        except (ValueError, TypeError):
+            return False
+        return hmac.compare_digest(key, expected)
+
+    @staticmethod
+    def is_supported(stored):
+        """True se o hash gravado está num formato que verify entende"""
+        if LEGACY_SHA256_PATTERN.match(stored):
+            return True
+        parts = stored.split('$')
+        return (parts[0] == 'scrypt' and len(parts) == 6) or (parts[0] == 'pbkdf2_sha256' and len(parts) == 4)
+
+    def needs_rehash(self, stored):
+        """True para hashes antigos ou gerados com outros parâmetros"""
+        parts = stored.split('$')
+        if self.algorithm == 'scrypt':
+            return parts[:4] != ['scrypt', str(self.scrypt_n), str(self.scrypt_r), str(self.scrypt_p)]
+        return parts[:2] != ['pbkdf2_sha256', str(self.pbkdf2_iterations)]
+
+
+class HashingPool:
+    """Threads dedicadas ao hashing de senhas, com fila limitada.
+
+    scrypt e PBKDF2 liberam o GIL, então as threads usam vários núcleos sem
+    prender as threads de atendimento. Com a fila cheia, novos pedidos são
+    recusados na hora (HashingBusy) em vez de acumular latência. As threads
+    são criadas no primeiro uso e recriadas após fork.
+    """
+    # Amostras recentes usadas nos percentis de latência
+    sample_size = 1024
+
+    # Fila padrão por thread: limita a espera a poucos hashes
+    queue_per_worker = 4
+
+    def __init__(self, workers=2, queue_size=None, wait_timeout=10.0):
+        self.workers = workers
+        self.queue_size = queue_size or workers * self.queue_per_worker
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._threads = []
+        self._queue = None
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self._wait_samples = deque(maxlen=self.sample_size)
+        self._run_samples = deque(maxlen=self.sample_size)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f"hashing-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _worker_loop(self):
+        pending = self._queue
+        while True:
+            future, fn, args, queued_at = pending.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finished = time.perf_counter()
+            with self._lock:
+                self.completed += 1
+                self._wait_samples.append(started - queued_at)
+                self._run_samples.append(finished - started)
+
+    def submit(self, fn, *args):
+        """Enfileira fn(*args); levanta HashingBusy se a fila estiver cheia"""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy(self.retry_after())
+
+        with self._lock:
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def run(self, fn, *args):
+        """Executa fn(*args) no pool e espera o resultado"""
+        with REGISTRY.timer('hashing'):
+            future = self.submit(fn, *args)
+            try:
+                return future.result(timeout=self.wait_timeout)
+            except TimeoutError:
+                future.cancel()
+                with self._lock:
+                    self.timed_out += 1
+                raise HashingBusy(self.retry_after())
+
+    def retry_after(self):
+        """Segundos sugeridos no Retry-After: tempo estimado para esvaziar a fila"""
+        with self._lock:
+            samples = list(self._run_samples)
+        average = sum(samples) / len(samples) if samples else 0.1
+        depth = self._queue.qsize() if self._queue else 0
+        return max(1, round(depth * average / max(self.workers, 1)))
+
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return {'p50': 0.0, 'p99': 0.0}
+        ordered = sorted(samples)
+        pick = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+        return {'p50': round(pick(0.50), 2), 'p99': round(pick(0.99), 2)}
+
+    def stats(self):
+        """Profundidade da fila, contadores e latências (ms) recentes"""
+        with self._lock:
+            wait = list(self._wait_samples)
+            run = list(self._run_samples)
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': self._queue.qsize() if self._queue else 0,
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'wait_ms': self._percentiles(wait),
+                'run_ms': self._percentiles(run)
+            }
@@ -0,0 +1,208 @@
+import bisect
+import threading
+import time
+
+# Limites (segundos) dos buckets dos histogramas de latência
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    """Acumuladores de uma thread: só ela escreve, a coleta apenas lê"""
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}    # (métrica, labels) -> valor
+        self.histograms = {}  # (métrica, labels) -> [contagem por bucket..., soma, total]
+
+
+class _Timer:
+    __slots__ = ('metrics', 'operation', 'start')
+
+    def __init__(self, metrics, operation):
+        self.metrics = metrics
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe_operation(self.operation, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """Contadores e histogramas do servidor, exportados em texto Prometheus.
+
+    Cada thread acumula no próprio shard, sem lock no caminho da
+    requisição; `render` e `snapshot` somam os shards na hora da coleta.
+    Rotas fora de `routes` entram como "other" para o número de séries
+    não crescer com URLs arbitrárias.
+    """
+
+    help = {
+        'belle_http_requests_total': ('counter', 'Requisições atendidas por rota, método e status'),
+        'belle_http_requests_in_flight': ('gauge', 'Requisições em atendimento'),
+        'belle_http_response_bytes_total': ('counter', 'Bytes enviados nas respostas'),
+        'belle_http_request_duration_seconds': ('histogram', 'Latência das requisições por rota'),
+        'belle_operation_duration_seconds': ('histogram', 'Tempo de banco, hashing, sessões, estáticos e catálogo'),
+    }
+
+    def __init__(self, routes=(), buckets=DEFAULT_BUCKETS):
+        self.routes = set(routes)
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def route_label(self, path):
+        """Rota para os labels: /api/<recurso> conhecido, "static" ou "other" """
+        if not path.startswith('/api/'):
+            return 'static'
+        route = '/'.join(path.split('/', 4)[:3])
+        return route if route in self.routes else 'other'
+
+    def add(self, name, labels, value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(self.buckets) + 3)
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+    def observe_operation(self, operation, seconds):
+        self.observe('belle_operation_duration_seconds', (('operation', operation),), seconds)
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace[operation] = trace.get(operation, 0) + seconds
+
+    def start_trace(self):
+        """Passa a somar, só nesta thread, o tempo de cada operação da requisição"""
+        self._local.trace = {}
+
+    def end_trace(self):
+        """Tempos somados desde start_trace, em ms"""
+        trace = getattr(self._local, 'trace', None) or {}
+        self._local.trace = None
+        return {operation: round(seconds * 1000, 3) for operation, seconds in trace.items()}
+
+    def timer(self, operation):
+        """with metrics.timer('db'): ... mede o bloco"""
+        return _Timer(self, operation)
+
+    def request_started(self, route):
+        self.add('belle_http_requests_in_flight', (('route', route),))
+
+    def request_finished(self, route, method, status, seconds, bytes_sent):
+        route_label = (('route', route),)
+        self.add('belle_http_requests_in_flight', route_label, -1)
+        self.add('belle_http_requests_total', (('route', route), ('method', method), ('status', str(status))))
+        self.add('belle_http_response_bytes_total', route_label, bytes_sent)
+        self.observe('belle_http_request_duration_seconds', route_label, seconds)
+
+    def collect(self):
+        """Soma os shards: (contadores, histogramas)"""
+        with self._lock:
+            shards = list(self._shards)
+        counters, histograms = {}, {}
+        for shard in shards:
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, values in list(shard.histograms.items()):
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+        return counters, histograms
+
+    def quantile(self, histogram, q):
+        """Estimativa do quantil q a partir dos buckets (interpolação linear)"""
+        count = histogram[-1]
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(histogram[:-2]):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        """Resumo por rota e operação: total, média e p50/p95/p99 em ms"""
+        _, histograms = self.collect()
+        summary = {}
+        for (name, labels), histogram in sorted(histograms.items()):
+            count = histogram[-1]
+            summary.setdefault(name, {})[labels[0][1]] = {
+                'count': count,
+                'avg_ms': round(histogram[-2] / count * 1000, 3) if count else 0.0,
+                'p50_ms': round(self.quantile(histogram, 0.50) * 1000, 3),
+                'p95_ms': round(self.quantile(histogram, 0.95) * 1000, 3),
+                'p99_ms': round(self.quantile(histogram, 0.99) * 1000, 3),
+            }
+        return summary
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        items = labels + extra
+        if not items:
+            return ''
+        escaped = (f'{key}="{_escape(value)}"' for key, value in items)
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        """Todas as métricas no formato de texto do Prometheus (0.0.4)"""
+        counters, histograms = self.collect()
+        series = {}
+        for (name, labels), value in sorted(counters.items()):
+            series.setdefault(name, []).append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for i, bucket_count in enumerate(histogram[:-2]):
+                cumulative += bucket_count
+                le = f"{self.buckets[i]:g}" if i < len(self.buckets) else '+Inf'
+                lines.append(f"{name}_bucket{self._labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {histogram[-2]:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {histogram[-1]}")
+
+        output = []
+        for name in sorted(series):
+            kind, description = self.help[name]
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+
+def _escape(value):
+    """Escapa valor de label (barra invertida, aspas e quebra de linha)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Registro usado pelo servidor, pelo pool de conexões e pelo de hashing
+REGISTRY = Metrics(routes=(
+    '/api/register', '/api/login', '/api/logout', '/api/profile',
+    '/api/check-auth', '/api/server-stats', '/api/metrics', '/api/products',
+    '/api/search', '/api/suggest', '/api/cart', '/api/checkout', '/api/orders',
+))
@@ -0,0 +1,410 @@
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from backend.cart import CartStore
+from backend.metrics import REGISTRY
+from backend.utils import ResponseBuilder
+
+_IDEMPOTENCY_KEY = re.compile(r'^[A-Za-z0-9_.:-]{8,128}$')
+_ORDER_PATH = re.compile(r'^/api/orders/(\d{1,18})(?:/(confirm|cancel))?/?$')
+
+ORDER_NOT_FOUND = (404, ResponseBuilder.error("Pedido não encontrado"))
+
+
+class _Rollback(Exception):
+    """Desfaz o pedido (até o SAVEPOINT) e responde `response` em vez de falhar o lote.
+
+    O que o pedido agendou com after_commit (esgotados vistos, contadores)
+    continua valendo: foi observado no banco, não escrito.
+    """
+
+    def __init__(self, status, body):
+        super().__init__(body.get('message'))
+        self.response = (status, body)
+
+
+class CheckoutService:
+    """Pedidos com reserva de estoque, para picos de compra em poucos produtos.
+
+    A baixa do estoque é um UPDATE condicional (`disponivel >= quantidade`)
+    e a tabela ainda recusa saldo negativo, então não há venda acima do
+    estoque mesmo com vários processos. O pedido nasce `reservado`, com
+    prazo de `reservation_ttl` segundos para ser confirmado; reservas
+    vencidas devolvem o estoque (`expirado`). A chave de idempotência
+    (única por usuário) faz um reenvio devolver o mesmo pedido.
+
+    As threads de atendimento não disputam o lock de escrita do SQLite:
+    reservas e devoluções entram numa fila e uma única thread por
+    processo as aplica em lotes de até `batch_size`, cada pedido no seu
+    SAVEPOINT e um commit por lote. Produtos que zeraram ficam marcados
+    como esgotados por `soldout_ttl` segundos e novos pedidos com eles são
+    recusados antes da fila, sem tocar no banco. Essas marcas e os
+    contadores só mudam depois do commit (after_commit): se o lote falha,
+    a memória continua igual ao banco.
+    """
+
+    reservation_ttl = 600.0
+    batch_size = 64
+    queue_size = 4096
+    # Espera máxima pela fila antes de responder 503 (o reenvio com a mesma chave é seguro)
+    wait_timeout = 5.0
+    sweep_interval = 5.0
+    soldout_ttl = 1.0
+
+    def __init__(self, db, catalog, carts):
+        self.db = db
+        self.catalog = catalog
+        self.carts = carts
+        self._lock = threading.Lock()
+        self._writer_pid = None
+        self._queue = None
+        # produto -> instante (monotonic) até quando conta como esgotado
+        self._soldout = {}
+        # mudanças em memória da transação em andamento nesta thread
+        self._local = threading.local()
+        self.reserved = 0
+        self.sold_out = 0
+        self.fast_rejected = 0
+        self.replayed = 0
+        self.busy = 0
+        self.confirmed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.batches = 0
+        self.batched_jobs = 0
+        self.max_batch = 0
+
+    def _ensure_writer(self):
+        """Thread de escrita do estoque, uma por processo (recriada após fork)"""
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._soldout = {}
+            thread = threading.Thread(target=self._writer_loop, args=(self._queue,),
+                                      name="inventory-writer", daemon=True)
+            thread.start()
+            self._writer_pid = os.getpid()
+
+    def _writer_loop(self, pending):
+        next_sweep = time.monotonic() + self.sweep_interval
+        while True:
+            try:
+                jobs = [pending.get(timeout=max(0.0, next_sweep - time.monotonic()))]
+            except queue.Empty:
+                jobs = []
+            while jobs and len(jobs) < self.batch_size:
+                try:
+                    jobs.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            jobs = [job for job in jobs if job[0].set_running_or_notify_cancel()]
+            if jobs:
+                self.run_batch(jobs)
+            if time.monotonic() >= next_sweep:
+                try:
+                    self.expire_reservations()
+                except Exception as e:
+                    print(f"⚠️  Erro ao expirar reservas: {e}", file=sys.stderr)
+                next_sweep = time.monotonic() + self.sweep_interval
+
+    @contextmanager
+    def write_transaction(self):
+        """BEGIN IMMEDIATE ... commit; o agendado com after_commit só é aplicado se o commit der certo"""
+        effects = []
+        self._local.effects = effects
+        try:
+            with REGISTRY.timer('inventory'), self.db.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn, effects
+                conn.commit()
+        finally:
+            self._local.effects = None
+        for fn, args in effects:
+            fn(*args)
+
+    def after_commit(self, fn, *args):
+        """Agenda fn(*args) para depois do commit da transação desta thread"""
+        self._local.effects.append((fn, args))
+
+    def count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def run_batch(self, jobs):
+        """Aplica os pedidos do lote numa só transação; cada um responde ao seu Future depois do commit"""
+        results = []
+        try:
+            with self.write_transaction() as (conn, effects):
+                for _, fn, args in jobs:
+                    conn.execute("SAVEPOINT pedido")
+                    scheduled = len(effects)
+                    try:
+                        results.append(fn(conn, *args))
+                        conn.execute("RELEASE pedido")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO pedido")
+                        conn.execute("RELEASE pedido")
+                        if not isinstance(e, _Rollback):
+                            del effects[scheduled:]
+                        results.append(e.response if isinstance(e, _Rollback) else e)
+        except Exception as e:
+            # nada foi gravado: todos podem reenviar com a mesma chave
+            print(f"⚠️  Erro ao gravar lote de pedidos: {e}", file=sys.stderr)
+            for future, _, _ in jobs:
+                future.set_result(self.busy_response())
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.batched_jobs += len(jobs)
+            self.max_batch = max(self.max_batch, len(jobs))
+        for (future, _, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def enqueue(self, fn, *args):
+        """Executa fn(conn, *args) na thread de escrita e espera o (status, corpo)"""
+        if self._writer_pid != os.getpid():
+            self._ensure_writer()
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args))
+        except queue.Full:
+            return self.busy_response()
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except TimeoutError:
+            future.cancel()
+            return self.busy_response()
+
+    def busy_response(self):
+        with self._lock:
+            self.busy += 1
+        return 503, {"success": False, "error": "Muitos pedidos ao mesmo tempo, tente novamente em instantes",
+                     "retry_after": 1}
+
+    def is_sold_out(self, product_id):
+        until = self._soldout.get(product_id)
+        return until is not None and until > time.monotonic()
+
+    def mark_sold_out(self, product_id):
+        self._soldout[product_id] = time.monotonic() + self.soldout_ttl
+
+    def clear_sold_out(self, product_id):
+        self._soldout.pop(product_id, None)
+
+    @staticmethod
+    def valid_key(key):
+        return isinstance(key, str) and bool(_IDEMPOTENCY_KEY.match(key))
+
+    def checkout(self, user_id, idempotency_key):
+        """Reserva o carrinho do usuário; (status, corpo) com o pedido"""
+        if not self.valid_key(idempotency_key):
+            return 400, ResponseBuilder.error("Envie o cabeçalho Idempotency-Key (8 a 128 letras, números ou _.:-)")
+
+        with self.db.pool.connection() as conn:
+            existing = self.find_order(conn, user_id, idempotency_key=idempotency_key)
+            items, _ = CartStore.load(conn, user_id)
+        if existing:
+            with self._lock:
+                self.replayed += 1
+            return 200, ResponseBuilder.success(data={'order': existing, 'replayed': True})
+        if not items:
+            return 400, ResponseBuilder.error("Carrinho vazio")
+
+        by_id = self.catalog.snapshot().by_id
+        unavailable = [product_id for product_id in items
+                       if product_id not in by_id or self.is_sold_out(product_id)]
+        if unavailable:
+            with self._lock:
+                self.fast_rejected += 1
+            return 409, dict(ResponseBuilder.error("Produto esgotado ou indisponível"), esgotados=unavailable)
+
+        lines = [(product_id, quantity, by_id[product_id]['preco_centavos']) for product_id, quantity in items.items()]
+        return self.enqueue(self.reserve, user_id, idempotency_key, lines)
+
+    def reserve(self, conn, user_id, idempotency_key, lines):
+        """Baixa o estoque de cada item e grava o pedido (na thread de escrita)"""
+        # outro processo pode ter gravado a mesma chave enquanto o pedido esperava na fila
+        existing = self.find_order(conn, user_id, idempotency_key=idempotency_key)
+        if existing:
+            self.after_commit(self.count, 'replayed')
+            return 200, ResponseBuilder.success(data={'order': existing, 'replayed': True})
+
+        unavailable, emptied = [], []
+        for product_id, quantity, _ in lines:
+            if self.is_sold_out(product_id):
+                unavailable.append(product_id)
+                continue
+            row = conn.execute('''
+                UPDATE inventory SET disponivel = disponivel - ?
+                WHERE product_id = ? AND disponivel >= ?
+                RETURNING disponivel
+            ''', (quantity, product_id, quantity)).fetchone()
+            if row is None:
+                unavailable.append(product_id)
+                left = conn.execute("SELECT disponivel FROM inventory WHERE product_id = ?", (product_id,)).fetchone()
+                if left is None or left[0] == 0:
+                    self.after_commit(self.mark_sold_out, product_id)
+            elif row[0] == 0:
+                emptied.append(product_id)
+        if unavailable:
+            self.after_commit(self.count, 'sold_out')
+            raise _Rollback(409, dict(ResponseBuilder.error("Estoque insuficiente"), esgotados=unavailable))
+
+        total = sum(quantity * price for _, quantity, price in lines)
+        expires_at = time.time() + self.reservation_ttl
+        order_id = conn.execute('''
+            INSERT INTO orders (user_id, idempotency_key, status, total_centavos, expires_at)
+            VALUES (?, ?, 'reservado', ?, ?)
+        ''', (user_id, idempotency_key, total, expires_at)).lastrowid
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantidade, preco_centavos) VALUES (?, ?, ?, ?)",
+            [(order_id, product_id, quantity, price) for product_id, quantity, price in lines]
+        )
+        for product_id in emptied:
+            self.after_commit(self.mark_sold_out, product_id)
+        self.after_commit(self.count, 'reserved')
+        order = self.order_dict(order_id, 'reservado', total, expires_at, lines)
+        return 200, ResponseBuilder.success(data={'order': order, 'replayed': False})
+
+    def restock(self, conn, order_ids):
+        """Devolve ao estoque os itens dos pedidos (na transação de quem chama)"""
+        placeholders = ', '.join('?' * len(order_ids))
+        returned = conn.execute(f'''
+            SELECT product_id, SUM(quantidade) FROM order_items
+            WHERE order_id IN ({placeholders}) GROUP BY product_id
+        ''', order_ids).fetchall()
+        conn.executemany("UPDATE inventory SET disponivel = disponivel + ? WHERE product_id = ?",
+                         [(quantity, product_id) for product_id, quantity in returned])
+        for product_id, _ in returned:
+            self.after_commit(self.clear_sold_out, product_id)
+
+    def expire_reservations(self, limit=500):
+        """Marca como `expirado` as reservas vencidas e devolve o estoque; devolve quantas"""
+        # sem nada vencido a varredura só lê: o lock de escrita fica livre para os pedidos
+        with self.db.pool.connection() as conn:
+            if not self.due_reservations(conn, time.time(), 1):
+                return 0
+        with self.write_transaction() as (conn, _):
+            # relido na transação: outro processo pode ter confirmado ou expirado antes
+            expired = self.due_reservations(conn, time.time(), limit)
+            if expired:
+                conn.executemany("UPDATE orders SET status = 'expirado', expires_at = NULL WHERE id = ?",
+                                 [(order_id,) for order_id in expired])
+                self.restock(conn, expired)
+                self.after_commit(self.count, 'expired', len(expired))
+        return len(expired)
+
+    @staticmethod
+    def due_reservations(conn, now, limit):
+        """Ids das reservas vencidas até `now`"""
+        return [order_id for order_id, in conn.execute('''
+            SELECT id FROM orders WHERE status = 'reservado' AND expires_at <= ? LIMIT ?
+        ''', (now, limit))]
+
+    def cancel(self, conn, user_id, order_id):
+        """Cancela uma reserva e devolve o estoque (na thread de escrita)"""
+        changed = conn.execute('''
+            UPDATE orders SET status = 'cancelado', expires_at = NULL
+            WHERE id = ? AND user_id = ? AND status = 'reservado'
+        ''', (order_id, user_id)).rowcount
+        if changed:
+            self.restock(conn, [order_id])
+            self.after_commit(self.count, 'cancelled')
+        order = self.find_order(conn, user_id, order_id=order_id)
+        if order is None:
+            return ORDER_NOT_FOUND
+        if order['status'] != 'cancelado':
+            return 409, ResponseBuilder.error(f"Pedido {order['status']} não pode ser cancelado")
+        return 200, ResponseBuilder.success(data={'order': order})
+
+    def confirm(self, conn, user_id, order_id):
+        """Confirma a reserva dentro do prazo e tira os itens comprados do carrinho (na thread de escrita)"""
+        changed = conn.execute('''
+            UPDATE orders SET status = 'confirmado', expires_at = NULL
+            WHERE id = ? AND user_id = ? AND status = 'reservado' AND expires_at > ?
+        ''', (order_id, user_id, time.time())).rowcount
+        order = self.find_order(conn, user_id, order_id=order_id)
+        if changed:
+            self.carts.remove_items(conn, user_id, [(item['id'], item['quantidade']) for item in order['items']])
+            self.after_commit(self.count, 'confirmed')
+        if order is None:
+            return ORDER_NOT_FOUND
+        if order['status'] == 'reservado':
+            # venceu e a varredura ainda não passou: o estoque volta na próxima
+            return 409, ResponseBuilder.error("Reserva expirada")
+        if order['status'] != 'confirmado':
+            return 409, ResponseBuilder.error(f"Pedido {order['status']} não pode ser confirmado")
+        return 200, ResponseBuilder.success(data={'order': order})
+
+    def order_action(self, user_id, method, path):
+        """(status, corpo) de GET /api/orders/<id> e POST /api/orders/<id>/confirm|cancel"""
+        match = _ORDER_PATH.match(path)
+        if match is None:
+            return ORDER_NOT_FOUND
+        order_id, action = int(match.group(1)), match.group(2)
+        if method == 'GET' and action is None:
+            with self.db.pool.connection() as conn:
+                order = self.find_order(conn, user_id, order_id=order_id)
+            return (200, ResponseBuilder.success(data={'order': order})) if order else ORDER_NOT_FOUND
+        if method == 'POST' and action == 'confirm':
+            return self.enqueue(self.confirm, user_id, order_id)
+        if method == 'POST' and action == 'cancel':
+            return self.enqueue(self.cancel, user_id, order_id)
+        return ORDER_NOT_FOUND
+
+    def find_order(self, conn, user_id, order_id=None, idempotency_key=None):
+        """Pedido do usuário pelo id ou pela chave de idempotência, ou None"""
+        column, value = ('id', order_id) if order_id is not None else ('idempotency_key', idempotency_key)
+        row = conn.execute(f'''
+            SELECT id, status, total_centavos, expires_at FROM orders WHERE user_id = ? AND {column} = ?
+        ''', (user_id, value)).fetchone()
+        if row is None:
+            return None
+        lines = conn.execute(
+            "SELECT product_id, quantidade, preco_centavos FROM order_items WHERE order_id = ?", (row[0],)
+        ).fetchall()
+        return self.order_dict(*row, lines)
+
+    @staticmethod
+    def order_dict(order_id, status, total, expires_at, lines):
+        return {
+            'id': order_id,
+            'status': status,
+            'items': [{'id': product_id, 'quantidade': quantity, 'preco': price / 100}
+                      for product_id, quantity, price in lines],
+            'total': total / 100,
+            'total_centavos': total,
+            'expires_at': datetime.fromtimestamp(expires_at, timezone.utc).isoformat(timespec='seconds')
+            if expires_at else None
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize() if self._queue else 0,
+                'batches': self.batches,
+                'average_batch': round(self.batched_jobs / self.batches, 2) if self.batches else 0.0,
+                'max_batch': self.max_batch,
+                'reserved': self.reserved,
+                'sold_out': self.sold_out,
+                'fast_rejected': self.fast_rejected,
+                'replayed': self.replayed,
+                'busy': self.busy,
+                'confirmed': self.confirmed,
+                'cancelled': self.cancelled,
+                'expired': self.expired,
+                'sold_out_products': sorted(product_id for product_id, until in list(self._soldout.items())
+                                           if until > time.monotonic())
+            }
@@ -0,0 +1,141 @@
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def reuse_port_supported():
+    """Verifica se o sistema oferece SO_REUSEPORT"""
+    return hasattr(socket, 'SO_REUSEPORT')
+
+
+def create_listen_socket(port, backlog=128):
+    """Cria o socket em listen que os workers herdam após o fork"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("", port))
+    sock.listen(backlog)
+    return sock
+
+
+class PreforkSupervisor:
+    """Mantém N processos worker atendendo a mesma porta.
+
+    Com SO_REUSEPORT cada worker abre o próprio socket e o kernel distribui
+    as conexões; sem ele, o pai abre o socket e os filhos o herdam no fork.
+    Workers que morrem são recriados.
+    """
+    # Worker que morre antes disso conta como falha de inicialização
+    min_uptime = 2.0
+    max_restart_delay = 30.0
+
+    def __init__(self, port, processes, serve, backlog=128, reuse_port=True, on_worker_start=None):
+        """
+        serve(sock, reuse_port): roda o servidor no worker até o fim do processo
+        on_worker_start(index): chamado no filho logo após o fork
+        """
+        self.port = port
+        self.processes = processes
+        self.serve = serve
+        self.backlog = backlog
+        self.reuse_port = reuse_port and reuse_port_supported()
+        self.on_worker_start = on_worker_start
+        self.sock = None
+        self.children = {}  # pid -> (índice, instante do fork)
+        self.restart_delay = {}  # índice -> atraso do próximo restart
+        self.running = False
+
+    def run(self):
+        """Cria os workers e os supervisiona até receber sinal de parada"""
+        if not self.reuse_port:
+            self.sock = create_listen_socket(self.port, self.backlog)
+
+        self.running = True
+        try:
+            for index in range(self.processes):
+                self.spawn(index)
+
+            while self.running:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                self.handle_exit(pid, status)
+        finally:
+            self.running = False
+            self.stop_children()
+            if self.sock is not None:
+                self.sock.close()
+
+    def spawn(self, index):
+        """Cria um worker; no filho, roda o servidor e nunca retorna"""
+        # Evita que o filho herde e repita saída ainda no buffer do pai
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid:
+            self.children[pid] = (index, time.monotonic())
+            return pid
+
+        exit_code = 0
+        try:
+            # Ctrl+C chega ao grupo inteiro; quem decide o fim é o supervisor
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            if self.on_worker_start:
+                self.on_worker_start(index)
+            self.serve(self.sock, self.reuse_port)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 0
+        except BaseException as e:
+            print(f"❌ Worker {index} (pid {os.getpid()}) falhou: {e}")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(exit_code)
+
+    def handle_exit(self, pid, status):
+        """Recria o worker que terminou, com atraso crescente em falhas seguidas"""
+        index, started_at = self.children.pop(pid, (None, 0))
+        if index is None or not self.running:
+            return
+
+        code = os.waitstatus_to_exitcode(status)
+        print(f"⚠️  Worker {index} (pid {pid}) terminou com código {code}; reiniciando")
+
+        if time.monotonic() - started_at < self.min_uptime:
+            delay = min(self.restart_delay.get(index, 0.5) * 2, self.max_restart_delay)
+            self.restart_delay[index] = delay
+            time.sleep(delay)
+        else:
+            self.restart_delay.pop(index, None)
+
+        if self.running:
+            self.spawn(index)
+
+    def stop_children(self, timeout=10.0):
+        """Envia SIGTERM aos workers e espera que terminem"""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+        deadline = time.monotonic() + timeout
+        while self.children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.children.pop(pid, None)
+            else:
+                time.sleep(0.05)
+
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
@@ -0,0 +1,161 @@
+import cProfile
+import json
+import os
+import pstats
+import queue
+import random
+import re
+import threading
+import time
+
+
+class SlowRequestProfiler:
+    """Perfis cProfile das requisições lentas, gravados num diretório rotativo.
+
+    Uma fração `sample_rate` das requisições roda com o cProfile ligado; se
+    ela passar de `threshold_ms`, o perfil (.prof, abre com pstats ou
+    snakeviz) e um resumo .json com rota, status, tempos por operação e
+    funções mais caras vão para `directory`. A gravação fica numa thread
+    separada e os arquivos mais antigos saem quando o total passa de
+    `max_bytes`.
+    """
+    # Funções listadas no resumo .json
+    top_functions = 25
+
+    def __init__(self, directory, threshold_ms=500, sample_rate=0.05, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue(maxsize=16)
+        self._writer_pid = None
+        self._lock = threading.Lock()
+        self.slow = 0
+        self.captured = 0
+        self.dropped = 0
+        self.removed = 0
+        self.disk_usage = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Profile ligado para esta requisição, ou None se ela não foi sorteada"""
+        if random.random() >= self.sample_rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # outro profiler já está ativo nesta thread/processo
+            return None
+        return profile
+
+    def finish(self, profile, seconds, info):
+        """Desliga o profile e agenda a gravação se a requisição foi lenta"""
+        if profile is not None:
+            profile.disable()
+        if seconds < self.threshold:
+            return
+        with self._lock:
+            self.slow += 1
+        if profile is None:
+            return
+
+        info = dict(info, duration_ms=round(seconds * 1000, 2), timestamp=time.time(), pid=os.getpid())
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((profile, info))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _ensure_writer(self):
+        """Thread de gravação, uma por processo (recriada após fork)"""
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=16)
+            thread = threading.Thread(target=self._write_loop, name="slow-profiles", daemon=True)
+            thread.start()
+            self._writer_pid = os.getpid()
+
+    def _write_loop(self):
+        while True:
+            profile, info = self._queue.get()
+            try:
+                self.write(profile, info)
+            except Exception as e:
+                print(f"⚠️  Erro ao gravar perfil de requisição lenta: {e}")
+
+    def write(self, profile, info):
+        """Grava <data>_<rota>_<ms>.prof e o resumo .json; devolve o caminho base"""
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(info['timestamp']))
+        millis = int(info['timestamp'] * 1000) % 1000
+        route = re.sub(r'[^A-Za-z0-9]+', '-', info.get('route', '')).strip('-') or 'root'
+        base = os.path.join(self.directory,
+                            f"{stamp}.{millis:03d}_{info['pid']}_{route}_{int(info['duration_ms'])}ms")
+
+        stats = pstats.Stats(profile)
+        stats.dump_stats(base + '.prof')
+
+        ranked = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        info['top_functions'] = [
+            {
+                'function': f"{os.path.basename(filename)}:{line}({name})",
+                'calls': calls,
+                'total_ms': round(total * 1000, 3),
+                'cumulative_ms': round(cumulative * 1000, 3)
+            }
+            for (filename, line, name), (_, calls, total, cumulative, _) in ranked[:self.top_functions]
+        ]
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False, indent=2)
+
+        with self._lock:
+            self.captured += 1
+        self.rotate()
+        return base
+
+    def rotate(self):
+        """Apaga os perfis mais antigos até o diretório caber em max_bytes.
+
+        Relê o diretório a cada vez: no modo PROCESSES vários workers gravam nele.
+        """
+        files = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(('.prof', '.json')):
+                path = os.path.join(self.directory, name)
+                try:
+                    files.append((path, os.path.getsize(path)))
+                except OSError:
+                    pass
+        usage = sum(size for _, size in files)
+        removed = 0
+        # nomes começam pela data: a ordem alfabética é a cronológica
+        for path, size in files:
+            if usage <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            usage -= size
+        with self._lock:
+            self.disk_usage = usage
+            self.removed += removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'threshold_ms': round(self.threshold * 1000, 1),
+                'sample_rate': self.sample_rate,
+                'slow_requests': self.slow,
+                'captured': self.captured,
+                'dropped': self.dropped,
+                'disk_bytes': self.disk_usage,
+                'max_bytes': self.max_bytes,
+                'removed': self.removed
+            }
@@ -0,0 +1,144 @@
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from backend.auth import AuthValidator
+
+# rota -> {escopo: (tentativas, em segundos)}; escopos: 'ip' e 'login' (email/CPF)
+DEFAULT_RULES = {
+    '/api/login': {'ip': (30, 60), 'login': (10, 300)},
+    '/api/register': {'ip': (10, 600), 'login': (3, 600)},
+}
+
+
+def client_key(address):
+    """Chave do cliente: o IP, ou a rede /64 no IPv6 (um cliente costuma ter o bloco inteiro)"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return address
+    if ip.version == 4:
+        return address
+    if ip.ipv4_mapped is not None:
+        return str(ip.ipv4_mapped)
+    return str(ipaddress.ip_network(f'{ip}/64', strict=False))
+
+
+def login_identifiers(path, data):
+    """Emails/CPFs do corpo, normalizados como no banco, que contam no limite por login"""
+    if not isinstance(data, dict):
+        return ()
+    if path == '/api/login':
+        login = data.get('login')
+        if isinstance(login, str):
+            _, value = AuthValidator.classify_login(login.strip())
+            return (value,) if value else ()
+        return ()
+    identifiers = []
+    if isinstance(data.get('email'), str):
+        identifiers.append(AuthValidator.normalize_email(data['email']))
+    if isinstance(data.get('cpf'), str):
+        identifiers.append(AuthValidator.normalize_cpf(data['cpf']))
+    return tuple(value for value in identifiers if value)
+
+
+class RateLimiter:
+    """Limite de tentativas por token bucket, por rota, por IP e por login.
+
+    Cada (rota, escopo, chave) tem um balde de `tentativas` fichas que
+    volta a encher no ritmo de `tentativas / segundos`; cada requisição
+    gasta uma ficha de todos os baldes que lhe dizem respeito (o do IP e
+    o de cada email/CPF do corpo), e só passa se todos tiverem ficha.
+    Recusada, nada é gasto e `retry_after` diz quando o balde mais vazio
+    terá ficha de novo.
+
+    Baldes cheios valem o mesmo que baldes inexistentes: a tabela, em
+    ordem de último uso, descarta da frente os que já voltaram a encher,
+    e nunca passa de `max_buckets` (acima disso sai o usado há mais tempo).
+    Os limites valem por processo (com PROCESSES>1, cada worker conta os
+    seus).
+    """
+
+    def __init__(self, rules=None, max_buckets=100000):
+        self.rules = {route: dict(scopes) for route, scopes in DEFAULT_RULES.items()}
+        for route, scopes in (rules or {}).items():
+            self.rules.setdefault(route, {}).update(scopes)
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # (rota, escopo, chave) -> (fichas, atualizado em, cheio em)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = {}
+        self.idle_evictions = 0
+        self.full_evictions = 0
+
+    def check(self, path, client, data=None):
+        """None se a requisição pode seguir; senão o resultado com `error` e `retry_after`"""
+        scopes = self.rules.get(path)
+        if not scopes:
+            return None
+        keys = []
+        if 'ip' in scopes:
+            keys.append(('ip', client_key(client), scopes['ip']))
+        if 'login' in scopes:
+            keys.extend(('login', value, scopes['login']) for value in login_identifiers(path, data))
+
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            taken = []
+            wait = 0.0
+            blocked = None
+            for scope, key, (capacity, period) in keys:
+                if capacity <= 0:
+                    continue
+                rate = capacity / period
+                bucket_key = (path, scope, key)
+                bucket = self._buckets.get(bucket_key)
+                tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                if tokens < 1 and (1 - tokens) / rate > wait:
+                    wait = (1 - tokens) / rate
+                    blocked = scope
+                taken.append((bucket_key, tokens - 1, (capacity - tokens + 1) / rate))
+
+            if blocked is not None:
+                label = f'{path}:{blocked}'
+                self.limited[label] = self.limited.get(label, 0) + 1
+                retry_after = max(1, math.ceil(wait))
+                return {
+                    "success": False,
+                    "error": f"Muitas tentativas. Tente novamente em {retry_after} segundos.",
+                    "retry_after": retry_after
+                }
+
+            for bucket_key, tokens, refill in taken:
+                self._buckets[bucket_key] = (tokens, now, now + refill)
+                self._buckets.move_to_end(bucket_key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+                self.full_evictions += 1
+            self.allowed += 1
+        return None
+
+    def _evict_idle(self, now):
+        """Descarta da frente (menos recentes) os baldes que já voltaram a encher"""
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[2] > now:
+                break
+            del self._buckets[key]
+            self.idle_evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rules': {route: {scope: f'{capacity}/{period:g}s' for scope, (capacity, period) in scopes.items()}
+                          for route, scopes in self.rules.items()},
+                'buckets': len(self._buckets),
+                'max_buckets': self.max_buckets,
+                'allowed': self.allowed,
+                'limited': dict(sorted(self.limited.items())),
+                'idle_evictions': self.idle_evictions,
+                'full_evictions': self.full_evictions
+            }
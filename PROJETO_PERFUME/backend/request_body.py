@@ -0,0 +1,109 @@
+import codecs
+import threading
+
+
+class BodyRejected(Exception):
+    """Corpo recusado; `status` é o código HTTP a responder (a conexão é fechada)"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class BodyPolicy:
+    """Limites do corpo das requisições POST, por rota.
+
+    `check` decide só pelos cabeçalhos (antes de ler qualquer byte do
+    corpo): sem Content-Length válido -> 411/400, acima do limite da rota
+    -> 413, tipo não suportado -> 415. `timeout` é o tempo total para
+    receber o corpo, contra envios propositalmente lentos.
+    """
+
+    media_types = ('application/json', 'application/x-www-form-urlencoded')
+    chunk_size = 16 * 1024
+
+    def __init__(self, limits=None, default_limit=16 * 1024, timeout=10.0):
+        self.limits = {
+            '/api/register': 4 * 1024,
+            '/api/login': 1024,
+            '/api/logout': 1024,
+            '/api/checkout': 1024,
+        }
+        self.limits.update(limits or {})
+        self.default_limit = default_limit
+        self.timeout = timeout
+        self.rejected = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, path):
+        return self.limits.get(path, self.default_limit)
+
+    def check(self, path, headers, check_type=True):
+        """Tamanho do corpo a ler; BodyRejected se a requisição deve ser recusada"""
+        if headers.get('Transfer-Encoding'):
+            self.reject(411, "Envie o corpo com Content-Length")
+
+        raw_length = headers.get('Content-Length')
+        try:
+            length = int(raw_length) if raw_length else 0
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.reject(400, "Content-Length inválido")
+
+        if length > self.limit_for(path):
+            self.reject(413, "Corpo da requisição muito grande")
+
+        if check_type and length:
+            media_type = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+            if media_type not in self.media_types:
+                self.reject(415, "Tipo de conteúdo não suportado")
+        return length
+
+    def rejection(self, status, message):
+        """Conta a recusa e devolve a exceção correspondente"""
+        with self._lock:
+            self.rejected[status] = self.rejected.get(status, 0) + 1
+        return BodyRejected(status, message)
+
+    def reject(self, status, message):
+        raise self.rejection(status, message)
+
+    def stats(self):
+        return {
+            'limits': dict(self.limits),
+            'default_limit': self.default_limit,
+            'timeout': self.timeout,
+            'rejected': {str(status): count for status, count in sorted(self.rejected.items())}
+        }
+
+
+class BodyDecoder:
+    """Decodifica o corpo em UTF-8 à medida que os pedaços chegam.
+
+    UTF-8 inválido é recusado no pedaço em que aparece, sem esperar o
+    resto do corpo; ao final devolve o texto pronto para o parse. Só a
+    decodificação é incremental: JSON e formulário são interpretados
+    depois, no texto inteiro (o json da biblioteca padrão não tem parser
+    em fluxo). A memória fica limitada pelos limites de tamanho por rota
+    do BodyPolicy, verificados antes da leitura.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._parts = []
+
+    def feed(self, chunk):
+        try:
+            self._parts.append(self._decoder.decode(chunk))
+        except UnicodeDecodeError:
+            self.policy.reject(400, "Corpo não está em UTF-8")
+
+    def finish(self):
+        try:
+            self._parts.append(self._decoder.decode(b'', final=True))
+        except UnicodeDecodeError:
+            self.policy.reject(400, "Corpo não está em UTF-8")
+        return ''.join(self._parts)
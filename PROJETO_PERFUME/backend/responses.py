@@ -0,0 +1,94 @@
+import json
+import time
+from email.utils import formatdate
+from http import HTTPStatus
+
+from backend.utils import ResponseBuilder
+
+# Um só encoder: json.dumps(..., ensure_ascii=False) cria outro a cada chamada
+_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def encode_json(data):
+    """Serializa para o corpo da resposta (bytes UTF-8)"""
+    return _encoder.encode(data).encode('utf-8')
+
+
+# Corpos das respostas mais frequentes, serializados uma única vez
+NOT_AUTHENTICATED = encode_json(ResponseBuilder.error("Não autenticado"))
+INVALID_SESSION = encode_json(ResponseBuilder.error("Sessão inválida"))
+ANONYMOUS = encode_json(ResponseBuilder.success(data={'authenticated': False}))
+ENDPOINT_NOT_FOUND = encode_json(ResponseBuilder.error("Endpoint não encontrado"))
+LOGOUT_OK = encode_json(ResponseBuilder.success(message="Logout realizado com sucesso!"))
+
+# Cabeçalhos fixos de toda resposta JSON (Content-Type e CORS), nos dois motores
+JSON_HEADERS = (
+    ('Content-Type', 'application/json'),
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
+    ('Access-Control-Allow-Headers', 'Content-Type, Authorization'),
+)
+
+
+class JSONResponseWriter:
+    """Monta a resposta JSON inteira (status, cabeçalhos e corpo) num só bytes.
+
+    Linhas de status e cabeçalhos fixos (Content-Type e CORS) ficam prontos
+    em bytes; o Date é refeito no máximo uma vez por segundo. O handler
+    envia o resultado com uma única escrita no socket.
+    """
+
+    json_headers = b''.join(f"{name}: {value}\r\n".encode('latin-1') for name, value in JSON_HEADERS)
+    gzip_headers = b"Content-Encoding: gzip\r\nVary: Accept-Encoding\r\n"
+    connection_headers = {
+        'close': b"Connection: close\r\n",
+        'keep-alive': b"Connection: keep-alive\r\n",
+    }
+
+    def __init__(self, server_version, protocol_version='HTTP/1.1'):
+        self.protocol_version = protocol_version
+        self.server_header = f"Server: {server_version}\r\n".encode('latin-1')
+        self._status_lines = {}
+        self._date = (0, b'')
+
+    def status_line(self, status_code):
+        line = self._status_lines.get(status_code)
+        if line is None:
+            try:
+                phrase = HTTPStatus(status_code).phrase
+            except ValueError:
+                phrase = ''
+            line = f"{self.protocol_version} {status_code} {phrase}\r\n".encode('latin-1')
+            self._status_lines[status_code] = line
+        return line
+
+    def date_header(self):
+        now = int(time.time())
+        second, header = self._date
+        if second != now:
+            header = f"Date: {formatdate(now, usegmt=True)}\r\n".encode('latin-1')
+            self._date = (now, header)
+        return header
+
+    def not_modified(self, extra_headers=(), connection=None):
+        """304 completo em bytes: validadores, sem corpo nem cabeçalhos de conteúdo"""
+        parts = [self.status_line(304), self.server_header, self.date_header()]
+        for header, value in extra_headers:
+            parts.append(f"{header}: {value}\r\n".encode('latin-1'))
+        if connection:
+            parts.append(self.connection_headers[connection])
+        parts.append(b"\r\n")
+        return b''.join(parts)
+
+    def build(self, status_code, body, extra_headers=(), compressed=False, connection=None):
+        """Resposta completa em bytes; `body` já serializado"""
+        parts = [self.status_line(status_code), self.server_header, self.date_header(), self.json_headers]
+        for header, value in extra_headers:
+            parts.append(f"{header}: {value}\r\n".encode('latin-1'))
+        if compressed:
+            parts.append(self.gzip_headers)
+        if connection:
+            parts.append(self.connection_headers[connection])
+        parts.append(b"Content-Length: %d\r\n\r\n" % len(body))
+        parts.append(body)
+        return b''.join(parts)
@@ -0,0 +1,192 @@
+import re
+import unicodedata
+
+from backend.cache import TTLCache
+from backend.metrics import REGISTRY
+from backend.utils import ResponseBuilder
+
+_WORD = re.compile(r'\w+')
+
+
+def search_terms(text):
+    """Palavras da consulta como o tokenizer do índice as vê (minúsculas, sem acentos)"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _WORD.findall(stripped.lower())
+
+
+class ProductSearch:
+    """Busca de produtos no índice FTS5 (`products_fts`) e autocomplete por prefixo.
+
+    `search` ordena por BM25 com pesos por coluna (nome > marca > notas >
+    descrição). `suggest` atende a cada tecla: busca só em nome e marca,
+    sem ordenar o conjunto inteiro por BM25 (poucos candidatos, ordenados
+    em Python) e guarda os prefixos recentes num LRU, que também guarda
+    as buscas completas repetidas. Quando o prefixo anterior (uma letra a
+    menos) está no LRU com todos os candidatos, o novo é só um filtro em
+    memória sobre eles. Os produtos devolvidos vêm do snapshot do
+    catálogo, com os mesmos campos de /api/products.
+    """
+
+    # Pesos do bm25 na ordem das colunas do índice: nome, marca, notas, descrição
+    weights = (10.0, 8.0, 3.0, 1.0)
+    default_limit = 20
+    max_limit = 50
+    max_offset = 1000
+    # Autocomplete: sugestões devolvidas, candidatos lidos do índice e prefixo mínimo
+    suggest_limit = 8
+    candidate_limit = 200
+    min_prefix = 2
+    suggestion_fields = ('id', 'nome', 'marca', 'descricao', 'preco', 'imagem', 'pagina')
+
+    def __init__(self, db, catalog, cache_size=1024, cache_ttl=300.0):
+        self.db = db
+        self.catalog = catalog
+        # (versão do catálogo, termos) -> (ids candidatos, lista completa?, sugestões);
+        # buscas completas repetidas também passam por aqui, com a chave marcada 'search'
+        self.prefix_cache = TTLCache(max_entries=cache_size, ttl=cache_ttl)
+        self._names = None
+        self.narrowed = 0
+
+    @staticmethod
+    def match_expression(terms, columns=None):
+        """Expressão MATCH com cada termo como prefixo ("dior" "jad"*): todos precisam aparecer"""
+        expression = ' '.join(f'"{term}"*' for term in terms)
+        if columns:
+            return f"{{{' '.join(columns)}}} : ({expression})"
+        return expression
+
+    def search(self, query, limit=None, offset=0):
+        """Produtos que casam com a consulta, do mais relevante ao menos"""
+        terms = search_terms(query)
+        if not terms:
+            return {"success": False, "error": "Informe o que buscar"}
+        limit = limit or self.default_limit
+        if not 1 <= limit <= self.max_limit:
+            return {"success": False, "error": f"limit deve estar entre 1 e {self.max_limit}"}
+        if not 0 <= offset <= self.max_offset:
+            return {"success": False, "error": f"offset deve estar entre 0 e {self.max_offset}"}
+
+        snapshot = self.catalog.snapshot()
+        key = (snapshot.version, 'search', tuple(terms), limit, offset)
+        rows = self.prefix_cache.get(key)
+        if rows is None:
+            rows = self.ranked(terms, limit, offset)
+            self.prefix_cache.put(key, rows)
+
+        products = [snapshot.by_id[product_id] for product_id, in rows[:limit] if product_id in snapshot.by_id]
+        return {"success": True, "products": products, "has_more": len(rows) > limit}
+
+    def ranked(self, terms, limit, offset):
+        """Ids por BM25, com um a mais que o limite para saber se há próxima página"""
+        with REGISTRY.timer('search'), self.db.pool.connection() as conn:
+            return conn.execute(f'''
+                SELECT p.id FROM products_fts
+                JOIN products p ON p.rowid = products_fts.rowid
+                WHERE products_fts MATCH ? AND p.ativo = 1
+                ORDER BY bm25(products_fts, {', '.join(map(str, self.weights))})
+                LIMIT ? OFFSET ?
+            ''', (self.match_expression(terms), limit + 1, offset)).fetchall()
+
+    def suggest(self, prefix):
+        """Até suggest_limit produtos cujo nome/marca tem palavras começando pelos termos digitados"""
+        terms = search_terms(prefix)
+        if not terms or sum(map(len, terms)) < self.min_prefix:
+            return []
+
+        snapshot = self.catalog.snapshot()
+        key = (snapshot.version, tuple(terms))
+        cached = self.prefix_cache.get(key)
+        if cached is None:
+            product_ids, complete = self.narrow(snapshot, terms) or self.candidates(terms)
+            cached = (product_ids, complete, self.rank(snapshot, terms, product_ids))
+            self.prefix_cache.put(key, cached)
+        return cached[2]
+
+    def names(self, snapshot):
+        """Nome e marca normalizados por produto, calculados sob demanda e descartados a cada versão"""
+        names = self._names
+        if names is None or names[0] != snapshot.version:
+            names = self._names = (snapshot.version, {})
+        return names[1]
+
+    def normalized(self, snapshot, product_id):
+        """(nome, marca) sem acentos e em minúsculas, ou None se o produto saiu do snapshot"""
+        names = self.names(snapshot)
+        name = names.get(product_id)
+        if name is None:
+            product = snapshot.by_id.get(product_id)
+            if product is None:
+                return None
+            name = names[product_id] = (' '.join(search_terms(product['nome'])),
+                                        ' '.join(search_terms(product['marca'])))
+        return name
+
+    def narrow(self, snapshot, terms):
+        """Candidatos filtrados em memória a partir do prefixo anterior, se ele estiver completo no LRU"""
+        if len(terms[-1]) > 1:
+            previous = terms[:-1] + [terms[-1][:-1]]
+        elif len(terms) > 1:
+            previous = terms[:-1]
+        else:
+            return None
+        cached = self.prefix_cache.get((snapshot.version, tuple(previous)))
+        if cached is None or not cached[1]:
+            return None
+        self.narrowed += 1
+        matching = []
+        for product_id in cached[0]:
+            name = self.normalized(snapshot, product_id)
+            if name is not None:
+                words = f"{name[0]} {name[1]}".split()
+                if all(any(word.startswith(term) for word in words) for term in terms):
+                    matching.append(product_id)
+        return matching, True
+
+    def candidates(self, terms):
+        """Até candidate_limit ids do índice, sem ordenar por BM25 (barato mesmo com prefixos curtos)"""
+        with REGISTRY.timer('search'), self.db.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT p.id FROM products_fts
+                JOIN products p ON p.rowid = products_fts.rowid
+                WHERE products_fts MATCH ? AND p.ativo = 1
+                LIMIT ?
+            ''', (self.match_expression(terms, ('nome', 'marca')), self.candidate_limit + 1)).fetchall()
+        complete = len(rows) <= self.candidate_limit
+        return [product_id for product_id, in rows[:self.candidate_limit]], complete
+
+    def rank(self, snapshot, terms, product_ids):
+        """Sugestões: nome começando pela consulta, depois marca, depois a ordem da vitrine"""
+        query = ' '.join(terms)
+        ranked = []
+        for product_id in product_ids:
+            name = self.normalized(snapshot, product_id)
+            if name is None:
+                continue
+            score = 0 if name[0].startswith(query) else 1 if name[1].startswith(query) else 2
+            ranked.append((score, snapshot.order[product_id], product_id))
+        ranked.sort()
+        return [{field: snapshot.by_id[product_id][field] for field in self.suggestion_fields}
+                for _, _, product_id in ranked[:self.suggest_limit]]
+
+    def respond(self, path, query):
+        """(status, corpo) de /api/search e /api/suggest; `query` vem de parse_qs"""
+        text = query.get('q', [''])[0]
+        if path == '/api/suggest':
+            return 200, ResponseBuilder.success(data={'suggestions': self.suggest(text)})
+        try:
+            limit = int(query.get('limit', ['0'])[0] or 0)
+            offset = int(query.get('offset', ['0'])[0] or 0)
+        except ValueError:
+            return 400, ResponseBuilder.error("limit e offset devem ser números inteiros")
+        result = self.search(text, limit, offset)
+        if not result['success']:
+            return 400, ResponseBuilder.error(result['error'])
+        return 200, ResponseBuilder.success(data={'products': result['products'], 'has_more': result['has_more']})
+
+    def stats(self):
+        return {
+            'prefix_cache': self.prefix_cache.stats(),
+            'narrowed': self.narrowed,
+            'candidate_limit': self.candidate_limit
+        }
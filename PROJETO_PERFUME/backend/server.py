@@ -1,52 +1,190 @@
+import html
 import http.server
 import socketserver
 import os
 import json
+import queue
+import socket
+import threading
+import time
+from contextlib import contextmanager
 from urllib.parse import urlparse, parse_qs
 from backend.database import Database
 from backend.auth import AuthValidator
 from backend.session import SessionManager
+from backend.static_cache import StaticAssetCache
+from backend import responses
+from backend.responses import JSONResponseWriter
+from backend.request_body import BodyPolicy, BodyDecoder, BodyRejected
+from backend.metrics import REGISTRY
+from backend.access_log import AccessLog
+from backend.catalog import ProductCatalog
+from backend.search import ProductSearch
+from backend.cart import CartStore
+from backend.orders import CheckoutService
+from backend.rate_limit import RateLimiter
 from backend.utils import HTTPUtils, FileUtils, ResponseBuilder
 
+# Raiz do site (diretório PROJETO_PERFUME)
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 
+
+class ConnectionStats:
+    """Contadores de reutilização de conexões (keep-alive)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.requests = 0
+        self.reused_requests = 0
+        self.closed_by_limit = 0
+    
+    def connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+    
+    def connection_closed(self):
+        with self._lock:
+            self.connections_closed += 1
+    
+    def request_served(self, reused, hit_limit=False):
+        with self._lock:
+            self.requests += 1
+            if reused:
+                self.reused_requests += 1
+            if hit_limit:
+                self.closed_by_limit += 1
+    
+    def snapshot(self):
+        """Retorna os contadores atuais"""
+        with self._lock:
+            opened = self.connections_opened
+            return {
+                'connections_opened': opened,
+                'connections_closed': self.connections_closed,
+                'connections_active': opened - self.connections_closed,
+                'requests': self.requests,
+                'reused_requests': self.reused_requests,
+                'closed_by_limit': self.closed_by_limit,
+                'requests_per_connection': round(self.requests / opened, 2) if opened else 0
+            }
+
 class BelleHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1: conexões persistentes por padrão
+    protocol_version = 'HTTP/1.1'
+    # Tempo ocioso máximo (segundos) e limite de requisições por conexão
+    timeout = 5
+    max_requests_per_connection = 100
+    # Respostas JSON acima disso vão com gzip se o cliente aceitar
+    json_gzip_min_size = 1024
+    
     db = Database()
     session_manager = SessionManager()
+    # SESSION_MODE=token: TokenManager com cookie assinado no lugar da sessão
+    token_manager = None
+    connection_stats = ConnectionStats()
+    static_cache = StaticAssetCache(BASE_PATH)
+    # Limites de tamanho, tipo e tempo do corpo dos POSTs
+    body_policy = BodyPolicy()
+    metrics = REGISTRY
+    # SLOW_PROFILE_DIR: SlowRequestProfiler para perfis das requisições lentas
+    profiler = None
+    # Registro por requisição, gravado em lote fora da thread de atendimento (None desliga)
+    access_log = AccessLog()
+    # Produtos servidos de um snapshot em memória, remontado quando a tabela muda
+    catalog = ProductCatalog(db)
+    # Busca FTS5 e autocomplete sobre o catálogo (SEARCH_CACHE_SIZE em run.py)
+    search = ProductSearch(db, catalog)
+    # Carrinho por usuário (lotes de operações) e pedidos com reserva de estoque
+    carts = CartStore(db, catalog)
+    checkout = CheckoutService(db, catalog, carts)
+    # Token buckets por IP e por email/CPF em login e cadastro (None desliga)
+    rate_limiter = RateLimiter()
+    json_writer = JSONResponseWriter(
+        f"{http.server.BaseHTTPRequestHandler.server_version} {http.server.BaseHTTPRequestHandler.sys_version}"
+    )
     
     def __init__(self, *args, **kwargs):
-        self.base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.base_path = BASE_PATH
+        self.requests_on_connection = 0
+        self.response_status = None
+        self.bytes_sent = 0
         super().__init__(*args, **kwargs)
     
+    def handle(self):
+        """Atende várias requisições na mesma conexão"""
+        self.connection_stats.connection_opened()
+        try:
+            super().handle()
+        finally:
+            self.connection_stats.connection_closed()
+    
+    @contextmanager
+    def track_metrics(self, path):
+        """Conta a requisição (rota, status, bytes, latência) nas métricas"""
+        route = self.metrics.route_label(path)
+        self.response_status = None
+        self.bytes_sent = 0
+        self.metrics.request_started(route)
+        profile = self.profiler.start() if self.profiler is not None else None
+        if profile is not None:
+            self.metrics.start_trace()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            status = self.response_status or 500
+            self.metrics.request_finished(route, self.command, status, elapsed, self.bytes_sent)
+            if self.access_log is not None:
+                self.access_log.record(self.client_address[0], self.command, self.path, status,
+                                       self.bytes_sent, elapsed, route)
+            if self.profiler is not None:
+                self.profiler.finish(profile, elapsed, {
+                    'route': route,
+                    'method': self.command,
+                    'path': path,
+                    'status': status,
+                    'operations_ms': self.metrics.end_trace() if profile is not None else {}
+                })
+    
     def do_GET(self):
         """Manipula requisições GET"""
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
-        # Rotas da API
-        if path.startswith('/api/'):
-            self.handle_api_get(path)
-        else:
-            self.serve_static_file(path)
+        with self.track_metrics(path):
+            # Rotas da API
+            if path.startswith('/api/'):
+                self.handle_api_get(path)
+            else:
+                self.serve_static_file(path)
     
     def do_POST(self):
         """Manipula requisições POST"""
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
-        if path.startswith('/api/'):
-            self.handle_api_post(path)
-        else:
-            self.send_error(404, "Not Found")
+        with self.track_metrics(path):
+            if path.startswith('/api/'):
+                self.handle_api_post(path)
+            else:
+                # o corpo não foi lido: a conexão não pode ser reaproveitada
+                self.close_connection = True
+                self.send_error(404, "Not Found")
     
     def do_OPTIONS(self):
         """Manipula requisições OPTIONS (CORS)"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.end_headers()
+        with self.track_metrics(urlparse(self.path).path):
+            self.send_response(200)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, Idempotency-Key')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
     
     def handle_api_get(self, path):
         """Manipula requisições GET da API"""
@@ -54,25 +192,94 @@ class BelleHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             self.get_profile()
         elif path == '/api/check-auth':
             self.check_auth()
+        elif path == '/api/metrics':
+            self.send_metrics()
+        elif path == '/api/products' or path.startswith('/api/products/'):
+            self.get_products(path)
+        elif path in ('/api/search', '/api/suggest'):
+            self.get_search(path)
+        elif path == '/api/cart':
+            self.get_cart()
+        elif path.startswith('/api/orders/'):
+            self.order_action(path)
+        elif path == '/api/server-stats':
+            self.send_json_response(ResponseBuilder.success(data={
+                'connections': self.connection_stats.snapshot(),
+                'static_cache': self.static_cache.stats(),
+                'database': self.db.pool.stats(),
+                'password_hashing': self.db.hash_pool.stats(),
+                'sessions': self.session_manager.stats(),
+                'profile_cache': self.db.profile_cache.stats(),
+                'tokens': self.token_manager.stats() if self.token_manager else None,
+                'request_body': self.body_policy.stats(),
+                'latency': self.metrics.snapshot(),
+                'slow_profiles': self.profiler.stats() if self.profiler else None,
+                'access_log': self.access_log.stats() if self.access_log else None,
+                'catalog': self.catalog.stats(),
+                'search': self.search.stats(),
+                'cart': self.carts.stats(),
+                'checkout': self.checkout.stats(),
+                'rate_limit': self.rate_limiter.stats() if self.rate_limiter else None
+            }))
         else:
-            self.send_json_response(ResponseBuilder.error("Endpoint não encontrado"), 404)
+            self.send_json_response(responses.ENDPOINT_NOT_FOUND, 404)
     
     def handle_api_post(self, path):
         """Manipula requisições POST da API"""
-        content_length = int(self.headers.get('Content-Length', 0))
-        post_data = self.rfile.read(content_length)
+        try:
+            post_data = self.read_body(self.body_policy.check(path, self.headers))
+        except BodyRejected as e:
+            # o corpo não foi lido (ou só em parte): a conexão não pode ser reaproveitada
+            self.close_connection = True
+            self.send_json_response(ResponseBuilder.error(e.message), e.status)
+            return
         content_type = self.headers.get('Content-Type', '')
         
         data = HTTPUtils.parse_post_data(content_type, post_data)
         
+        limited = self.rate_limiter.check(path, self.client_address[0], data) if self.rate_limiter else None
+        if limited is not None:
+            self.send_busy_response(limited, 429)
+            return
+        
         if path == '/api/register':
             self.register_user(data)
         elif path == '/api/login':
             self.login_user(data)
         elif path == '/api/logout':
             self.logout_user()
+        elif path == '/api/cart':
+            self.update_cart(data)
+        elif path == '/api/checkout':
+            self.post_checkout(data)
+        elif path.startswith('/api/orders/'):
+            self.order_action(path)
         else:
-            self.send_json_response(ResponseBuilder.error("Endpoint não encontrado"), 404)
+            self.send_json_response(responses.ENDPOINT_NOT_FOUND, 404)
+    
+    def read_body(self, length):
+        """Lê o corpo em pedaços, decodificando aos poucos, dentro do prazo da política"""
+        policy = self.body_policy
+        decoder = BodyDecoder(policy)
+        deadline = time.monotonic() + policy.timeout
+        remaining = length
+        try:
+            while remaining:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    policy.reject(408, "Tempo esgotado ao receber o corpo")
+                self.connection.settimeout(timeout)
+                chunk = self.rfile.read1(min(remaining, policy.chunk_size))
+                if not chunk:
+                    policy.reject(400, "Corpo da requisição incompleto")
+                decoder.feed(chunk)
+                remaining -= len(chunk)
+        except TimeoutError:
+            policy.reject(408, "Tempo esgotado ao receber o corpo")
+        finally:
+            if length:
+                self.connection.settimeout(self.timeout)
+        return decoder.finish()
     
     def register_user(self, data):
         """Registra novo usuário"""
@@ -100,6 +307,8 @@ class BelleHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             self.send_json_response(
                 ResponseBuilder.success(message="Cadastro realizado com sucesso!")
             )
+        elif 'retry_after' in result:
+            self.send_busy_response(result)
         else:
             self.send_json_response(
                 ResponseBuilder.error(result['error']), 
@@ -123,19 +332,30 @@ class BelleHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
         )
         
         if result['success']:
-            # Criar sessão
-            session_id = self.session_manager.create_session(
-                user_id=result['user']['id'],
-                user_data=result['user']
-            )
-            
-            # Enviar resposta com cookie
             response = ResponseBuilder.success(
                 data=result['user'],
                 message="Login realizado com sucesso!"
             )
             
-            self.send_json_response_with_cookie(response, 'session_id', session_id)
+            if self.token_manager is not None:
+                # Modo token: cookie assinado, nada guardado no servidor
+                token = self.token_manager.issue(result['user'])
+                self.send_json_response_with_cookie(response, self.token_manager.cookie_name, token,
+                                                    max_age=self.token_manager.ttl)
+                return
+            
+            # Criar sessão
+            with self.metrics.timer('session'):
+                session_id = self.session_manager.create_session(
+                    user_id=result['user']['id'],
+                    user_data=result['user']
+                )
+            
+            # Enviar resposta com cookie
+            self.send_json_response_with_cookie(response, 'session_id', session_id,
+                                                max_age=self.session_manager.session_timeout)
+        elif 'retry_after' in result:
+            self.send_busy_response(result)
         else:
             self.send_json_response(
                 ResponseBuilder.error(result['error']), 
@@ -144,23 +364,32 @@ class BelleHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
     
     def logout_user(self):
         """Faz logout do usuário"""
+        response = responses.LOGOUT_OK
+        
+        if self.token_manager is not None:
+            token = self.get_cookie(self.token_manager.cookie_name)
+            if token:
+                self.token_manager.revoke(token)
+            self.send_json_response_with_cookie(response, self.token_manager.cookie_name, '', max_age=0)
+            return
+        
         session_id = self.get_session_id()
         if session_id:
-            self.session_manager.destroy_session(session_id)
+            with self.metrics.timer('session'):
+                self.session_manager.destroy_session(session_id)
         
-        response = ResponseBuilder.success(message="Logout realizado com sucesso!")
         self.send_json_response_with_cookie(response, 'session_id', '', max_age=0)
     
     def get_profile(self):
         """Retorna dados do perfil do usuário"""
-        session_id = self.get_session_id()
-        if not session_id:
-            self.send_json_response(ResponseBuilder.error("Não autenticado"), 401)
+        credential = self.get_auth_cookie()
+        if not credential:
+            self.send_json_response(responses.NOT_AUTHENTICATED, 401)
             return
         
-        user_data = self.session_manager.get_user_data(session_id)
+        user_data = self.get_authenticated_user(credential)
         if not user_data:
-            self.send_json_response(ResponseBuilder.error("Sessão inválida"), 401)
+            self.send_json_response(responses.INVALID_SESSION, 401)
             return
         
         # Buscar dados completos do usuário
@@ -171,89 +400,365 @@ class BelleHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             self.send_json_response(ResponseBuilder.error(result['error']), 404)
     
     def check_auth(self):
-        """Verifica se usuário está autenticado"""
-        session_id = self.get_session_id()
-        is_authenticated = self.session_manager.is_authenticated(session_id)
+        """Verifica se usuário está autenticado (no modo token, só pelo cookie)"""
+        user_data = self.get_authenticated_user(self.get_auth_cookie())
         
-        if is_authenticated:
-            user_data = self.session_manager.get_user_data(session_id)
+        if user_data:
             self.send_json_response(ResponseBuilder.success(data={
                 'authenticated': True,
                 'user': user_data
             }))
         else:
-            self.send_json_response(ResponseBuilder.success(data={
-                'authenticated': False
-            }))
+            self.send_json_response(responses.ANONYMOUS)
+    
+    def get_products(self, path):
+        """Catálogo: listagem paginada ou detalhe, com ETag (304 se nada mudou)"""
+        response = self.catalog.respond(path, parse_qs(urlparse(self.path).query), self.headers)
+        if response.status == 304:
+            self.send_not_modified(response.headers)
+        else:
+            self.send_json(response.body, response.status, response.headers, response.compressed)
+    
+    def get_search(self, path):
+        """Busca por relevância (/api/search) ou sugestões enquanto se digita (/api/suggest)"""
+        status, result = self.search.respond(path, parse_qs(urlparse(self.path).query))
+        self.send_json_response(result, status)
+    
+    def current_user(self):
+        """Usuário autenticado; sem credencial válida responde 401 e devolve None"""
+        credential = self.get_auth_cookie()
+        user_data = self.get_authenticated_user(credential)
+        if not user_data:
+            self.send_json_response(responses.INVALID_SESSION if credential else responses.NOT_AUTHENTICATED, 401)
+        return user_data
+    
+    def send_result(self, status, result):
+        """Envia o (status, corpo) do carrinho/pedidos; 503 vai com Retry-After"""
+        if status == 503:
+            self.send_busy_response(result)
+        else:
+            self.send_json_response(result, status)
+    
+    def get_cart(self):
+        """Carrinho salvo do usuário"""
+        user_data = self.current_user()
+        if user_data:
+            self.send_result(*self.carts.get(user_data['id']))
+    
+    def update_cart(self, data):
+        """Aplica um lote de operações no carrinho (add/set/remove/merge/clear com seq)"""
+        user_data = self.current_user()
+        if user_data:
+            self.send_result(*self.carts.apply(user_data['id'], data))
+    
+    def post_checkout(self, data):
+        """Reserva o estoque do carrinho e cria o pedido (Idempotency-Key evita pedido duplicado)"""
+        user_data = self.current_user()
+        if user_data:
+            key = self.headers.get('Idempotency-Key') or (data.get('idempotency_key') if isinstance(data, dict) else None)
+            self.send_result(*self.checkout.checkout(user_data['id'], key))
+    
+    def order_action(self, path):
+        """Consulta, confirmação ou cancelamento de um pedido do usuário"""
+        user_data = self.current_user()
+        if user_data:
+            self.send_result(*self.checkout.order_action(user_data['id'], self.command, path))
     
     def serve_static_file(self, path):
-        """Serve arquivos estáticos"""
+        """Serve arquivos estáticos: pequenos da memória, grandes por sendfile"""
         if path == '/':
             path = '/index.html'
         
-        file_path = os.path.join(self.base_path, path.lstrip('/'))
-        
-        if not FileUtils.file_exists(file_path):
+        start = time.perf_counter()
+        asset, immutable = self.static_cache.resolve(path)
+        if asset is None:
             self.send_error(404, "File Not Found")
             return
         
-        content = FileUtils.read_file(file_path)
-        if content is None:
-            self.send_error(500, "Internal Server Error")
-            return
-        
-        content_type = HTTPUtils.get_content_type(file_path)
+        content = None
+        file_obj = None
+        if self.static_cache.is_cacheable(asset):
+            content = self.static_cache.get_content(asset)
+            if content is None:
+                self.send_error(500, "Internal Server Error")
+                return
+        else:
+            file_obj = FileUtils.open_file(asset.file_path)
+            if file_obj is None:
+                self.send_error(404, "File Not Found")
+                return
+            if os.fstat(file_obj.fileno()).st_size != asset.size:
+                # arquivo mudou desde a última revalidação
+                asset = self.static_cache.refresh(asset) or asset
+        # tempo de localizar e carregar o arquivo (o envio fica na latência da rota)
+        self.metrics.observe_operation('static', time.perf_counter() - start)
         
-        self.send_response(200)
-        self.send_header('Content-Type', content_type)
-        self.send_header('Content-Length', str(len(content)))
-        self.end_headers()
-        self.wfile.write(content)
+        try:
+            status, headers, parts, body = self.static_cache.plan_response(
+                asset, self.headers, content, immutable
+            )
+            
+            self.send_response(status)
+            for header, value in headers:
+                self.send_header(header, value)
+            if status != 304:
+                self.send_header('Content-Length', str(self.static_cache.body_length(parts)))
+            self.end_headers()
+            
+            self.write_body_parts(parts, body, file_obj)
+        finally:
+            if file_obj is not None:
+                file_obj.close()
     
-    def get_session_id(self):
-        """Extrai session_id dos cookies"""
+    def write_body_parts(self, parts, content, file_obj):
+        """Escreve as partes do corpo: bytes literais ou trechos do arquivo"""
+        view = memoryview(content) if content is not None else None
+        for part in parts:
+            if isinstance(part, bytes):
+                self.wfile.write(part)
+                self.bytes_sent += len(part)
+                continue
+            
+            offset, count = part
+            if view is not None:
+                self.wfile.write(view[offset:offset + count])
+                self.bytes_sent += count
+            else:
+                self.bytes_sent += FileUtils.send_file(self.connection, file_obj, offset, count) or 0
+    
+    def get_cookie(self, name):
+        """Valor de um cookie da requisição"""
         cookie_header = self.headers.get('Cookie')
         if cookie_header:
             cookies = HTTPUtils.parse_cookies(cookie_header)
-            return cookies.get('session_id')
+            return cookies.get(name)
         return None
     
-    def send_json_response(self, data, status_code=200):
-        """Envia resposta JSON"""
-        response = HTTPUtils.create_json_response(data, status_code)
+    def get_session_id(self):
+        """Extrai session_id dos cookies"""
+        return self.get_cookie('session_id')
+    
+    def get_auth_cookie(self):
+        """Credencial do modo atual: token assinado ou session_id"""
+        if self.token_manager is not None:
+            return self.get_cookie(self.token_manager.cookie_name)
+        return self.get_session_id()
+    
+    def get_authenticated_user(self, credential):
+        """Dados do usuário para a credencial, ou None se inválida"""
+        if not credential:
+            return None
+        with self.metrics.timer('session'):
+            if self.token_manager is not None:
+                return self.token_manager.get_user_data(credential)
+            return self.session_manager.get_user_data(credential)
+    
+    def send_response(self, code, message=None):
+        """Envia a linha de status e controla o keep-alive da conexão"""
+        self.response_status = code
+        super().send_response(code, message)
+        
+        connection = self.track_request()
+        if connection:
+            self.send_header('Connection', connection)
+    
+    def track_request(self):
+        """Conta a requisição na conexão; devolve o valor do cabeçalho Connection (ou None)"""
+        self.requests_on_connection += 1
+        hit_limit = self.requests_on_connection >= self.max_requests_per_connection
+        self.connection_stats.request_served(self.requests_on_connection > 1, hit_limit)
+        
+        if hit_limit:
+            self.close_connection = True
+            return 'close'
+        if not self.close_connection and self.request_version == 'HTTP/1.0':
+            return 'keep-alive'
+        return None
+    
+    def send_error(self, code, message=None, explain=None):
+        """Envia erro HTML; mantém a conexão se a requisição foi lida por inteiro"""
+        if not self.command or self.close_connection:
+            super().send_error(code, message, explain)
+            return
+        
+        shortmsg, longmsg = self.responses.get(code, ('???', '???'))
+        message = message or shortmsg
+        body = (self.error_message_format % {
+            'code': code,
+            'message': html.escape(message, quote=False),
+            'explain': html.escape(explain or longmsg, quote=False)
+        }).encode('UTF-8', 'replace')
         
-        self.send_response(response['status_code'])
-        for header, value in response['headers'].items():
-            self.send_header(header, value)
+        self.log_error("code %d, message %s", code, message)
+        self.send_response(code, message)
+        self.send_header('Content-Type', self.error_content_type)
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(response['body'].encode('utf-8'))
+        self.wfile.write(body)
+        self.bytes_sent += len(body)
+    
+    def flush_headers(self):
+        """Envia os cabeçalhos acumulados, contando os bytes"""
+        buffer = getattr(self, '_headers_buffer', None)
+        if buffer:
+            self.bytes_sent += sum(map(len, buffer))
+        super().flush_headers()
+    
+    def send_metrics(self):
+        """Métricas no formato de texto do Prometheus"""
+        body = self.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.bytes_sent += len(body)
+    
+    def send_json_response(self, data, status_code=200):
+        """Envia resposta JSON"""
+        self.send_json(data, status_code)
     
     def send_json_response_with_cookie(self, data, cookie_name, cookie_value, max_age=3600):
         """Envia resposta JSON com cookie"""
-        response = HTTPUtils.create_json_response(data)
-        
-        self.send_response(response['status_code'])
-        for header, value in response['headers'].items():
-            self.send_header(header, value)
-        
-        # Adicionar cookie
         cookie = HTTPUtils.create_cookie(cookie_name, cookie_value, max_age)
-        self.send_header('Set-Cookie', cookie)
+        self.send_json(data, 200, [('Set-Cookie', cookie)])
+    
+    def send_busy_response(self, result, status_code=503):
+        """Retry-After: 503 com o servidor saturado, 429 com o cliente acima do limite"""
+        self.send_json(ResponseBuilder.error(result['error']), status_code,
+                       [('Retry-After', str(result['retry_after']))])
+    
+    def send_json(self, data, status_code=200, extra_headers=(), compressed=None):
+        """Serializa e envia JSON numa única escrita, comprimindo corpos grandes.
         
-        self.end_headers()
-        self.wfile.write(response['body'].encode('utf-8'))
+        `data` pode vir já serializado (bytes), como os corpos de backend.responses;
+        com `compressed` informado o corpo é enviado como está (gzip pronto ou não).
+        """
+        body = data if isinstance(data, bytes) else responses.encode_json(data)
+        if compressed is None:
+            body, compressed = HTTPUtils.compress_response_body(
+                body, self.headers.get('Accept-Encoding'), self.json_gzip_min_size
+            )
+        
+        self.response_status = status_code
+        response = self.json_writer.build(status_code, body, extra_headers, compressed, self.response_connection())
+        self.wfile.write(response)
+        self.bytes_sent += len(response)
+    
+    def send_not_modified(self, headers):
+        """304 sem corpo, só com os validadores"""
+        self.response_status = 304
+        response = self.json_writer.not_modified(headers, self.response_connection())
+        self.wfile.write(response)
+        self.bytes_sent += len(response)
+    
+    def response_connection(self):
+        """Cabeçalho Connection da resposta ('close', 'keep-alive' ou None)"""
+        connection = self.track_request()
+        if connection is None and self.close_connection:
+            connection = 'close'
+        return connection
+    
+    def log_request(self, code='-', size='-'):
+        """Requisições vão para o access_log, com latência (ver track_metrics)"""
     
     def log_message(self, format, *args):
         """Override para personalizar logs"""
         print(f"[{self.date_time_string()}] {format % args}")
 
-def start_server(port=8000):
-    """Inicia o servidor"""
+class ThreadPoolHTTPServer(socketserver.TCPServer):
+    """Servidor TCP que atende conexões com um pool fixo de threads"""
+    allow_reuse_address = True
+    
+    def __init__(self, server_address, handler_class, workers=8, backlog=128,
+                 queue_size=None, bind_and_activate=True):
+        self.workers = workers
+        self.request_queue_size = backlog
+        # Fila limitada: quando cheia, o accept espera em vez de criar threads
+        self._pending = queue.Queue(maxsize=queue_size or workers * 4)
+        self._threads = []
+        super().__init__(server_address, handler_class, bind_and_activate)
+        
+        for i in range(workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"belle-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def process_request(self, request, client_address):
+        """Enfileira a conexão para o pool de workers"""
+        self._pending.put((request, client_address))
+    
+    def _worker_loop(self):
+        """Loop de cada worker: atende conexões da fila até receber None"""
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+    
+    def server_close(self):
+        """Fecha o socket e encerra os workers"""
+        super().server_close()
+        for _ in self._threads:
+            self._pending.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+def create_server(port=8000, workers=0, backlog=128, sock=None, reuse_port=False,
+                  keepalive_timeout=5, max_requests=100):
+    """Cria o servidor: sequencial (workers=0) ou com pool de threads.
+    
+    sock: socket já em listen herdado do processo pai (modo pre-fork)
+    reuse_port: liga SO_REUSEPORT para vários processos na mesma porta
+    keepalive_timeout/max_requests: limites das conexões persistentes
+    """
     handler = BelleHTTPRequestHandler
+    handler.timeout = keepalive_timeout
+    # No modo sequencial uma conexão ociosa bloquearia todas as outras
+    handler.max_requests_per_connection = max_requests if workers > 0 else 1
+    
+    if workers > 0:
+        httpd = ThreadPoolHTTPServer(("", port), handler, workers=workers,
+                                     backlog=backlog, bind_and_activate=False)
+    else:
+        httpd = socketserver.TCPServer(("", port), handler, bind_and_activate=False)
+    
+    if sock is not None:
+        httpd.socket.close()
+        httpd.socket = sock
+        return httpd
     
-    with socketserver.TCPServer(("", port), handler) as httpd:
+    try:
+        if reuse_port:
+            httpd.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        httpd.server_bind()
+        httpd.server_activate()
+    except Exception:
+        httpd.server_close()
+        raise
+    return httpd
+
+def start_server(port=8000, workers=0, backlog=128, sock=None, reuse_port=False,
+                 keepalive_timeout=5, max_requests=100):
+    """Inicia o servidor"""
+    with create_server(port, workers, backlog, sock, reuse_port,
+                       keepalive_timeout, max_requests) as httpd:
+        if workers > 0:
+            print(f"Modo concorrente: {workers} workers, backlog {backlog}")
+        
         print(f"Servidor Belle Parfum iniciado em http://localhost:{port}")
-        print("Acesse http://localhost:8000 para ver o site")
+        print(f"Acesse http://localhost:{port} para ver o site")
         print("Pressione Ctrl+C para parar o servidor")
         
         try:
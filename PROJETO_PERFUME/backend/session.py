@@ -1,81 +1,465 @@
 import uuid
 import time
+import heapq
+import json
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from backend.database import ConnectionPool
 
-class SessionManager:
-    def __init__(self):
-        # Armazena sessões em memória 
+
+class Session:
+    """Registro compacto de uma sessão.
+
+    Os dados do usuário ficam como tupla de valores; a tupla de chaves é
+    compartilhada entre todas as sessões com o mesmo formato.
+    """
+    __slots__ = ('user_id', 'keys', 'values', 'created_at', 'last_activity')
+
+    def __init__(self, user_id, keys, values, created_at):
+        self.user_id = user_id
+        self.keys = keys
+        self.values = values
+        self.created_at = created_at
+        self.last_activity = created_at
+
+    @property
+    def user_data(self):
+        return dict(zip(self.keys, self.values))
+
+
+class SessionBackend:
+    """Interface dos armazenamentos de sessão (memória, SQLite...).
+
+    Implementações fornecem create_session, get_session, destroy_session,
+    cleanup_expired_sessions, extend_session e stats; get_session devolve um
+    Session ou None.
+    """
+    session_timeout = 3600
+    # Consultas fazem I/O (banco): o motor async as executa fora do event loop
+    blocking = False
+
+    def create_session(self, user_id, user_data):
+        raise NotImplementedError
+
+    def get_session(self, session_id):
+        raise NotImplementedError
+
+    def destroy_session(self, session_id):
+        raise NotImplementedError
+
+    def cleanup_expired_sessions(self):
+        raise NotImplementedError
+
+    def extend_session(self, session_id):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def is_authenticated(self, session_id):
+        """Verifica se o usuário está autenticado"""
+        session = self.get_session(session_id)
+        return session is not None
+
+    def get_user_data(self, session_id):
+        """Retorna dados do usuário da sessão"""
+        session = self.get_session(session_id)
+        if session:
+            return session.user_data
+        return None
+
+
+class SessionManager(SessionBackend):
+    """Sessões em memória com expiração deslizante.
+
+    Um heap de (prazo, session_id) indexa as expirações: a limpeza só olha
+    as entradas vencidas. A atividade é registrada no máximo uma vez a cada
+    `touch_interval` segundos; o prazo no heap é corrigido só quando a
+    entrada chega ao topo (entradas de sessões removidas são descartadas ali).
+    """
+
+    def __init__(self, session_timeout=3600, max_sessions=None, touch_interval=60):
+        # Armazena sessões em memória
         self.sessions = {}
-        self.session_timeout = 3600  # 1 hora em segundos
-    
+        self.session_timeout = session_timeout  # 1 hora em segundos
+        # Limite de sessões; ao atingir, sai a que expiraria primeiro
+        self.max_sessions = max_sessions
+        self.touch_interval = touch_interval
+        self._expiry = []  # heap de (prazo, session_id)
+        self._layouts = {}  # tuplas de chaves compartilhadas
+        self.evicted = 0
+        # Protege o dicionário quando o servidor atende em várias threads
+        self._lock = threading.RLock()
+
     def create_session(self, user_id, user_data):
         """Cria uma nova sessão para o usuário"""
         session_id = str(uuid.uuid4())
-        expires_at = time.time() + self.session_timeout
-        
-        self.sessions[session_id] = {
-            'user_id': user_id,
-            'user_data': user_data,
-            'created_at': time.time(),
-            'expires_at': expires_at,
-            'last_activity': time.time()
-        }
-        
+        now = time.time()
+        keys = tuple(user_data)
+
+        with self._lock:
+            keys = self._layouts.setdefault(keys, keys)
+            if self.max_sessions and len(self.sessions) >= self.max_sessions:
+                self._evict(len(self.sessions) - self.max_sessions + 1)
+
+            self.sessions[session_id] = Session(user_id, keys, tuple(user_data.values()), now)
+            heapq.heappush(self._expiry, (now + self.session_timeout, session_id))
+
         return session_id
-    
+
     def get_session(self, session_id):
-        """Recupera dados da sessão se válida"""
-        if not session_id or session_id not in self.sessions:
+        """Recupera a sessão se válida (renova a atividade sem reescrever a cada acesso)"""
+        if not session_id:
             return None
-        
-        session = self.sessions[session_id]
-        
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+
+        now = time.time()
         # Verifica se a sessão expirou
-        if time.time() > session['expires_at']:
+        if now > session.last_activity + self.session_timeout:
             self.destroy_session(session_id)
             return None
-        
-        # Atualiza última atividade
-        session['last_activity'] = time.time()
-        
+
+        # Atualiza última atividade (no máximo uma vez por touch_interval)
+        if now - session.last_activity >= self.touch_interval:
+            session.last_activity = now
+
         return session
-    
+
     def destroy_session(self, session_id):
-        """Remove uma sessão"""
-        if session_id in self.sessions:
+        """Remove uma sessão (a entrada no heap sai na próxima limpeza)"""
+        with self._lock:
+            if self.sessions.pop(session_id, None) is not None:
+                return True
+            return False
+
+    def _pop_due(self, now):
+        """Tira do heap a próxima entrada vencida; devolve o id se a sessão expirou"""
+        deadline, session_id = heapq.heappop(self._expiry)
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None  # sessão já removida
+
+        real_deadline = session.last_activity + self.session_timeout
+        if real_deadline > now:
+            # teve atividade depois: volta ao heap com o prazo atual
+            heapq.heappush(self._expiry, (real_deadline, session_id))
+            return None
+
+        del self.sessions[session_id]
+        return session_id
+
+    def _evict(self, count):
+        """Remove `count` sessões, começando pelas de prazo real mais próximo"""
+        removed = 0
+        while removed < count and self._expiry:
+            deadline, session_id = heapq.heappop(self._expiry)
+            session = self.sessions.get(session_id)
+            if session is None:
+                continue  # sessão já removida
+
+            real_deadline = session.last_activity + self.session_timeout
+            if real_deadline > deadline:
+                # teve atividade depois: volta ao heap com o prazo atual, como em _pop_due
+                heapq.heappush(self._expiry, (real_deadline, session_id))
+                continue
+
             del self.sessions[session_id]
-            return True
-        return False
-    
-    def is_authenticated(self, session_id):
-        """Verifica se o usuário está autenticado"""
-        session = self.get_session(session_id)
-        return session is not None
-    
-    def get_user_data(self, session_id):
-        """Retorna dados do usuário da sessão"""
-        session = self.get_session(session_id)
-        if session:
-            return session['user_data']
-        return None
-    
+            removed += 1
+        self.evicted += removed
+
     def cleanup_expired_sessions(self):
-        """Remove sessões expiradas (deve ser chamado periodicamente)"""
+        """Remove sessões expiradas (deve ser chamado periodicamente); custo O(vencidas)"""
         current_time = time.time()
-        expired_sessions = [
-            session_id for session_id, session in self.sessions.items()
-            if current_time > session['expires_at']
-        ]
-        
-        for session_id in expired_sessions:
-            del self.sessions[session_id]
-        
-        return len(expired_sessions)
-    
+        expired = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= current_time:
+                if self._pop_due(current_time) is not None:
+                    expired += 1
+
+        return expired
+
     def extend_session(self, session_id):
         """Estende o tempo de vida da sessão"""
-        if session_id in self.sessions:
-            self.sessions[session_id]['expires_at'] = time.time() + self.session_timeout
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.last_activity = time.time()
             return True
         return False
 
+    def stats(self):
+        """Quantidade de sessões, entradas no índice de expiração e despejos"""
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self.sessions),
+                'expiry_index': len(self._expiry),
+                'max_sessions': self.max_sessions,
+                'evicted': self.evicted
+            }
+
+
+class SQLiteSessionManager(SessionBackend):
+    """Sessões num arquivo SQLite (WAL) compartilhado entre processos.
+
+    Sobrevivem a restarts e valem em todos os workers do modo pre-fork. Cada
+    processo mantém um cache LRU de leitura (válido por `cache_ttl`
+    segundos), e as renovações de atividade são acumuladas e gravadas em
+    lote a cada `flush_interval` segundos por uma thread do processo.
+    Um logout feito em outro processo pode levar até `cache_ttl` para
+    valer aqui.
+    """
+    blocking = True
+
+    def __init__(self, db_path="sessions.db", session_timeout=3600, max_sessions=None,
+                 touch_interval=60, cache_ttl=2.0, cache_size=10000, flush_interval=1.0,
+                 pool_size=4):
+        self.db_path = db_path
+        self.session_timeout = session_timeout
+        # Limite aplicado na limpeza periódica (remove as menos ativas)
+        self.max_sessions = max_sessions
+        self.touch_interval = touch_interval
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.pool = ConnectionPool(db_path, max_size=pool_size, metrics_name='session_db')
+        self._cache = OrderedDict()  # session_id -> (Session ou None, lido em)
+        self._dirty = {}  # session_id -> last_activity ainda não gravado
+        self._layouts = {}
+        self._flusher_pid = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.flushes = 0
+        self.batched_writes = 0
+        self.evicted = 0
+        self._lock = threading.RLock()
+        self.init_database()
+
+    def init_database(self):
+        """Cria a tabela de sessões e o índice usado na limpeza"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    user_data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_activity REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions (last_activity)"
+            )
+            conn.commit()
+
+    def _ensure_flusher(self):
+        """Thread de gravação em lote, uma por processo (recriada após fork)"""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._dirty = {}
+            self._cache = OrderedDict()
+            thread = threading.Thread(target=self._flush_loop, name="session-flush", daemon=True)
+            thread.start()
+            self._flusher_pid = os.getpid()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Erro ao gravar atividade das sessões: {e}")
+
+    def flush(self):
+        """Grava num único UPDATE em lote as renovações de atividade pendentes"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            pending, self._dirty = self._dirty, {}
+
+        with self.pool.connection() as conn:
+            conn.executemany(
+                "UPDATE sessions SET last_activity = MAX(last_activity, ?) WHERE session_id = ?",
+                [(last_activity, session_id) for session_id, last_activity in pending.items()]
+            )
+            conn.commit()
+
+        with self._lock:
+            self.flushes += 1
+            self.batched_writes += len(pending)
+        return len(pending)
+
+    def _make_session(self, user_id, user_data, created_at, last_activity):
+        keys = tuple(user_data)
+        with self._lock:
+            keys = self._layouts.setdefault(keys, keys)
+        session = Session(user_id, keys, tuple(user_data.values()), created_at)
+        session.last_activity = last_activity
+        return session
+
+    def _cache_put(self, session_id, session, now):
+        with self._lock:
+            self._cache[session_id] = (session, now)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _load(self, session_id, now):
+        """Lê a sessão do banco e guarda o resultado (inclusive ausência) no cache"""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT user_id, user_data, created_at, last_activity FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+
+        session = None
+        if row is not None:
+            session = self._make_session(row[0], json.loads(row[1]), row[2], row[3])
+            pending = self._dirty.get(session_id)
+            if pending and pending > session.last_activity:
+                session.last_activity = pending
+        self._cache_put(session_id, session, now)
+        return session
+
+    def create_session(self, user_id, user_data):
+        """Cria uma nova sessão para o usuário"""
+        self._ensure_flusher()
+        session_id = str(uuid.uuid4())
+        now = time.time()
+
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, user_id, user_data, created_at, last_activity) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, user_id, json.dumps(user_data, ensure_ascii=False), now, now)
+            )
+            conn.commit()
+
+        self._cache_put(session_id, self._make_session(user_id, user_data, now, now), now)
+        return session_id
+
+    def get_session(self, session_id):
+        """Recupera a sessão se válida (cache local; banco só após cache_ttl)"""
+        if not session_id:
+            return None
+        self._ensure_flusher()
+
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None and now - entry[1] < self.cache_ttl:
+                self._cache.move_to_end(session_id)
+                self.cache_hits += 1
+            else:
+                entry = None
+                self.cache_misses += 1
+
+        if entry is not None:
+            session = entry[0]
+            # expirada pelo cache? outro processo pode ter registrado atividade
+            if session is not None and now > session.last_activity + self.session_timeout:
+                session = self._load(session_id, now)
+        else:
+            session = self._load(session_id, now)
+
+        if session is None:
+            return None
+
+        # Verifica se a sessão expirou
+        if now > session.last_activity + self.session_timeout:
+            self.destroy_session(session_id)
+            return None
+
+        # Atualiza última atividade (gravada depois, em lote)
+        if now - session.last_activity >= self.touch_interval:
+            session.last_activity = now
+            with self._lock:
+                self._dirty[session_id] = now
+
+        return session
+
+    def destroy_session(self, session_id):
+        """Remove uma sessão do banco e do cache local"""
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._dirty.pop(session_id, None)
+
+        with self.pool.connection() as conn:
+            removed = conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+            conn.commit()
+        return removed > 0
+
+    def cleanup_expired_sessions(self):
+        """Remove sessões expiradas pelo índice de last_activity e aplica o limite"""
+        self.flush()
+        cutoff = time.time() - self.session_timeout
+
+        evicted = 0
+        with self.pool.connection() as conn:
+            expired = conn.execute("DELETE FROM sessions WHERE last_activity < ?", (cutoff,)).rowcount
+
+            if self.max_sessions:
+                total = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                excess = total - self.max_sessions
+                if excess > 0:
+                    evicted = conn.execute(
+                        "DELETE FROM sessions WHERE session_id IN "
+                        "(SELECT session_id FROM sessions ORDER BY last_activity LIMIT ?)",
+                        (excess,)
+                    ).rowcount
+            conn.commit()
+
+        if evicted:
+            with self._lock:
+                self.evicted += evicted
+        return expired
+
+    def extend_session(self, session_id):
+        """Estende o tempo de vida da sessão"""
+        session = self.get_session(session_id)
+        if session is None:
+            return False
+        session.last_activity = time.time()
+        with self._lock:
+            self._dirty[session_id] = session.last_activity
+        return True
+
+    def stats(self):
+        """Sessões no banco, uso do cache local e gravações em lote"""
+        with self.pool.connection() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        with self._lock:
+            return {
+                'backend': 'sqlite',
+                'sessions': total,
+                'max_sessions': self.max_sessions,
+                'evicted': self.evicted,
+                'cache_entries': len(self._cache),
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'pending_writes': len(self._dirty),
+                'flushes': self.flushes,
+                'batched_writes': self.batched_writes
+            }
+
+
+SESSION_BACKENDS = {
+    'memory': SessionManager,
+    'sqlite': SQLiteSessionManager,
+}
+
+
+def create_session_manager(backend='memory', **options):
+    """Instancia o armazenamento de sessões pelo nome ('memory' ou 'sqlite')"""
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"SESSION_BACKEND desconhecido: {backend} (use memory ou sqlite)")
+    if backend == 'memory':
+        options.pop('db_path', None)
+    return SESSION_BACKENDS[backend](**options)
@@ -0,0 +1,425 @@
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote
+from backend.assets import DIST_DIR, MANIFEST_NAME, file_digest
+from backend.utils import HTTPUtils, FileUtils
+
+
+class StaticAsset:
+    """Metadados de um arquivo do site (o conteúdo fica no LRU)"""
+    __slots__ = ('url_path', 'file_path', 'size', 'mtime_ns', 'content_type',
+                 'compressible', 'etag', 'last_modified', 'checked_at')
+
+    compressible_types = ('text/', 'application/javascript', 'application/json',
+                          'application/xml', 'image/svg+xml')
+
+    def __init__(self, url_path, file_path, stat):
+        self.url_path = url_path
+        self.file_path = file_path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.content_type = HTTPUtils.get_content_type(file_path)
+        self.compressible = self.content_type.startswith(self.compressible_types)
+        # Arquivos grandes não são lidos para hash; usam tamanho + mtime
+        self.etag = f'"{self.mtime_ns:x}-{self.size:x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.checked_at = time.monotonic()
+
+    def matches(self, stat):
+        """Confere se o arquivo em disco ainda é o mesmo"""
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+
+class StaticAssetCache:
+    """Índice dos arquivos do site com LRU limitado em bytes para os pequenos.
+
+    Cada entrada é revalidada por mtime/tamanho no máximo a cada
+    revalidate_interval segundos; arquivos alterados saem do cache.
+    Textos (HTML/CSS/JS...) ganham uma variante gzip pré-comprimida ao
+    entrar no cache, que conta no mesmo limite de bytes.
+    """
+    gzip_level = 9
+    # Abaixo disso o cabeçalho gzip come o ganho
+    gzip_min_size = 256
+    immutable_cache_control = 'public, max-age=31536000, immutable'
+
+    # Só isto é publicado: páginas e CSS/JS da raiz, Styles/, static/ e as páginas e o
+    # manifesto do build (dist/). Bancos, logs, exportações, perfis e código ficam de fora.
+    root_suffixes = ('.html', '.css', '.js')
+    asset_dirs = ('Styles', 'static')
+
+    def __init__(self, root, max_bytes=16 * 1024 * 1024, max_file_size=256 * 1024,
+                 revalidate_interval=2.0):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.revalidate_interval = revalidate_interval
+        self.index = {}
+        self._content = OrderedDict()
+        self._gzip = {}
+        self._content_bytes = 0
+        self._lock = threading.RLock()
+        self._indexed = False
+        # URL versionada -> (URL original, tamanho, mtime_ns) conferidos no carregamento
+        self.fingerprints = {}
+        # Página original -> versão reescrita pelo build (dist/)
+        self.page_overrides = {}
+        self.hits = 0
+        self.misses = 0
+
+    def is_servable(self, relative_path):
+        """Lista do que pode ser servido; o resto (e arquivos ocultos) não existe para o cliente"""
+        parts = relative_path.split('/')
+        if any(part.startswith('.') or part == '__pycache__' for part in parts):
+            return False
+        if len(parts) == 1:
+            return relative_path.endswith(self.root_suffixes)
+        if parts[0] in self.asset_dirs:
+            return True
+        if parts[0] == DIST_DIR and len(parts) == 2:
+            return parts[1].endswith('.html') or parts[1] == MANIFEST_NAME
+        return False
+
+    def build_index(self):
+        """Percorre a raiz do site e carrega os arquivos pequenos no cache"""
+        index = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')
+                           and (dirpath != self.root or d in self.asset_dirs or d == DIST_DIR)]
+            for filename in filenames:
+                file_path = os.path.join(dirpath, filename)
+                relative = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+                if not self.is_servable(relative):
+                    continue
+                stat = FileUtils.get_file_stat(file_path)
+                if stat is not None:
+                    index['/' + relative] = StaticAsset('/' + relative, file_path, stat)
+
+        with self._lock:
+            self.index = index
+            self._content.clear()
+            self._gzip.clear()
+            self._content_bytes = 0
+            self._indexed = True
+
+        for asset in list(index.values()):
+            if asset.size <= self.max_file_size and self._content_bytes < self.max_bytes:
+                self.get_content(asset)
+        return len(index)
+
+    def normalize_path(self, path):
+        """Decodifica a URL e rejeita tentativas de sair da raiz"""
+        path = unquote(path)
+        if '\x00' in path:
+            return None
+        normalized = posixpath.normpath('/' + path.lstrip('/'))
+        if normalized.startswith('/..'):
+            return None
+        return normalized
+
+    def load_manifest(self, output_dir):
+        """Carrega o manifesto do build de assets; retorna quantas URLs versionadas valem.
+
+        Cada asset tem o hash conferido com o arquivo atual: um build
+        desatualizado não faz o servidor marcar conteúdo errado como imutável.
+        """
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        fingerprints = {}
+        for original, entry in manifest.items():
+            asset = self.lookup(original)
+            if asset is None or file_digest(asset.file_path) != entry.get('sha256'):
+                continue
+            fingerprints[entry['url']] = (original, asset.size, asset.mtime_ns)
+
+        relative_dir = os.path.relpath(os.path.abspath(output_dir), self.root).replace(os.sep, '/')
+        page_overrides = {}
+        for entry in os.listdir(output_dir):
+            if entry.endswith('.html'):
+                page_overrides['/' + entry] = f'/{relative_dir}/{entry}'
+
+        with self._lock:
+            self.fingerprints = fingerprints
+            self.page_overrides = page_overrides
+        return len(fingerprints)
+
+    def resolve(self, path):
+        """Como lookup, mas entende URLs versionadas e páginas do build.
+
+        Retorna (asset, imutável).
+        """
+        url_path = self.normalize_path(path)
+        if url_path is None:
+            return None, False
+
+        fingerprint = self.fingerprints.get(url_path)
+        if fingerprint is not None:
+            original, size, mtime_ns = fingerprint
+            asset = self._get(original)
+            # Se o arquivo mudou depois do build, o hash da URL não vale mais
+            immutable = asset is not None and asset.size == size and asset.mtime_ns == mtime_ns
+            return asset, immutable
+
+        override = self.page_overrides.get(url_path)
+        if override is not None:
+            asset = self._get(override)
+            if asset is not None:
+                return asset, False
+
+        return self._get(url_path), False
+
+    def lookup(self, path):
+        """Retorna o StaticAsset da URL, ou None se não existir"""
+        url_path = self.normalize_path(path)
+        if url_path is None:
+            return None
+        return self._get(url_path)
+
+    def _get(self, url_path):
+        """Busca no índice uma URL já normalizada"""
+        if not self._indexed:
+            self.build_index()
+
+        asset = self.index.get(url_path)
+        if asset is None:
+            return self._discover(url_path)
+
+        now = time.monotonic()
+        if now - asset.checked_at < self.revalidate_interval:
+            return asset
+        return self._revalidate(asset, now)
+
+    def _discover(self, url_path):
+        """Indexa arquivo criado depois da inicialização"""
+        relative = url_path.lstrip('/')
+        if not relative or not self.is_servable(relative):
+            return None
+        file_path = os.path.join(self.root, *relative.split('/'))
+        if not FileUtils.file_exists(file_path):
+            return None
+        stat = FileUtils.get_file_stat(file_path)
+        if stat is None:
+            return None
+
+        asset = StaticAsset(url_path, file_path, stat)
+        with self._lock:
+            self.index[url_path] = asset
+        return asset
+
+    def is_cacheable(self, asset):
+        """Arquivos pequenos ficam em memória; os grandes são enviados por streaming"""
+        return asset.size <= self.max_file_size
+
+    def refresh(self, asset):
+        """Revalida a entrada imediatamente (ex.: tamanho mudou durante o envio)"""
+        return self._revalidate(asset, time.monotonic())
+
+    def _revalidate(self, asset, now):
+        """Confere mtime/tamanho e descarta o conteúdo se o arquivo mudou"""
+        stat = FileUtils.get_file_stat(asset.file_path)
+        with self._lock:
+            if stat is None:
+                self.index.pop(asset.url_path, None)
+                self._evict(asset.url_path)
+                return None
+            if asset.matches(stat):
+                asset.checked_at = now
+                return asset
+
+            fresh = StaticAsset(asset.url_path, asset.file_path, stat)
+            self.index[asset.url_path] = fresh
+            self._evict(asset.url_path)
+            return fresh
+
+    def get_gzip(self, asset):
+        """Variante gzip pré-comprimida (None se não existir)"""
+        return self._gzip.get(asset.url_path)
+
+    def get_cached(self, asset):
+        """Conteúdo em memória, sem tocar no disco (None se não estiver no cache)"""
+        with self._lock:
+            content = self._content.get(asset.url_path)
+            if content is not None:
+                self._content.move_to_end(asset.url_path)
+                self.hits += 1
+            return content
+
+    def get_content(self, asset):
+        """Conteúdo do arquivo, lendo do disco e guardando no LRU se couber"""
+        content = self.get_cached(asset)
+        if content is not None:
+            return content
+
+        content = FileUtils.read_file(asset.file_path)
+        if content is None:
+            return None
+
+        cacheable = len(content) == asset.size <= self.max_file_size
+        compressed = None
+        if cacheable and asset.compressible and len(content) >= self.gzip_min_size:
+            # mtime=0 deixa a saída idêntica entre processos e reinícios
+            compressed = gzip.compress(content, compresslevel=self.gzip_level, mtime=0)
+            if len(compressed) >= len(content):
+                compressed = None
+
+        with self._lock:
+            self.misses += 1
+            if cacheable and self.index.get(asset.url_path) is asset:
+                # ETag forte a partir do conteúdo, estável entre processos
+                asset.etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+                self._store(asset.url_path, content, compressed)
+        return content
+
+    def _store(self, url_path, content, compressed=None):
+        self._evict(url_path)
+        self._content[url_path] = content
+        self._content_bytes += len(content)
+        if compressed is not None:
+            self._gzip[url_path] = compressed
+            self._content_bytes += len(compressed)
+        while self._content_bytes > self.max_bytes and self._content:
+            old_path = next(iter(self._content))
+            self._evict(old_path)
+
+    def _evict(self, url_path):
+        content = self._content.pop(url_path, None)
+        if content is not None:
+            self._content_bytes -= len(content)
+        compressed = self._gzip.pop(url_path, None)
+        if compressed is not None:
+            self._content_bytes -= len(compressed)
+
+    @staticmethod
+    def gzip_etag(asset):
+        """ETag da variante gzip (diferente da original, como exige a RFC)"""
+        return asset.etag[:-1] + '-gzip"'
+
+    def validator_headers(self, asset, etag=None, immutable=False):
+        """Cabeçalhos de validação enviados com 200 e 304"""
+        return [
+            ('ETag', etag or asset.etag),
+            ('Last-Modified', asset.last_modified),
+            ('Cache-Control', self.immutable_cache_control if immutable else 'no-cache'),
+        ]
+
+    def is_not_modified(self, asset, headers, etag=None):
+        """Avalia If-None-Match / If-Modified-Since da requisição"""
+        if_none_match = headers.get('If-None-Match')
+        if if_none_match:
+            return HTTPUtils.etag_matches(if_none_match, etag or asset.etag)
+
+        if_modified_since = headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(asset.mtime_ns // 1_000_000_000) <= since
+        return False
+
+    def range_applies(self, asset, headers):
+        """Range só vale se If-Range (quando presente) bate com a versão atual"""
+        if not headers.get('Range'):
+            return False
+        if_range = headers.get('If-Range')
+        if not if_range:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            return if_range == asset.etag
+        return if_range == asset.last_modified
+
+    def plan_response(self, asset, headers, content=None, immutable=False):
+        """Decide status, cabeçalhos e partes do corpo de uma resposta estática.
+
+        content: bytes do arquivo quando está em memória (None = streaming).
+        immutable: URL versionada, pode ficar um ano no cache do navegador.
+        Retorna (status, cabeçalhos, partes, corpo): as partes são bytes
+        literais ou tuplas (offset, count) de corpo, que é o conteúdo em
+        memória (original ou gzip) ou None para ler do arquivo.
+        """
+        body = content
+        etag = asset.etag
+        negotiated = []
+        if asset.compressible:
+            negotiated.append(('Vary', 'Accept-Encoding'))
+            # Range sempre sobre a representação original
+            compressed = self.get_gzip(asset) if content is not None else None
+            if (compressed is not None and not headers.get('Range')
+                    and HTTPUtils.accepts_encoding(headers.get('Accept-Encoding'), 'gzip')):
+                body = compressed
+                etag = self.gzip_etag(asset)
+                negotiated.append(('Content-Encoding', 'gzip'))
+
+        validators = self.validator_headers(asset, etag, immutable)
+        if self.is_not_modified(asset, headers, etag):
+            return 304, validators + negotiated[:1], [], None
+
+        if body is not None and body is not content:
+            return 200, [('Content-Type', asset.content_type)] + validators + negotiated, \
+                [(0, len(body))], body
+
+        base_headers = [('Content-Type', asset.content_type), ('Accept-Ranges', 'bytes')] + validators + negotiated
+
+        ranges = None
+        if self.range_applies(asset, headers):
+            ranges = HTTPUtils.parse_range_header(headers.get('Range'), asset.size)
+
+        if ranges is None:
+            return 200, base_headers, [(0, asset.size)], body
+
+        if not ranges:
+            return 416, [('Content-Range', f'bytes */{asset.size}')], [], None
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            base_headers.append(('Content-Range', f'bytes {start}-{end}/{asset.size}'))
+            return 206, base_headers, [(start, end - start + 1)], body
+
+        boundary = uuid.uuid4().hex
+        parts = []
+        for start, end in ranges:
+            parts.append((
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {asset.content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{asset.size}\r\n\r\n"
+            ).encode('latin-1'))
+            parts.append((start, end - start + 1))
+        parts.append(f"\r\n--{boundary}--\r\n".encode('latin-1'))
+
+        multipart_headers = [
+            ('Content-Type', f'multipart/byteranges; boundary={boundary}'),
+            ('Accept-Ranges', 'bytes'),
+        ] + validators + negotiated
+        return 206, multipart_headers, parts, body
+
+    @staticmethod
+    def body_length(parts):
+        """Tamanho total do corpo descrito pelas partes"""
+        return sum(len(part) if isinstance(part, bytes) else part[1] for part in parts)
+
+    def stats(self):
+        """Estatísticas do cache"""
+        with self._lock:
+            return {
+                'files_indexed': len(self.index),
+                'fingerprinted_urls': len(self.fingerprints),
+                'files_cached': len(self._content),
+                'gzip_variants': len(self._gzip),
+                'bytes_cached': self._content_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
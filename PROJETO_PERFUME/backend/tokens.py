@@ -0,0 +1,235 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+from backend.database import ConnectionPool
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def parse_keys(spec):
+    """TOKEN_KEYS="id1:segredo1,id2:segredo2" -> [(id, bytes)]; a primeira assina"""
+    keys = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        key_id, sep, secret = item.partition(':')
+        if not sep or not key_id or not secret or '.' in key_id:
+            raise ValueError(f"Chave de token inválida: {item!r} (use id:segredo)")
+        keys.append((key_id, secret.encode()))
+    if not keys:
+        raise ValueError("TOKEN_KEYS não tem nenhuma chave")
+    return keys
+
+
+class TokenSigner:
+    """Tokens assinados com HMAC-SHA256: <id da chave>.<payload>.<assinatura>.
+
+    O payload (JSON em base64url) leva id do usuário, nome de exibição,
+    expiração e um identificador único (jti) para revogação. Qualquer chave
+    da lista valida; só a primeira assina, o que permite rotação sem
+    derrubar tokens emitidos com a chave anterior.
+    """
+
+    def __init__(self, keys, ttl=3600):
+        self.keys = dict(keys)
+        self.current_key_id = keys[0][0]
+        self.ttl = ttl
+
+    def sign(self, key_id, payload_b64):
+        digest = hmac.new(self.keys[key_id], f"{key_id}.{payload_b64}".encode(), hashlib.sha256)
+        return _b64encode(digest.digest())
+
+    def issue(self, user_id, display_name):
+        """Gera o token e devolve (token, payload)"""
+        payload = {
+            'uid': user_id,
+            'name': display_name,
+            'exp': int(time.time()) + self.ttl,
+            'jti': secrets.token_urlsafe(12)
+        }
+        payload_b64 = _b64encode(json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode())
+        token = f"{self.current_key_id}.{payload_b64}.{self.sign(self.current_key_id, payload_b64)}"
+        return token, payload
+
+    def verify(self, token):
+        """Payload do token se assinatura e validade conferem; senão None"""
+        if not token or token.count('.') != 2:
+            return None
+        key_id, payload_b64, signature = token.split('.')
+        if key_id not in self.keys:
+            return None
+        # bytes: o cookie pode trazer texto não ASCII, que compare_digest não aceita em str
+        expected = self.sign(key_id, payload_b64).encode()
+        if not hmac.compare_digest(signature.encode('utf-8', 'surrogateescape'), expected):
+            return None
+        try:
+            payload = json.loads(_b64decode(payload_b64))
+        except ValueError:
+            return None
+        if not isinstance(payload, dict) or payload.get('exp', 0) < time.time():
+            return None
+        return payload
+
+
+class RevocationList:
+    """Tokens revogados no logout (jti -> expiração).
+
+    A consulta é sempre local. Com `db_path`, as revogações também vão para
+    uma tabela SQLite que uma thread de cada processo relê a cada
+    `refresh_interval` segundos, para valerem em todos os workers.
+    """
+    # Faxina de entradas vencidas: a cada tantas releituras (com banco) ou revogações (sem banco)
+    prune_every = 60
+
+    def __init__(self, db_path=None, refresh_interval=1.0):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self._revoked = {}
+        self._revocations = 0
+        self._last_row = 0
+        self._refresher_pid = None
+        self._lock = threading.Lock()
+        self.pool = None
+        if db_path:
+            self.pool = ConnectionPool(db_path, max_size=2, metrics_name='token_db')
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS revoked_tokens (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        jti TEXT UNIQUE NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                ''')
+                conn.commit()
+
+    def _ensure_refresher(self):
+        if self.pool is None or self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._refresh_loop, name="token-revocations", daemon=True)
+            thread.start()
+            self._refresher_pid = os.getpid()
+
+    def _refresh_loop(self):
+        rounds = 0
+        while True:
+            try:
+                self.refresh(prune=rounds % self.prune_every == 0)
+            except Exception as e:
+                print(f"⚠️  Erro ao ler tokens revogados: {e}")
+            rounds += 1
+            time.sleep(self.refresh_interval)
+
+    def refresh(self, prune=False):
+        """Carrega as revogações novas do banco e descarta as já expiradas"""
+        now = time.time()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, jti, expires_at FROM revoked_tokens WHERE id > ? ORDER BY id",
+                (self._last_row,)
+            ).fetchall()
+            if prune:
+                conn.execute("DELETE FROM revoked_tokens WHERE expires_at < ?", (now,))
+                conn.commit()
+
+        with self._lock:
+            for row_id, jti, expires_at in rows:
+                self._revoked[jti] = expires_at
+                self._last_row = row_id
+            if prune:
+                self._prune(now)
+
+    def _prune(self, now):
+        """Descarta as revogações de tokens já expirados (com o lock em mãos)"""
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp >= now}
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._revocations += 1
+            # sem banco não há thread de releitura: a faxina vem junto com as revogações
+            if self.pool is None and self._revocations % self.prune_every == 0:
+                self._prune(time.time())
+        if self.pool is not None:
+            with self.pool.connection() as conn:
+                conn.execute("INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                             (jti, expires_at))
+                conn.commit()
+
+    def is_revoked(self, jti):
+        self._ensure_refresher()
+        return jti in self._revoked
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+class TokenManager:
+    """Autenticação sem estado compartilhado: valida o cookie assinado e
+    consulta apenas a lista local de revogação."""
+
+    cookie_name = 'auth_token'
+
+    def __init__(self, signer, revocations=None):
+        self.signer = signer
+        self.revocations = revocations if revocations is not None else RevocationList()
+        self.issued = 0
+        self.rejected = 0
+
+    @property
+    def ttl(self):
+        return self.signer.ttl
+
+    def issue(self, user):
+        """Token para o usuário autenticado (id e nome de exibição)"""
+        token, _ = self.signer.issue(user['id'], user.get('nome', ''))
+        self.issued += 1
+        return token
+
+    def _payload(self, token):
+        payload = self.signer.verify(token)
+        if payload is None or self.revocations.is_revoked(payload.get('jti')):
+            if token:
+                self.rejected += 1
+            return None
+        return payload
+
+    def get_user_data(self, token):
+        """{'id', 'nome'} do token válido, ou None"""
+        payload = self._payload(token)
+        if payload is None:
+            return None
+        return {'id': payload['uid'], 'nome': payload['name']}
+
+    def revoke(self, token):
+        """Revoga o token (logout) até a expiração dele"""
+        payload = self.signer.verify(token)
+        if payload is None:
+            return False
+        self.revocations.revoke(payload['jti'], payload['exp'])
+        return True
+
+    def stats(self):
+        return {
+            'key_id': self.signer.current_key_id,
+            'keys': len(self.signer.keys),
+            'ttl': self.signer.ttl,
+            'issued': self.issued,
+            'rejected': self.rejected,
+            'revoked': len(self.revocations)
+        }
@@ -1,3 +1,4 @@
+import gzip
 import json
 import mimetypes
 import os
@@ -6,16 +7,22 @@ from urllib.parse import parse_qs, urlparse
 class HTTPUtils:
     @staticmethod
     def parse_post_data(content_type, post_data):
-        """Parse dados POST baseado no Content-Type"""
+        """Parse dados POST baseado no Content-Type (corpo em bytes ou já decodificado)"""
+        if isinstance(post_data, bytes):
+            try:
+                post_data = post_data.decode('utf-8')
+            except UnicodeDecodeError:
+                return {}
+        
         if 'application/json' in content_type:
             try:
-                return json.loads(post_data.decode('utf-8'))
+                return json.loads(post_data)
             except json.JSONDecodeError:
                 return {}
         
         elif 'application/x-www-form-urlencoded' in content_type:
             try:
-                parsed = parse_qs(post_data.decode('utf-8'))
+                parsed = parse_qs(post_data)
                 # Converte listas de um elemento em strings
                 return {k: v[0] if len(v) == 1 else v for k, v in parsed.items()}
             except:
@@ -55,6 +62,97 @@ class HTTPUtils:
             'body': ''
         }
     
+    @staticmethod
+    def parse_range_header(range_header, size, max_ranges=16):
+        """Parse do cabeçalho Range (bytes=...).
+        
+        Retorna lista de (início, fim) inclusivos, já ordenada e sem
+        sobreposição; [] se nenhum intervalo é satisfazível; None se o
+        cabeçalho deve ser ignorado (ausente, malformado ou abusivo).
+        """
+        if not range_header or not range_header.startswith('bytes='):
+            return None
+        
+        ranges = []
+        for spec in range_header[6:].split(','):
+            spec = spec.strip()
+            if '-' not in spec:
+                return None
+            first, _, last = spec.partition('-')
+            try:
+                if first:
+                    start = int(first)
+                    end = int(last) if last else max(size - 1, start)
+                    if end < start:
+                        return None
+                elif last:
+                    # sufixo: últimos N bytes
+                    start = max(size - int(last), 0)
+                    end = size - 1
+                else:
+                    return None
+            except ValueError:
+                return None
+            if start < size:
+                ranges.append((start, min(end, size - 1)))
+        
+        ranges.sort()
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        
+        if len(merged) > max_ranges:
+            return None
+        return merged
+    
+    @staticmethod
+    def accepts_encoding(accept_encoding, coding):
+        """Verifica se o Accept-Encoding aceita a codificação (q > 0)"""
+        if not accept_encoding:
+            return False
+        
+        wildcard = None
+        for item in accept_encoding.split(','):
+            name, _, params = item.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            name = name.strip().lower()
+            if name == coding:
+                return quality > 0
+            if name == '*':
+                wildcard = quality > 0
+        return bool(wildcard)
+    
+    @staticmethod
+    def etag_matches(if_none_match, etag):
+        """If-None-Match casa com o ETag? (comparação fraca, RFC 7232 para GET)"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        return etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    
+    @staticmethod
+    def compress_response_body(body, accept_encoding, min_size=1024, level=6):
+        """Comprime corpos grandes com gzip se o cliente aceitar.
+        
+        Retorna (corpo, comprimido).
+        """
+        if len(body) < min_size or not HTTPUtils.accepts_encoding(accept_encoding, 'gzip'):
+            return body, False
+        compressed = gzip.compress(body, compresslevel=level)
+        if len(compressed) >= len(body):
+            return body, False
+        return compressed, True
+    
     @staticmethod
     def parse_cookies(cookie_header):
         """Parse cookies do header HTTP"""
@@ -99,6 +197,42 @@ class FileUtils:
         """Verifica se arquivo existe"""
         return os.path.isfile(file_path)
     
+    @staticmethod
+    def open_file(file_path):
+        """Abre arquivo para streaming (None se não for possível)"""
+        try:
+            return open(file_path, 'rb')
+        except OSError:
+            return None
+    
+    @staticmethod
+    def send_file(sock, file_obj, offset, count, chunk_size=64 * 1024):
+        """Envia trecho do arquivo pelo socket sem carregá-lo em memória.
+        
+        Usa os.sendfile (cópia no kernel) quando existe; senão copia em
+        blocos de chunk_size.
+        """
+        if hasattr(os, 'sendfile'):
+            return sock.sendfile(file_obj, offset, count)
+        
+        file_obj.seek(offset)
+        sent = 0
+        while sent < count:
+            chunk = file_obj.read(min(chunk_size, count - sent))
+            if not chunk:
+                break
+            sock.sendall(chunk)
+            sent += len(chunk)
+        return sent
+    
+    @staticmethod
+    def get_file_stat(file_path):
+        """Retorna os.stat do arquivo (None se não existir)"""
+        try:
+            return os.stat(file_path)
+        except OSError:
+            return None
+    
     @staticmethod
     def get_file_size(file_path):
         """Retorna tamanho do arquivo"""
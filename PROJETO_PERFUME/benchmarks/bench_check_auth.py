@@ -0,0 +1,69 @@
+"""
+Custo de resolver o usuário do check-auth: session_id em memória, em SQLite
+(com e sem o cache local) e token assinado com HMAC.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_check_auth [--users 20000] [--reads 200000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from backend.session import SessionManager, SQLiteSessionManager
+from backend.tokens import TokenManager, TokenSigner, RevocationList
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def measure(lookup, credentials, reads):
+    rng = random.Random(7)
+    latencies = []
+    for _ in range(reads):
+        credential = rng.choice(credentials)
+        start = time.perf_counter()
+        lookup(credential)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--reads', type=int, default=200000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    try:
+        users = [{'id': i, 'nome': f'Nome{i}', 'sobrenome': 'Teste'} for i in range(args.users)]
+        tokens = TokenManager(TokenSigner([('k1', b'segredo-do-benchmark')], ttl=3600),
+                              RevocationList(os.path.join(workdir, 'tokens.db')))
+        sessions = {
+            'sessão memória': SessionManager(touch_interval=60),
+            'sessão sqlite (cache)': SQLiteSessionManager(os.path.join(workdir, 'a.db'), cache_size=args.users,
+                                                          cache_ttl=3600),
+            'sessão sqlite (sem cache)': SQLiteSessionManager(os.path.join(workdir, 'b.db'), cache_ttl=0),
+        }
+
+        print(f"📊 {args.users} usuários logados, {args.reads} verificações\n")
+        print(f"{'credencial':<28}{'média µs':>10}{'p50 µs':>10}{'p99 µs':>10}")
+        rows = [(label, manager.get_user_data, [manager.create_session(u['id'], u) for u in users])
+                for label, manager in sessions.items()]
+        rows.append(('token hmac', tokens.get_user_data, [tokens.issue(u) for u in users]))
+        for label, lookup, credentials in rows:
+            latencies = measure(lookup, credentials, args.reads)
+            print(f"{label:<28}{statistics.mean(latencies):>10.2f}{percentile(latencies, 50):>10.2f}"
+                  f"{percentile(latencies, 99):>10.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
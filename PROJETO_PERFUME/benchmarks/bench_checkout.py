@@ -0,0 +1,204 @@
+"""
+Pico de compras num único produto: milhares de compradores simultâneos
+disputando um estoque pequeno, e a conferência de que nada foi vendido
+além do estoque.
+
+Compara o CheckoutService como o servidor usa (`fila`: uma thread de
+escrita por processo, lotes com um commit, esgotado recusado antes da
+fila) com cada thread abrindo a própria transação (`direto`). Parte dos
+compradores clica duas vezes (mesma Idempotency-Key) e quem recebe 503
+tenta de novo com a mesma chave; no fim, cada comprador tem no máximo um
+pedido e a soma dos pedidos é exatamente o que saiu do estoque.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_checkout [--buyers 3000] [--stock 100] [--threads 64] [--processes 1]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+from backend.cart import CartStore
+from backend.catalog import ProductCatalog
+from backend.database import Database
+from backend.orders import CheckoutService
+
+PRODUCT = 'dior-jadore'
+
+
+class DirectCheckout(CheckoutService):
+    """Sem fila e sem aviso de esgotado: cada thread disputa o lock de escrita do SQLite"""
+    soldout_ttl = 0.0
+
+    def enqueue(self, fn, *args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.run_batch([(future, fn, args)])
+        return future.result()
+
+
+def seed(db_path, buyers, stock):
+    """Compradores com 1 unidade do produto no carrinho e o estoque do produto"""
+    db = Database(db_path)
+    with db.pool.connection() as conn:
+        conn.executemany('''
+            INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ((f'Comprador{i}', 'Teste', f'{i:011d}', '11999999999', '1990-01-01',
+               f'buyer{i}@bench.local', 'x') for i in range(1, buyers + 1)))
+        user_ids = [user_id for user_id, in conn.execute("SELECT id FROM users ORDER BY id")]
+        for user_id in user_ids:
+            CartStore.save(conn, user_id, {PRODUCT: 1}, {})
+        conn.execute("UPDATE inventory SET disponivel = ? WHERE product_id = ?", (stock, PRODUCT))
+        conn.commit()
+    db.pool.close_all()
+    return user_ids
+
+
+def buy(service, user_id, key, double_click):
+    """Uma compra, como o navegador faria: reenvia a mesma chave após 503"""
+    started = time.perf_counter()
+    attempts = 0
+    while True:
+        attempts += 1
+        if double_click:
+            second = threading.Thread(target=service.checkout, args=(user_id, key))
+            second.start()
+        status, body = service.checkout(user_id, key)
+        if double_click:
+            second.join()
+            double_click = False
+        if status != 503 or attempts >= 20:
+            break
+        time.sleep(0.05 * attempts)
+    order_id = body['data']['order']['id'] if status == 200 else None
+    return status, order_id, attempts, time.perf_counter() - started
+
+
+def run_buyers(mode, db_path, user_ids, threads, double_click_rate, seed_value):
+    """Dispara todos os compradores ao mesmo tempo; devolve [(status, pedido, tentativas, segundos)]"""
+    db = Database(db_path, pool_size=threads)
+    catalog = ProductCatalog(db)
+    service = (CheckoutService if mode == 'fila' else DirectCheckout)(db, catalog, CartStore(db, catalog))
+    rng = random.Random(seed_value)
+    jobs = [(user_id, f'bench-{user_id}-{mode}', rng.random() < double_click_rate) for user_id in user_ids]
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(chunk):
+        barrier.wait()
+        local = [buy(service, *job) for job in chunk]
+        with lock:
+            results.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(jobs[i::threads],)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    db.pool.close_all()
+    return results, service.stats()
+
+
+def run_process(args):
+    mode, db_path, user_ids, threads, double_click_rate, index, output = args
+    output.put(run_buyers(mode, db_path, user_ids, threads, double_click_rate, index))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def verify(db_path, user_ids, stock):
+    """Confere o banco: estoque não negativo, vendido = pedidos, um pedido por comprador"""
+    db = Database(db_path)
+    with db.pool.connection() as conn:
+        left = conn.execute("SELECT disponivel FROM inventory WHERE product_id = ?", (PRODUCT,)).fetchone()[0]
+        sold = conn.execute('''
+            SELECT COALESCE(SUM(i.quantidade), 0) FROM order_items i
+            JOIN orders o ON o.id = i.order_id WHERE i.product_id = ? AND o.status = 'reservado'
+        ''', (PRODUCT,)).fetchone()[0]
+        orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        most_per_buyer = conn.execute(
+            "SELECT COALESCE(MAX(n), 0) FROM (SELECT COUNT(*) AS n FROM orders GROUP BY user_id)"
+        ).fetchone()[0]
+    db.pool.close_all()
+    return {
+        'left': left,
+        'sold': sold,
+        'orders': orders,
+        'most_per_buyer': most_per_buyer,
+        'ok': left >= 0 and sold + left == stock and sold == min(stock, len(user_ids)) and most_per_buyer <= 1
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buyers', type=int, default=3000)
+    parser.add_argument('--stock', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=64, help="threads por processo")
+    parser.add_argument('--processes', type=int, default=1, help="processos (como PROCESSES no run.py)")
+    parser.add_argument('--double-click', type=float, default=0.1, help="fração que envia o pedido duas vezes")
+    parser.add_argument('--modes', default='direto,fila')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    failed = False
+    try:
+        modes = args.modes.split(',')
+        paths = {mode: os.path.join(workdir, f'checkout-{mode}.db') for mode in modes}
+        for mode in modes:
+            user_ids = seed(paths[mode], args.buyers, args.stock)
+        print(f"\n📊 {args.buyers} compradores, {args.stock} unidades, "
+              f"{args.processes} processo(s) x {args.threads} threads\n")
+        print(f"{'modo':<8}{'vendidos':>9}{'409':>7}{'503':>6}{'reenvios':>9}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'total s':>9}{'lotes':>7}  conferência")
+        for mode in modes:
+            db_path = paths[mode]
+
+            started = time.perf_counter()
+            if args.processes <= 1:
+                results, stats = run_buyers(mode, db_path, user_ids, args.threads, args.double_click, 0)
+                all_stats = [stats]
+            else:
+                context = multiprocessing.get_context('fork')
+                output = context.Queue()
+                workers = [context.Process(target=run_process, args=((
+                    mode, db_path, user_ids[i::args.processes], args.threads, args.double_click, i, output),))
+                    for i in range(args.processes)]
+                for worker in workers:
+                    worker.start()
+                collected = [output.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+                results = [result for chunk, _ in collected for result in chunk]
+                all_stats = [stats for _, stats in collected]
+            elapsed = time.perf_counter() - started
+
+            statuses = [status for status, _, _, _ in results]
+            latencies = [seconds * 1000 for _, _, _, seconds in results]
+            retries = sum(attempts - 1 for _, _, attempts, _ in results)
+            check = verify(db_path, user_ids, args.stock)
+            failed |= not check['ok']
+            print(f"{mode:<8}{statuses.count(200):>9}{statuses.count(409):>7}{statuses.count(503):>6}{retries:>9}"
+                  f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 99):>9.1f}{elapsed:>9.2f}"
+                  f"{sum(stats['batches'] for stats in all_stats):>7}  "
+                  f"{'✅' if check['ok'] else '❌'} estoque {check['left']}, {check['sold']} vendidos em "
+                  f"{check['orders']} pedidos (máx. {check['most_per_buyer']} por comprador)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Latência por chamada do Database: conexão nova a cada chamada (como era)
+contra o pool de conexões em modo WAL.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_database [--users 5000] [--calls 3000] [--threads 8]
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from backend.database import Database
+
+
+class LegacyHashingMixin:
+    """SHA-256 simples nos dois lados, para medir só o custo das conexões"""
+    rehash_on_login = False
+
+    def hash_password(self, password):
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def verify_password(self, password, stored):
+        return hmac.compare_digest(self.hash_password(password), stored)
+
+
+class PooledDatabase(LegacyHashingMixin, Database):
+    """Database atual (pool de conexões em WAL)"""
+
+
+class LegacyDatabase(LegacyHashingMixin, Database):
+    """Comportamento anterior: sqlite3.connect/close em toda chamada"""
+
+    def init_database(self):
+        # A tabela já existe (seed); volta ao journal padrão, sem WAL
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+
+    def get_user_by_id(self, user_id):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+        try:
+            user = conn.execute('''
+                SELECT id, nome, sobrenome, email, cpf, telefone, data_nascimento, created_at
+                FROM users WHERE id = ?
+            ''', (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return {"success": user is not None}
+
+    def authenticate_user(self, login, senha):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+        try:
+            user = conn.execute('''
+                SELECT id, nome, sobrenome, email, cpf FROM users
+                WHERE (email = ? OR cpf = ?) AND senha_hash = ?
+            ''', (login, login, self.hash_password(senha))).fetchone()
+        finally:
+            conn.close()
+        return {"success": user is not None}
+
+    def create_user(self, nome, sobrenome, cpf, telefone, data_nascimento, email, senha):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+        try:
+            conn.execute('''
+                INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (nome, sobrenome, cpf, telefone, data_nascimento, email, self.hash_password(senha)))
+            conn.commit()
+        finally:
+            conn.close()
+        return {"success": True}
+
+
+def seed(db_path, users):
+    """Popula o banco com usuários sintéticos numa única transação"""
+    db = PooledDatabase(db_path)
+    senha_hash = db.hash_password('senha123')
+    with db.pool.connection() as conn:
+        conn.executemany('''
+            INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ((f'Nome{i}', 'Teste', f'{i:011d}', '11999999999', '1990-01-01',
+               f'user{i}@bench.local', senha_hash) for i in range(1, users + 1)))
+        conn.commit()
+    db.pool.close_all()
+
+
+def measure(db, operation, calls, threads):
+    """Executa `calls` chamadas divididas entre `threads`; devolve latências em µs"""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = calls // threads
+
+    def worker(offset):
+        local = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            operation(db, offset * per_thread + i)
+            local.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--calls', type=int, default=3000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    users = args.users
+    operations = {
+        'get_user_by_id': lambda db, i: db.get_user_by_id(random.randint(1, users)),
+        'authenticate_user': lambda db, i: db.authenticate_user(
+            f'user{random.randint(1, users)}@bench.local', 'senha123'),
+        'create_user': lambda db, i: db.create_user(
+            'Novo', 'Usuario', f'9{os.getpid():05d}{i:05d}'[-11:], '11988887777',
+            '1995-05-05', f'novo{i}-{db.__class__.__name__}@bench.local', 'senha123'),
+    }
+
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    try:
+        print(f"📊 {users} usuários, {args.calls} chamadas por operação, {args.threads} threads\n")
+        print(f"{'operação':<20}{'modo':<10}{'média µs':>10}{'p50 µs':>10}{'p99 µs':>10}{'ops/s':>10}")
+        for name, operation in operations.items():
+            for label, cls in (('legacy', LegacyDatabase), ('pool', PooledDatabase)):
+                db_path = os.path.join(workdir, f'{name}-{label}.db')
+                seed(db_path, users)
+                db = cls(db_path, pool_size=args.threads)
+                latencies, elapsed = measure(db, operation, args.calls, args.threads)
+                print(f"{name:<20}{label:<10}{statistics.mean(latencies):>10.1f}"
+                      f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}"
+                      f"{len(latencies) / elapsed:>10.0f}")
+                db.pool.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
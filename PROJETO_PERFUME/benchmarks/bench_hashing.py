@@ -0,0 +1,112 @@
+"""
+Rajada de logins (credential stuffing) contra o pool de hashing de senhas,
+com tráfego de perfil rodando em paralelo.
+
+Mede a latência dos logins aceitos, quantos foram recusados com 503
+(fila cheia) e a latência de get_user_by_id durante a rajada.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_hashing [--attackers 64] [--seconds 5]
+        [--hash-workers 2] [--queue-size 8] [--algorithm scrypt]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from backend.database import Database
+from backend.hashing import PasswordHasher, HashingPool
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summary(label, latencies):
+    if not latencies:
+        return f"{label:<22}{'-':>10}{'-':>10}{'-':>10}{0:>8}"
+    return (f"{label:<22}{statistics.mean(latencies):>10.1f}{percentile(latencies, 50):>10.1f}"
+            f"{percentile(latencies, 99):>10.1f}{len(latencies):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attackers', type=int, default=64, help='threads tentando login ao mesmo tempo')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-size', type=int, default=None, help='padrão: 4 por thread de hash')
+    parser.add_argument('--algorithm', default='scrypt', choices=PasswordHasher.algorithms)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    try:
+        db = Database(
+            os.path.join(workdir, 'users.db'),
+            pool_size=args.attackers + 1,
+            hasher=PasswordHasher(algorithm=args.algorithm),
+            hash_pool=HashingPool(workers=args.hash_workers, queue_size=args.queue_size)
+        )
+        db.create_user('Ana', 'Silva', '529.982.247-25', '11999999999', '1990-01-01',
+                       'ana@bench.local', 'senha-correta')
+        print(f"🔐 {db.hasher.describe()}, {args.hash_workers} threads de hash, fila {db.hash_pool.queue_size}")
+        print(f"⚔️  {args.attackers} clientes por {args.seconds:.0f}s + 1 cliente de perfil\n")
+
+        deadline = time.perf_counter() + args.seconds
+        lock = threading.Lock()
+        login_ms, rejected_ms, profile_ms = [], [], []
+
+        def attacker(n):
+            local_ok, local_busy = [], []
+            attempt = 0
+            while time.perf_counter() < deadline:
+                attempt += 1
+                start = time.perf_counter()
+                result = db.authenticate_user('ana@bench.local', f'chute-{n}-{attempt}')
+                elapsed = (time.perf_counter() - start) * 1000
+                (local_busy if 'retry_after' in result else local_ok).append(elapsed)
+                if 'retry_after' in result:
+                    # cliente que respeita o Retry-After só de leve
+                    time.sleep(0.01)
+            with lock:
+                login_ms.extend(local_ok)
+                rejected_ms.extend(local_busy)
+
+        def profile_client():
+            local = []
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                db.get_user_by_id(1)
+                local.append((time.perf_counter() - start) * 1000)
+                time.sleep(0.002)
+            with lock:
+                profile_ms.extend(local)
+
+        threads = [threading.Thread(target=attacker, args=(n,)) for n in range(args.attackers)]
+        threads.append(threading.Thread(target=profile_client))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print(f"{'':<22}{'média ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'total':>8}")
+        print(summary('login processado', login_ms))
+        print(summary('login recusado (503)', rejected_ms))
+        print(summary('perfil', profile_ms))
+
+        stats = db.hash_pool.stats()
+        print(f"\nfila máx {stats['max_queue_depth']}/{stats['queue_size']}, "
+              f"espera p99 {stats['wait_ms']['p99']} ms, hash p99 {stats['run_ms']['p99']} ms")
+        db.pool.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
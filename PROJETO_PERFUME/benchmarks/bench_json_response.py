@@ -0,0 +1,144 @@
+"""
+Custo de enviar uma resposta JSON pelo handler clássico: caminho antigo
+(dict de cabeçalhos + json.dumps + send_header um a um + corpo separado)
+contra o JSONResponseWriter (cabeçalhos prontos em bytes, corpos comuns
+pré-serializados, uma escrita só).
+
+Mede tempo, escritas no socket (cada uma é um send) e o pico de memória
+alocada durante cada resposta. O handler roda sobre um socket falso, sem rede.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_json_response [--responses 100000]
+"""
+
+import argparse
+import email.message
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+class CountingWriter:
+    """Substitui o wfile do handler contando as escritas"""
+
+    def __init__(self):
+        self.writes = 0
+        self.bytes = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def make_handlers():
+    from backend.server import BelleHTTPRequestHandler
+    from backend.utils import HTTPUtils, ResponseBuilder
+
+    class QuietHandler(BelleHTTPRequestHandler):
+        max_requests_per_connection = sys.maxsize
+
+        def log_message(self, format, *args):
+            pass
+
+    class LegacyHandler(QuietHandler):
+        """send_json anterior, com cabeçalhos montados a cada chamada"""
+
+        def send_json(self, data, status_code=200, extra_headers=()):
+            response = HTTPUtils.create_json_response(data, status_code)
+            body = response['body'].encode('utf-8')
+            body, compressed = HTTPUtils.compress_response_body(
+                body, self.headers.get('Accept-Encoding'), self.json_gzip_min_size
+            )
+            self.send_response(response['status_code'])
+            for header, value in response['headers'].items():
+                self.send_header(header, value)
+            for header, value in extra_headers:
+                self.send_header(header, value)
+            if compressed:
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def build(handler_class):
+        handler = handler_class.__new__(handler_class)
+        handler.wfile = CountingWriter()
+        handler.headers = email.message.Message()
+        handler.request_version = 'HTTP/1.1'
+        handler.requestline = 'GET /api/check-auth HTTP/1.1'
+        handler.command = 'GET'
+        handler.client_address = ('127.0.0.1', 0)
+        handler.close_connection = False
+        handler.requests_on_connection = 0
+        return handler
+
+    anonymous = ResponseBuilder.success(data={'authenticated': False})
+    return build(LegacyHandler), build(QuietHandler), anonymous
+
+
+def measure(send, handler, total):
+    for _ in range(1000):
+        send()
+    handler.wfile.writes = 0
+
+    start = time.perf_counter()
+    for _ in range(total):
+        send()
+    elapsed_us = (time.perf_counter() - start) / total * 1e6
+    writes = handler.wfile.writes / total
+
+    tracemalloc.start()
+    sample = min(total, 10000)
+    # pico de memória alocada durante uma resposta (média das amostras)
+    peak_total = 0
+    for _ in range(sample):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        send()
+        peak_total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return elapsed_us, writes, peak_total / sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--responses', type=int, default=100000)
+    args = parser.parse_args()
+
+    # importar o servidor abre users.db no diretório atual: usa um temporário
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from backend import responses
+        legacy, current, anonymous = make_handlers()
+        cookie = [('Set-Cookie', 'session_id=abc; Max-Age=3600; Path=/; HttpOnly')]
+        cases = [
+            ('check-auth anônimo', lambda h: h.send_json(anonymous), lambda h: h.send_json(responses.ANONYMOUS)),
+            ('não autenticado 401', lambda h: h.send_json({'success': False, 'message': 'Não autenticado'}, 401),
+             lambda h: h.send_json(responses.NOT_AUTHENTICATED, 401)),
+            ('login com cookie', lambda h: h.send_json({'success': True, 'data': {'id': 1, 'nome': 'Ana'}}, 200, cookie),
+             lambda h: h.send_json({'success': True, 'data': {'id': 1, 'nome': 'Ana'}}, 200, cookie)),
+        ]
+
+        print(f"📊 {args.responses} respostas por caso\n")
+        print(f"{'caso':<22}{'versão':<8}{'µs/resp':>10}{'escritas':>10}{'pico bytes':>16}")
+        for label, old_send, new_send in cases:
+            for version, handler, send in (('antigo', legacy, old_send), ('atual', current, new_send)):
+                us, writes, allocated = measure(lambda: send(handler), handler, args.responses)
+                print(f"{label:<22}{version:<8}{us:>10.2f}{writes:>10.1f}{allocated:>16.0f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
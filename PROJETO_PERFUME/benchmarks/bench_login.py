@@ -0,0 +1,125 @@
+"""
+Latência do login com muitos usuários: consulta antiga
+(`(email = ? OR cpf = ?) AND senha_hash = ?`) contra a busca pontual
+normalizada de Database.authenticate_user.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_login [--users 1000000] [--logins 20000]
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from backend.database import Database
+
+
+class LookupBenchDatabase(Database):
+    """SHA-256 simples, como a consulta antiga exige, para comparar só a busca"""
+    rehash_on_login = False
+
+    def hash_password(self, password):
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def verify_password(self, password, stored):
+        return hmac.compare_digest(self.hash_password(password), stored)
+
+
+def make_cpf(base):
+    """CPF válido (só dígitos) a partir de um número de até 9 dígitos"""
+    digits = [int(d) for d in f'{base:09d}']
+    for weight in (10, 11):
+        resto = sum(d * (weight - i) for i, d in enumerate(digits)) % 11
+        digits.append(0 if resto < 2 else 11 - resto)
+    return ''.join(map(str, digits))
+
+
+def format_cpf(cpf):
+    return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+
+
+def seed(db, users, batch=50000):
+    """Insere `users` usuários em lotes; devolve o tempo gasto"""
+    senha_hash = db.hash_password('senha123')
+    started = time.perf_counter()
+    with db.pool.connection() as conn:
+        for first in range(1, users + 1, batch):
+            conn.executemany('''
+                INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', ((f'Nome{i}', 'Teste', make_cpf(i), '11999999999', '1990-01-01',
+                   f'user{i}@bench.local', senha_hash)
+                  for i in range(first, min(first + batch, users + 1))))
+            conn.commit()
+    return time.perf_counter() - started
+
+
+def legacy_login(db, login, senha):
+    """Consulta usada antes da normalização"""
+    with db.pool.connection() as conn:
+        return conn.execute('''
+            SELECT id, nome, sobrenome, email, cpf FROM users
+            WHERE (email = ? OR cpf = ?) AND senha_hash = ?
+        ''', (login, login, db.hash_password(senha))).fetchone() is not None
+
+
+def measure(login, samples):
+    latencies = []
+    failures = 0
+    for login_value, senha in samples:
+        start = time.perf_counter()
+        if not login(login_value, senha):
+            failures += 1
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies, failures
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--logins', type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    try:
+        db = LookupBenchDatabase(os.path.join(workdir, 'users.db'))
+        print(f"🗄️  Populando {args.users} usuários...")
+        print(f"   {seed(db, args.users):.1f}s\n")
+
+        rng = random.Random(42)
+        ids = [rng.randint(1, args.users) for _ in range(args.logins)]
+        scenarios = {
+            'email': [(f'user{i}@bench.local', 'senha123') for i in ids],
+            'cpf': [(make_cpf(i), 'senha123') for i in ids],
+            'cpf formatado': [(format_cpf(make_cpf(i)), 'senha123') for i in ids],
+            'senha errada': [(f'user{i}@bench.local', 'errada') for i in ids],
+        }
+
+        print(f"{'cenário':<16}{'consulta':<12}{'média µs':>10}{'p50 µs':>10}{'p99 µs':>10}{'falhas':>8}")
+        for name, samples in scenarios.items():
+            for label, login in (
+                ('antiga', lambda login, senha: legacy_login(db, login, senha)),
+                ('normalizada', lambda login, senha: db.authenticate_user(login, senha)['success']),
+            ):
+                latencies, failures = measure(login, samples)
+                print(f"{name:<16}{label:<12}{statistics.mean(latencies):>10.1f}"
+                      f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}"
+                      f"{failures:>8}")
+        db.pool.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
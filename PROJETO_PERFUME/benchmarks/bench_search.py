@@ -0,0 +1,137 @@
+"""
+Latência da busca (/api/search) e do autocomplete (/api/suggest) num
+catálogo sintético de dezenas de milhares de produtos.
+
+O autocomplete é medido tecla a tecla, digitando consultas letra por
+letra: `bm25` ordena todos os candidatos por relevância a cada tecla
+(como uma busca comum), `frio` usa o ProductSearch sem cache (só
+candidatos limitados, sem ORDER BY) e `quente` com o LRU de prefixos,
+onde cada tecla filtra em memória o resultado da anterior.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_search [--products 30000] [--rounds 5]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from backend.catalog import ProductCatalog
+from backend.database import Database
+from backend.search import ProductSearch, search_terms
+
+BRANDS = ('Dior', 'Chanel', 'Lancôme', 'Guerlain', 'Givenchy', 'Yves Saint Laurent', 'Carolina Herrera',
+          'Paco Rabanne', 'Jean Paul Gaultier', 'Hermès', 'Prada', 'Versace', 'Armani', 'Boticário',
+          'Natura', 'O Boticário', 'Kenzo', 'Valentino', 'Burberry', 'Montblanc')
+WORDS = ('Absolu', 'Intense', 'Noir', 'Rose', 'Oud', 'Bloom', 'Elixir', 'Eau', 'Parfum', 'Nuit',
+         'Velvet', 'Amber', 'Santal', 'Jasmin', 'Vanille', 'Iris', 'Musc', 'Ambre', 'Cuir', 'Fleur',
+         'Légère', 'Sauvage', 'Gold', 'Blue', 'Black', 'Idôle', 'Joy', 'Good', 'Girl', 'Boy')
+NOTES = ('bergamota', 'rosa', 'jasmim', 'baunilha', 'âmbar', 'patchouli', 'sândalo', 'lavanda',
+         'cedro', 'almíscar', 'neroli', 'pimenta rosa', 'íris', 'couro', 'oud', 'tonka')
+# Consultas digitadas letra a letra no autocomplete
+TYPED = ('dior sauvage', 'chanel noir', 'lancome idole', 'carolina herrera good girl', 'boticario',
+         'yves saint laurent', 'rose', 'oud intense', 'paco rabanne', 'jean paul gaultier')
+SEARCHES = ('dior', 'baunilha', 'rose oud', 'lancome', 'perfume amadeirado', 'jasmim intense', 'sandalo')
+
+
+def seed(db, products):
+    """Acrescenta `products` produtos sintéticos ao catálogo, numa única transação"""
+    rng = random.Random(42)
+    rows = []
+    for i in range(products):
+        brand = rng.choice(BRANDS)
+        name = ' '.join(rng.sample(WORDS, rng.randint(1, 3)))
+        notes = ', '.join(rng.sample(NOTES, 3))
+        rows.append((f'bench-{i}', f'{brand} {name}', brand, f'Fragrância {name.lower()} de {brand}',
+                     notes, rng.randint(9900, 99900), 0, 'catalogo', '/img/perfume.png',
+                     '/compra.html', 1000 + i))
+    with db.pool.connection() as conn:
+        conn.executemany('''
+            INSERT INTO products (id, nome, marca, descricao, notas, preco_centavos, desconto,
+                                  categoria, imagem, pagina, posicao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def keystrokes(text):
+    """Prefixos digitados a partir do mínimo do autocomplete: 'di', 'dio', 'dior', ..."""
+    return [text[:end] for end in range(ProductSearch.min_prefix, len(text) + 1) if not text[:end].endswith(' ')]
+
+
+def bm25_suggest(search, prefix):
+    """Autocomplete ingênuo: ordena todos os candidatos por BM25 a cada tecla"""
+    terms = search_terms(prefix)
+    with search.db.pool.connection() as conn:
+        return conn.execute(f'''
+            SELECT p.id FROM products_fts
+            JOIN products p ON p.rowid = products_fts.rowid
+            WHERE products_fts MATCH ? AND p.ativo = 1
+            ORDER BY bm25(products_fts, {', '.join(map(str, search.weights))})
+            LIMIT ?
+        ''', (search.match_expression(terms, ('nome', 'marca')), search.suggest_limit)).fetchall()
+
+
+def measure(operation, inputs):
+    latencies = []
+    for value in inputs:
+        start = time.perf_counter()
+        operation(value)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    print(f"{label:<22}{len(latencies):>8}{statistics.mean(latencies):>10.3f}"
+          f"{percentile(latencies, 50):>10.3f}{percentile(latencies, 99):>10.3f}{max(latencies):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=30000)
+    parser.add_argument('--rounds', type=int, default=5, help="vezes que cada consulta é digitada")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    try:
+        db = Database(os.path.join(workdir, 'search.db'))
+        started = time.perf_counter()
+        seed(db, args.products)
+        catalog = ProductCatalog(db)
+        snapshot = catalog.rebuild()
+        print(f"\n📊 {len(snapshot.products)} produtos (seed + índice em {time.perf_counter() - started:.1f}s)\n")
+
+        typed = [prefix for text in TYPED for prefix in keystrokes(text)]
+        print(f"{'modo':<22}{'chamadas':>8}{'média ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+
+        search = ProductSearch(db, catalog)
+        report('suggest bm25', measure(lambda prefix: bm25_suggest(search, prefix), typed * args.rounds))
+
+        cold = ProductSearch(db, catalog, cache_size=0)
+        report('suggest frio', measure(cold.suggest, typed * args.rounds))
+
+        warm = ProductSearch(db, catalog)
+        first = measure(warm.suggest, typed)
+        report('suggest 1ª digitação', first)
+        report('suggest quente', measure(warm.suggest, typed * args.rounds))
+
+        uncached = ProductSearch(db, catalog, cache_size=0)
+        report('search (bm25)', measure(lambda query: uncached.search(query, 20), list(SEARCHES) * args.rounds))
+        report('search em cache', measure(lambda query: search.search(query, 20), list(SEARCHES) * args.rounds))
+        print(f"\n🔁 prefixos filtrados em memória: {warm.narrowed} | cache: {warm.prefix_cache.stats()}")
+        db.pool.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
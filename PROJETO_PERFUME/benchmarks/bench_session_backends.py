@@ -0,0 +1,71 @@
+"""
+Latência de get_session por armazenamento: memória, SQLite com o cache
+local quente e SQLite sem cache (toda leitura vai ao banco). Mostra também
+quantas gravações de atividade foram agrupadas em lote.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_session_backends [--sessions 20000] [--reads 200000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from backend.session import SessionManager, SQLiteSessionManager
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def measure(manager, ids, reads):
+    rng = random.Random(7)
+    latencies = []
+    for _ in range(reads):
+        session_id = rng.choice(ids)
+        start = time.perf_counter()
+        manager.get_session(session_id)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--reads', type=int, default=200000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='belle-bench-')
+    try:
+        user = {'id': 1, 'nome': 'Ana', 'sobrenome': 'Silva', 'email': 'ana@bench.local', 'cpf': '52998224725'}
+        managers = {
+            'memória': SessionManager(touch_interval=0),
+            'sqlite (cache)': SQLiteSessionManager(os.path.join(workdir, 'a.db'), touch_interval=0,
+                                                   cache_size=args.sessions, cache_ttl=3600),
+            'sqlite (sem cache)': SQLiteSessionManager(os.path.join(workdir, 'b.db'), touch_interval=0,
+                                                       cache_ttl=0),
+        }
+
+        print(f"📊 {args.sessions} sessões, {args.reads} leituras; atividade renovada a cada leitura\n")
+        print(f"{'armazenamento':<20}{'média µs':>10}{'p50 µs':>10}{'p99 µs':>10}{'gravações':>12}{'lotes':>8}")
+        for label, manager in managers.items():
+            ids = [manager.create_session(i, dict(user, id=i)) for i in range(args.sessions)]
+            latencies = measure(manager, ids, args.reads)
+            writes, batches = '-', '-'
+            if isinstance(manager, SQLiteSessionManager):
+                manager.flush()
+                stats = manager.stats()
+                writes, batches = stats['batched_writes'], stats['flushes']
+            print(f"{label:<20}{statistics.mean(latencies):>10.2f}{percentile(latencies, 50):>10.2f}"
+                  f"{percentile(latencies, 99):>10.2f}{writes:>12}{batches:>8}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Memória por sessão e custo da limpeza com muitas sessões: SessionManager
+antigo (dict por sessão + varredura completa) contra o atual (__slots__ +
+heap de expiração).
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.bench_sessions [--sessions 1000000] [--expired 0.01] [--memory-sample 100000]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+from unittest import mock
+
+from backend.session import SessionManager
+
+
+class LegacySessionManager:
+    """Implementação anterior: dict de 5 chaves por sessão, limpeza O(todas)"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.session_timeout = 3600
+
+    def create_session(self, user_id, user_data):
+        session_id = str(uuid.uuid4())
+        self.sessions[session_id] = {
+            'user_id': user_id,
+            'user_data': user_data,
+            'created_at': time.time(),
+            'expires_at': time.time() + self.session_timeout,
+            'last_activity': time.time()
+        }
+        return session_id
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None or time.time() > session['expires_at']:
+            return None
+        session['last_activity'] = time.time()
+        return session
+
+    def cleanup_expired_sessions(self):
+        current_time = time.time()
+        expired_sessions = [
+            session_id for session_id, session in self.sessions.items()
+            if current_time > session['expires_at']
+        ]
+        for session_id in expired_sessions:
+            del self.sessions[session_id]
+        return len(expired_sessions)
+
+
+def user_data(i):
+    """Mesmo formato que o login grava na sessão (dict novo por login)"""
+    return {'id': i, 'nome': f'Nome{i}', 'sobrenome': 'Teste',
+            'email': f'user{i}@bench.local', 'cpf': f'{i:011d}'}
+
+
+def populate(manager, total, expired):
+    """Cria `expired` sessões já vencidas (relógio recuado) e o resto válidas"""
+    ids = []
+    past = time.time() - 2 * 3600
+    with mock.patch('time.time', return_value=past):
+        for i in range(expired):
+            ids.append(manager.create_session(i, user_data(i)))
+    for i in range(expired, total):
+        ids.append(manager.create_session(i, user_data(i)))
+    return ids
+
+
+def bytes_per_session(factory, total):
+    """Memória alocada por sessão (tracemalloc), sem a lista de ids do benchmark"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    manager = factory()
+    ids = populate(manager, total, 0)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before - len(ids) * 8 - sum(len(i) + 49 for i in ids)) / total
+
+
+def run(label, factory, total, expired, memory_sample):
+    per_session = bytes_per_session(factory, min(total, memory_sample))
+
+    gc.collect()
+    manager = factory()
+    ids = populate(manager, total, expired)
+
+    sample = ids[expired::max(1, (total - expired) // 100000)]
+    start = time.perf_counter()
+    for session_id in sample:
+        manager.get_session(session_id)
+    get_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    start = time.perf_counter()
+    removed = manager.cleanup_expired_sessions()
+    cleanup_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    manager.cleanup_expired_sessions()
+    idle_cleanup_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{label:<10}{per_session:>12.0f}{get_us:>12.2f}{cleanup_ms:>14.1f}"
+          f"{idle_cleanup_ms:>16.2f}{removed:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=1_000_000)
+    parser.add_argument('--expired', type=float, default=0.01, help='fração de sessões vencidas')
+    parser.add_argument('--memory-sample', type=int, default=100000,
+                        help='sessões usadas na medição de memória (tracemalloc é lento)')
+    args = parser.parse_args()
+
+    expired = int(args.sessions * args.expired)
+    print(f"📊 {args.sessions} sessões, {expired} vencidas\n")
+    print(f"{'store':<10}{'bytes/sess':>12}{'get µs':>12}{'limpeza ms':>14}{'limpeza ociosa':>16}{'removidas':>10}")
+    run('antigo', LegacySessionManager, args.sessions, expired, args.memory_sample)
+    run('atual', SessionManager, args.sessions, expired, args.memory_sample)
+
+
+if __name__ == '__main__':
+    main()
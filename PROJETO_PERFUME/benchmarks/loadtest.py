@@ -0,0 +1,452 @@
+"""
+Teste de carga reproduzível: sobe o servidor (run.py) numa cópia do site com
+um users.db semeado e roda misturas de tráfego com concorrência configurável.
+
+Cenários:
+    register    cadastros novos em rajada
+    login       logins dos usuários semeados em rajada
+    check-auth  polling de /api/check-auth com sessão válida
+    profile     /api/profile com sessão válida
+    static      carrega a página inicial e todos os assets que ela referencia
+
+Para cada cenário: requisições, vazão, latência p50/p99, taxa de erro
+(status >= 400 ou falha de conexão) e memória RSS do servidor (pico). O
+resultado vai para um JSON; --compare mostra a diferença para outra rodada.
+O limite de tentativas fica desligado (RATE_LIMITS=off), já que toda a carga
+sai do mesmo IP; --env RATE_LIMITS=... mede o servidor com ele ligado.
+
+Uso (no diretório PROJETO_PERFUME):
+    python -m benchmarks.loadtest [--scenarios login,check-auth,profile,static,register]
+        [--concurrency 8] [--duration 10] [--users 2000]
+        [--env WORKERS=8 --env SERVER_ENGINE=async] [--url http://host:porta]
+        [--output arquivo.json] [--compare rodada_anterior.json]
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from backend.database import Database
+
+SCENARIOS = ('register', 'login', 'check-auth', 'profile', 'static')
+SITE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'carga123'
+# CPFs semeados começam aqui; os do cenário register, bem acima
+SEED_BASE = 100_000_000
+
+
+def make_cpf(number):
+    """CPF válido (com dígitos verificadores) a partir de um número de 9 dígitos"""
+    digits = [int(d) for d in f"{number % 10 ** 9:09d}"]
+    for length in (9, 10):
+        total = sum(d * (length + 1 - i) for i, d in enumerate(digits[:length]))
+        digits.append(total * 10 % 11 % 10)
+    return ''.join(map(str, digits))
+
+
+def user_payload(number, prefix):
+    """Cadastro válido para o AuthValidator; `number` define CPF e email"""
+    return {
+        'nome': 'Carga', 'sobrenome': 'Teste', 'cpf': make_cpf(number),
+        'telefone': '11999999999', 'data_nascimento': '1990-01-01',
+        'email': f'{prefix}{number}@carga.local', 'senha': PASSWORD, 'confirmar_senha': PASSWORD
+    }
+
+
+def seed_login(index):
+    return {'login': f'seed{SEED_BASE + index}@carga.local', 'senha': PASSWORD}
+
+
+def prepare_site(workdir, users):
+    """Copia o site para workdir e semeia users.db (um hash reaproveitado por todos)"""
+    site = os.path.join(workdir, 'site')
+    shutil.copytree(SITE_ROOT, site, ignore=shutil.ignore_patterns(
+        '*.db', '*.db-wal', '*.db-shm', '__pycache__', 'benchmarks', 'profiles', 'logs'))
+
+    db = Database(os.path.join(site, 'users.db'))
+    senha_hash = db.hasher.hash(PASSWORD)
+    rows = []
+    for i in range(users):
+        user = user_payload(SEED_BASE + i, 'seed')
+        rows.append((user['nome'], user['sobrenome'], user['cpf'], user['telefone'],
+                     user['data_nascimento'], user['email'], senha_hash))
+    with db.pool.connection() as conn:
+        conn.executemany('''
+            INSERT INTO users (nome, sobrenome, cpf, telefone, data_nascimento, email, senha_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    db.pool.close_all()
+    return site
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(site, port, env_overrides):
+    # todo o tráfego sai de um IP: sem RATE_LIMITS=off os cenários login/register virariam 429
+    env = dict(os.environ, PORT=str(port), ACCESS_LOG='off', RATE_LIMITS='off', PYTHONUNBUFFERED='1')
+    env.update(env_overrides)
+    log = open(os.path.join(site, 'server.log'), 'wb')
+    process = subprocess.Popen([sys.executable, 'run.py'], cwd=site, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"servidor terminou ao iniciar (veja {log.name})")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("servidor não abriu a porta em 30s")
+
+
+def rss_bytes(pid):
+    """RSS do processo e dos filhos (workers do modo PROCESSES); None fora do Linux"""
+    if not os.path.isdir('/proc'):
+        return None
+    pids = {pid}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.add(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    total = 0
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class AssetParser(HTMLParser):
+    """Assets locais de uma página: CSS, scripts e imagens"""
+
+    def __init__(self):
+        super().__init__()
+        self.assets = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        url = None
+        if tag == 'link' and 'stylesheet' in (attrs.get('rel') or ''):
+            url = attrs.get('href')
+        elif tag in ('script', 'img', 'source'):
+            url = attrs.get('src')
+        if url and not url.startswith(('http:', 'https:', '//', 'data:', '#')):
+            path = '/' + url.lstrip('./')
+            if path not in self.assets:
+                self.assets.append(path)
+
+
+class Client:
+    """Conexão keep-alive de uma thread do gerador de carga"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookie = None
+        self.conn = None
+
+    def request(self, method, path, payload=None):
+        """(status, corpo); reabre a conexão se o servidor a fechou"""
+        headers = {}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                cookie = response.getheader('Set-Cookie')
+                if cookie:
+                    self.cookie = cookie.split(';', 1)[0]
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class Scenario:
+    """Roda `concurrency` threads por `duration` segundos, cada uma repetindo `step`.
+
+    Cada thread tem sua conexão keep-alive; o login dos cenários
+    autenticados acontece antes do relógio começar a contar.
+    """
+
+    def __init__(self, name, host, port, concurrency, duration, users):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.concurrency = concurrency
+        self.duration = duration
+        self.users = users
+        self.assets = []
+        self.latencies = []
+        self.statuses = {}
+        self.failures = 0
+        self.page_loads = 0
+        self.started = self.stop_at = 0.0
+        self._lock = threading.Lock()
+        # números altos e aleatórios: rodadas repetidas contra --url não colidem
+        self._next_register = itertools.count(random.randrange(200_000_000, 900_000_000))
+
+    def setup(self, client, worker):
+        if self.name in ('check-auth', 'profile'):
+            status, _ = client.request('POST', '/api/login', seed_login(worker % self.users))
+            if status != 200:
+                raise RuntimeError(f"login de preparação falhou ({status})")
+        elif self.name == 'static' and not self.assets:
+            _, body = client.request('GET', '/')
+            parser = AssetParser()
+            parser.feed(body.decode('utf-8', 'replace'))
+            with self._lock:
+                self.assets = parser.assets
+
+    def step(self, client, rng):
+        """Uma iteração do cenário; devolve [(status, segundos), ...]"""
+        if self.name == 'register':
+            return [timed(client, 'POST', '/api/register', user_payload(next(self._next_register), 'novo'))]
+        if self.name == 'login':
+            return [timed(client, 'POST', '/api/login', seed_login(rng.randrange(self.users)))]
+        if self.name == 'check-auth':
+            return [timed(client, 'GET', '/api/check-auth')]
+        if self.name == 'profile':
+            return [timed(client, 'GET', '/api/profile')]
+        results = [timed(client, 'GET', '/')]
+        results.extend(timed(client, 'GET', asset) for asset in self.assets)
+        return results
+
+    def _start_clock(self):
+        # roda uma vez, quando todas as threads terminaram o setup
+        self.started = time.perf_counter()
+        self.stop_at = self.started + self.duration
+
+    def worker(self, index, barrier):
+        client = Client(self.host, self.port)
+        rng = random.Random(index)
+        latencies, statuses, failures, pages = [], {}, 0, 0
+        try:
+            self.setup(client, index)
+        except Exception:
+            barrier.abort()
+            raise
+        barrier.wait()
+
+        while time.perf_counter() < self.stop_at:
+            try:
+                results = self.step(client, rng)
+            except (http.client.HTTPException, OSError):
+                failures += 1
+                continue
+            for status, seconds in results:
+                latencies.append(seconds)
+                statuses[status] = statuses.get(status, 0) + 1
+            pages += 1
+        client.close()
+
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.failures += failures
+            self.page_loads += pages
+            for status, count in statuses.items():
+                self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def run(self, server_pid=None):
+        barrier = threading.Barrier(self.concurrency, action=self._start_clock)
+        threads = [threading.Thread(target=self.worker, args=(i, barrier), daemon=True)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+
+        peak_rss = None
+        while any(thread.is_alive() for thread in threads):
+            rss = rss_bytes(server_pid) if server_pid else None
+            if rss is not None:
+                peak_rss = max(peak_rss or 0, rss)
+            time.sleep(0.1)
+        if barrier.broken:
+            raise RuntimeError(f"cenário {self.name}: preparação falhou")
+        return self.summary(time.perf_counter() - self.started, peak_rss)
+
+    def summary(self, elapsed, peak_rss):
+        ordered = sorted(self.latencies)
+        total = len(ordered) + self.failures
+        errors = self.failures + sum(count for status, count in self.statuses.items() if status >= 400)
+        result = {
+            'concurrency': self.concurrency,
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 1),
+            'p50_ms': percentile_ms(ordered, 0.50),
+            'p99_ms': percentile_ms(ordered, 0.99),
+            'max_ms': percentile_ms(ordered, 1.0),
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'connection_failures': self.failures,
+            'peak_rss_mb': round(peak_rss / 2 ** 20, 1) if peak_rss else None,
+        }
+        if self.name == 'static':
+            result['requests_per_page'] = len(self.assets) + 1
+            result['page_loads'] = self.page_loads
+        return result
+
+
+def timed(client, method, path, payload=None):
+    start = time.perf_counter()
+    status, _ = client.request(method, path, payload)
+    return status, time.perf_counter() - start
+
+
+def percentile_ms(ordered, p):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SITE_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(previous_path, results):
+    """Imprime a variação de vazão, p50 e p99 em relação a uma rodada anterior"""
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)['scenarios']
+    print(f"\nComparação com {previous_path}:")
+    for name, current in results.items():
+        old = previous.get(name)
+        if not old:
+            print(f"  {name:<11} (sem dados na rodada anterior)")
+            continue
+        deltas = []
+        for key in ('throughput_rps', 'p50_ms', 'p99_ms'):
+            if old.get(key) and current.get(key) is not None:
+                deltas.append(f"{key} {old[key]} -> {current[key]} ({(current[key] / old[key] - 1) * 100:+.1f}%)")
+        print(f"  {name:<11} " + '  '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="lista separada por vírgulas (padrão: todos)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help="segundos por cenário")
+    parser.add_argument('--users', type=int, default=2000, help="usuários semeados no banco")
+    parser.add_argument('--env', action='append', default=[], metavar='CHAVE=VALOR',
+                        help="variável de ambiente para o servidor (repetível)")
+    parser.add_argument('--url', help="usa um servidor já rodando (já semeado com --users)")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: benchmarks/results/)")
+    parser.add_argument('--compare', help="JSON de uma rodada anterior")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+    env = dict(item.split('=', 1) for item in args.env)
+
+    workdir = tempfile.mkdtemp(prefix='belle-loadtest-')
+    process = None
+    try:
+        if args.url:
+            target = urlsplit(args.url)
+            host, port = target.hostname, target.port or 80
+        else:
+            print(f"Semeando {args.users} usuários em {workdir}...")
+            site = prepare_site(workdir, args.users)
+            host, port = '127.0.0.1', free_port()
+            process = start_server(site, port, env)
+        server_pid = process.pid if process else None
+
+        results = {}
+        print(f"{'cenário':<11} {'req':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'erros':>7} {'RSS MB':>7}")
+        for name in scenarios:
+            scenario = Scenario(name, host, port, args.concurrency, args.duration, args.users)
+            result = results[name] = scenario.run(server_pid)
+            rss = result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-'
+            print(f"{name:<11} {result['requests']:>8} {result['throughput_rps']:>9} "
+                  f"{result['p50_ms']!s:>9} {result['p99_ms']!s:>9} "
+                  f"{result['error_rate'] * 100:>6.2f}% {rss!s:>7}")
+        end_rss = rss_bytes(server_pid) if server_pid else None
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    revision = git_revision()
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_revision': revision,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'users': args.users,
+            'server_env': env,
+            'url': args.url,
+            'server_rss_end_mb': round(end_rss / 2 ** 20, 1) if end_rss else None,
+        },
+        'scenarios': results,
+    }
+    output = args.output or os.path.join(
+        SITE_ROOT, 'benchmarks', 'results', f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}-{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado salvo em {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
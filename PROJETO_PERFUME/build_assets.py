@@ -0,0 +1,29 @@
+"""
+Build de assets do Belle Parfum
+Versiona os arquivos de Styles/, static/ e CSS/JS da raiz pelo hash do
+conteúdo e gera em dist/ as páginas HTML apontando para as URLs versionadas.
+
+Uso: python build_assets.py
+"""
+
+import os
+import sys
+from backend.assets import AssetFingerprinter, DIST_DIR, MANIFEST_NAME
+
+def main():
+    """Função principal"""
+    if not os.path.exists('index.html'):
+        print("❌ Erro: Execute este script no diretório PROJETO_PERFUME")
+        sys.exit(1)
+    
+    print("🔖 Gerando assets versionados...")
+    fingerprinter = AssetFingerprinter('.')
+    assets, pages = fingerprinter.build()
+    
+    print(f"✅ {assets} assets com hash de conteúdo")
+    print(f"✅ {pages} páginas reescritas em {DIST_DIR}/")
+    print(f"📄 Manifesto: {DIST_DIR}/{MANIFEST_NAME}")
+    print("💡 Reinicie o servidor (python run.py) para servir os assets versionados")
+
+if __name__ == "__main__":
+    main()
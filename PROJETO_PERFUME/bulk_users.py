@@ -0,0 +1,92 @@
+"""
+Importação e exportação em massa de usuários do Belle Parfum
+CSV (com cabeçalho) ou JSON lines, em lotes transacionais com retomada.
+
+Uso (no diretório PROJETO_PERFUME):
+    python bulk_users.py import clientes.csv [--batch-size 1000] [--errors erros.csv] [--restart]
+    python bulk_users.py export usuarios.jsonl [--include-hash]
+
+Colunas: nome, sobrenome, cpf, telefone, data_nascimento, email e senha
+(texto) ou senha_hash (vindo de uma exportação com --include-hash).
+Uma importação interrompida continua do último lote gravado ao rodar o
+mesmo comando de novo; --restart recomeça do início.
+
+Relatórios e exportações têm CPF, email e hashes: um nome sem diretório
+vai para exports/ (que o servidor não publica), e nenhum caminho dentro
+do site fora de exports/ é aceito.
+"""
+
+import argparse
+import os
+import sys
+from backend.database import Database
+from backend.hashing import PasswordHasher
+from backend.bulk import UserImporter, UserExporter
+
+def build_hasher():
+    """Mesmo algoritmo e custo configurados para o servidor (run.py)"""
+    return PasswordHasher(
+        algorithm=os.environ.get('PASSWORD_HASH', 'scrypt'),
+        scrypt_n=int(os.environ.get('SCRYPT_N', 2 ** 14)),
+        scrypt_r=int(os.environ.get('SCRYPT_R', 8)),
+        scrypt_p=int(os.environ.get('SCRYPT_P', 1)),
+        pbkdf2_iterations=int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+    )
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='users.db', help="banco SQLite (padrão: users.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importing = commands.add_parser('import', help="importa usuários de um arquivo")
+    importing.add_argument('file')
+    importing.add_argument('--format', choices=('csv', 'jsonl'), help="padrão: pela extensão")
+    importing.add_argument('--batch-size', type=int, default=1000)
+    importing.add_argument('--hash-workers', type=int, default=int(os.environ.get('HASH_WORKERS', 0)) or None,
+                           help="threads de hashing de senhas (padrão: núcleos)")
+    importing.add_argument('--errors', help="relatório de recusados (padrão: exports/<arquivo>.erros.csv)")
+    importing.add_argument('--restart', action='store_true', help="ignora o checkpoint e recomeça")
+
+    exporting = commands.add_parser('export', help="exporta usuários para um arquivo ('-' = stdout)")
+    exporting.add_argument('file')
+    exporting.add_argument('--format', choices=('csv', 'jsonl'), help="padrão: pela extensão")
+    exporting.add_argument('--batch-size', type=int, default=5000)
+    exporting.add_argument('--include-hash', action='store_true', help="inclui senha_hash (para reimportar)")
+    args = parser.parse_args()
+
+    try:
+        hasher = build_hasher()
+    except ValueError as e:
+        print(f"❌ Configuração de hashing inválida: {e}")
+        sys.exit(1)
+    db = Database(args.db, hasher=hasher)
+
+    if args.command == 'import':
+        if not os.path.exists(args.file):
+            print(f"❌ Arquivo não encontrado: {args.file}")
+            sys.exit(1)
+        print(f"📥 Importando {args.file} em lotes de {args.batch_size} ({hasher.describe()})...")
+        importer = UserImporter(db, batch_size=args.batch_size, hash_workers=args.hash_workers)
+        try:
+            result = importer.run(args.file, fmt=args.format, report_path=args.errors, restart=args.restart)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ {result['imported']} importados, {result['rejected']} recusados "
+              f"em {result['seconds']}s")
+        if result['rejected']:
+            print(f"📄 Recusados: {result['report']}")
+    else:
+        exporter = UserExporter(db, batch_size=args.batch_size, include_hash=args.include_hash)
+        try:
+            result = exporter.run(args.file, fmt=args.format)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        # com stdout ocupado pelos dados, o resumo vai para stderr
+        print(f"✅ {result['exported']} usuários exportados para {result['path']}",
+              file=sys.stderr if args.file == '-' else sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -22,19 +22,312 @@ def setup_database():
         print(f"❌ Erro ao inicializar banco de dados: {e}")
         return False
 
+def setup_password_hashing():
+    """Configura algoritmo, custo e pool do hashing de senhas"""
+    from backend.server import BelleHTTPRequestHandler
+    from backend.hashing import PasswordHasher, HashingPool
+    
+    try:
+        hasher = PasswordHasher(
+            algorithm=os.environ.get('PASSWORD_HASH', 'scrypt'),
+            scrypt_n=int(os.environ.get('SCRYPT_N', 2 ** 14)),
+            scrypt_r=int(os.environ.get('SCRYPT_R', 8)),
+            scrypt_p=int(os.environ.get('SCRYPT_P', 1)),
+            pbkdf2_iterations=int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+        )
+    except ValueError as e:
+        print(f"❌ Configuração de hashing inválida: {e}")
+        return False
+    
+    hash_pool = HashingPool(
+        workers=int(os.environ.get('HASH_WORKERS', os.cpu_count() or 1)),
+        queue_size=int(os.environ.get('HASH_QUEUE_SIZE', 0)) or None,
+        wait_timeout=float(os.environ.get('HASH_TIMEOUT', 10))
+    )
+    db = BelleHTTPRequestHandler.db
+    db.hasher = hasher
+    db.hash_pool = hash_pool
+    print(f"🔐 Senhas: {hasher.describe()}, {hash_pool.workers} threads, fila {hash_pool.queue_size}")
+    return True
+
+def setup_profile_cache():
+    """Tamanho e validade do cache de perfis (0 desliga)"""
+    from backend.server import BelleHTTPRequestHandler
+    
+    cache = BelleHTTPRequestHandler.db.profile_cache
+    cache.max_entries = int(os.environ.get('PROFILE_CACHE_SIZE', cache.max_entries))
+    cache.ttl = float(os.environ.get('PROFILE_CACHE_TTL', cache.ttl))
+
+def setup_static_cache():
+    """Indexa os arquivos do site e carrega os pequenos em memória"""
+    from backend.server import BelleHTTPRequestHandler
+    
+    from backend.assets import DIST_DIR
+    
+    cache = BelleHTTPRequestHandler.static_cache
+    total = cache.build_index()
+    stats = cache.stats()
+    print(f"📦 {total} arquivos estáticos indexados, "
+          f"{stats['files_cached']} em cache ({stats['bytes_cached'] // 1024} KB)")
+    
+    dist_dir = os.path.join(cache.root, DIST_DIR)
+    if os.path.isdir(dist_dir):
+        fingerprinted = cache.load_manifest(dist_dir)
+        print(f"🔖 {fingerprinted} assets versionados (cache imutável), "
+              f"{len(cache.page_overrides)} páginas do build")
+
+def setup_catalog():
+    """Monta o snapshot do catálogo e define a frequência de conferência de mudanças"""
+    from backend.server import BelleHTTPRequestHandler
+    
+    catalog = BelleHTTPRequestHandler.catalog
+    search = BelleHTTPRequestHandler.search
+    try:
+        catalog.refresh_interval = float(os.environ.get('CATALOG_REFRESH_SECONDS', catalog.refresh_interval))
+        search.prefix_cache.max_entries = int(os.environ.get('SEARCH_CACHE_SIZE', search.prefix_cache.max_entries))
+        snapshot = catalog.rebuild()
+    except ValueError:
+        print("❌ CATALOG_REFRESH_SECONDS e SEARCH_CACHE_SIZE devem ser números")
+        return False
+    except Exception as e:
+        print(f"❌ Erro ao carregar o catálogo: {e}")
+        return False
+    print(f"🛍️  Catálogo: {len(snapshot.products)} produtos em memória "
+          f"(mudanças conferidas a cada {catalog.refresh_interval:g}s)")
+    print(f"🔎 Busca: índice FTS5, autocomplete com {search.prefix_cache.max_entries} prefixos em cache")
+    return True
+
+def setup_checkout():
+    """Prazo das reservas de estoque e tamanho dos lotes/fila da thread de pedidos"""
+    from backend.server import BelleHTTPRequestHandler
+    
+    checkout = BelleHTTPRequestHandler.checkout
+    try:
+        checkout.reservation_ttl = float(os.environ.get('RESERVATION_SECONDS', checkout.reservation_ttl))
+        checkout.batch_size = int(os.environ.get('CHECKOUT_BATCH_SIZE', checkout.batch_size))
+        checkout.queue_size = int(os.environ.get('CHECKOUT_QUEUE_SIZE', checkout.queue_size))
+    except ValueError:
+        print("❌ RESERVATION_SECONDS, CHECKOUT_BATCH_SIZE e CHECKOUT_QUEUE_SIZE devem ser números")
+        return False
+    if checkout.reservation_ttl <= 0 or checkout.batch_size < 1 or checkout.queue_size < 1:
+        print("❌ RESERVATION_SECONDS, CHECKOUT_BATCH_SIZE e CHECKOUT_QUEUE_SIZE devem ser positivos")
+        return False
+    print(f"🧾 Pedidos: reservas de {checkout.reservation_ttl:g}s, lotes de até {checkout.batch_size} "
+          f"(fila de {checkout.queue_size})")
+    return True
+
+def setup_request_limits():
+    """Limites do corpo dos POSTs: padrão, por rota e prazo de leitura"""
+    from backend.server import BelleHTTPRequestHandler
+    from backend.request_body import BodyPolicy
+    
+    try:
+        limits = {}
+        # BODY_LIMITS="/api/register=4096,/api/login=1024"
+        for item in os.environ.get('BODY_LIMITS', '').split(','):
+            if item.strip():
+                route, _, size = item.partition('=')
+                limits[route.strip()] = int(size)
+        policy = BodyPolicy(
+            limits=limits,
+            default_limit=int(os.environ.get('BODY_MAX_BYTES', 16 * 1024)),
+            timeout=float(os.environ.get('BODY_TIMEOUT', 10))
+        )
+    except ValueError:
+        print("❌ BODY_LIMITS/BODY_MAX_BYTES/BODY_TIMEOUT inválidos (ex.: BODY_LIMITS=/api/login=1024)")
+        return False
+    
+    BelleHTTPRequestHandler.body_policy = policy
+    print(f"📥 Corpo dos POSTs: até {policy.default_limit} bytes "
+          f"({len(policy.limits)} rotas com limite próprio), {policy.timeout:g}s para chegar")
+    return True
+
+def setup_rate_limits():
+    """Token buckets de login/cadastro: tentativas por rota, por IP e por email/CPF"""
+    from backend.server import BelleHTTPRequestHandler
+    from backend.rate_limit import RateLimiter
+    
+    spec = os.environ.get('RATE_LIMITS', '')
+    if spec.strip().lower() == 'off':
+        BelleHTTPRequestHandler.rate_limiter = None
+        print("🚦 Limite de tentativas: desligado")
+        return True
+    try:
+        rules = {}
+        # RATE_LIMITS="/api/login:ip=30/60,/api/login:login=10/300" (tentativas/segundos; 0 desliga o escopo)
+        for item in spec.split(','):
+            if item.strip():
+                target, _, limit = item.partition('=')
+                route, _, scope = target.strip().rpartition(':')
+                capacity, _, period = limit.partition('/')
+                if not route or scope not in ('ip', 'login') or int(capacity) < 0 or float(period) <= 0:
+                    raise ValueError(item)
+                rules.setdefault(route, {})[scope] = (int(capacity), float(period))
+        limiter = RateLimiter(rules, max_buckets=int(os.environ.get('RATE_LIMIT_BUCKETS', 100000)))
+    except ValueError:
+        print("❌ RATE_LIMITS/RATE_LIMIT_BUCKETS inválidos (ex.: RATE_LIMITS=/api/login:ip=30/60,/api/login:login=10/300)")
+        return False
+    
+    BelleHTTPRequestHandler.rate_limiter = limiter
+    summary = '; '.join(
+        f"{route} " + ', '.join(f"{scope} {capacity}/{period:g}s" for scope, (capacity, period) in scopes.items())
+        for route, scopes in limiter.rules.items()
+    )
+    print(f"🚦 Limite de tentativas: {summary} (até {limiter.max_buckets} baldes)")
+    return True
+
+def setup_access_log():
+    """Log de acesso em JSON lines: stdout (padrão), arquivo com rotação ou desligado"""
+    from backend.server import BelleHTTPRequestHandler
+    from backend.access_log import AccessLog
+    
+    path = os.environ.get('ACCESS_LOG', '-')
+    if path.lower() == 'off':
+        BelleHTTPRequestHandler.access_log = None
+        print("📝 Log de acesso desligado")
+        return True
+    
+    try:
+        access_log = AccessLog(
+            path=path,
+            max_bytes=int(float(os.environ.get('ACCESS_LOG_MAX_MB', 50)) * 1024 * 1024),
+            rotate_interval=float(os.environ.get('ACCESS_LOG_ROTATE_SECONDS', 0)),
+            backups=int(os.environ.get('ACCESS_LOG_BACKUPS', 5)),
+            queue_size=int(os.environ.get('ACCESS_LOG_QUEUE', 10000))
+        )
+    except ValueError:
+        print("❌ ACCESS_LOG_MAX_MB/ROTATE_SECONDS/BACKUPS/QUEUE devem ser números")
+        return False
+    
+    BelleHTTPRequestHandler.access_log = access_log
+    print(f"📝 Log de acesso: {'stdout' if path == '-' else path} (JSON lines, em lote)")
+    return True
+
+def setup_slow_profiler(engine):
+    """SLOW_PROFILE_DIR liga os perfis cProfile das requisições lentas (devolve False se inválido)"""
+    from backend.server import BelleHTTPRequestHandler
+    from backend.profiler import SlowRequestProfiler
+    
+    directory = os.environ.get('SLOW_PROFILE_DIR')
+    if not directory:
+        return True
+    if engine != 'classic':
+        # no asyncio as requisições dividem a mesma thread: o perfil misturaria todas
+        print("⚠️  SLOW_PROFILE_DIR só vale para SERVER_ENGINE=classic; perfis desligados")
+        return True
+    
+    try:
+        threshold_ms = float(os.environ.get('SLOW_PROFILE_THRESHOLD_MS', 500))
+        sample_rate = float(os.environ.get('SLOW_PROFILE_SAMPLE_RATE', 0.05))
+        max_mb = float(os.environ.get('SLOW_PROFILE_MAX_MB', 50))
+    except ValueError:
+        print("❌ SLOW_PROFILE_THRESHOLD_MS/SAMPLE_RATE/MAX_MB devem ser números")
+        return False
+    if not 0 < sample_rate <= 1:
+        print("❌ SLOW_PROFILE_SAMPLE_RATE deve estar entre 0 e 1")
+        return False
+    
+    profiler = SlowRequestProfiler(directory, threshold_ms, sample_rate, int(max_mb * 1024 * 1024))
+    BelleHTTPRequestHandler.profiler = profiler
+    print(f"🩺 Perfis de requisições lentas: {sample_rate:.0%} amostradas, acima de {threshold_ms:g} ms "
+          f"-> {directory} (até {max_mb:g} MB)")
+    return True
+
 def cleanup_sessions():
     """Limpa sessões expiradas periodicamente"""
     from backend.server import BelleHTTPRequestHandler
     
     while True:
         try:
-            time.sleep(300)  # 5 minutos
+            time.sleep(60)  # 1 minuto (a limpeza só percorre as sessões vencidas)
             expired = BelleHTTPRequestHandler.session_manager.cleanup_expired_sessions()
             if expired > 0:
                 print(f"🧹 Limpeza automática: {expired} sessões expiradas removidas")
         except Exception as e:
             print(f"⚠️  Erro na limpeza de sessões: {e}")
 
+def setup_sessions(processes=1):
+    """Escolhe o armazenamento de sessões (devolve o nome dele, ou None se inválido)"""
+    from backend.server import BelleHTTPRequestHandler
+    from backend.session import create_session_manager
+    
+    # Com vários processos as sessões precisam ficar num armazenamento comum
+    backend = os.environ.get('SESSION_BACKEND') or ('sqlite' if processes > 1 else 'memory')
+    try:
+        manager = create_session_manager(
+            backend.lower(),
+            session_timeout=int(os.environ.get('SESSION_TIMEOUT', 3600)),
+            max_sessions=int(os.environ.get('SESSION_MAX', 0)) or None,
+            db_path=os.environ.get('SESSION_DB', 'sessions.db')
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        return None
+    
+    BelleHTTPRequestHandler.session_manager = manager
+    print(f"🔑 Sessões: {backend.lower()}")
+    return backend.lower()
+
+def setup_tokens(session_backend):
+    """Modo token: cookie assinado com HMAC no lugar do session_id (devolve False se inválido)"""
+    from backend.server import BelleHTTPRequestHandler
+    from backend.tokens import TokenSigner, RevocationList, TokenManager, parse_keys
+    
+    mode = os.environ.get('SESSION_MODE', 'session').lower()
+    if mode == 'session':
+        return True
+    if mode != 'token':
+        print(f"❌ SESSION_MODE inválido: {mode} (use session ou token)")
+        return False
+    
+    try:
+        spec = os.environ.get('TOKEN_KEYS')
+        if spec:
+            keys = parse_keys(spec)
+        else:
+            import secrets
+            keys = [('k0', secrets.token_bytes(32))]
+            print("⚠️  TOKEN_KEYS não definido: chave aleatória, tokens não sobrevivem a um reinício")
+        ttl = int(os.environ.get('TOKEN_TTL') or os.environ.get('SESSION_TIMEOUT', 3600))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    
+    # Revogações vão para o mesmo banco das sessões quando ele é compartilhado
+    db_path = os.environ.get('SESSION_DB', 'sessions.db') if session_backend == 'sqlite' else None
+    BelleHTTPRequestHandler.token_manager = TokenManager(TokenSigner(keys, ttl), RevocationList(db_path))
+    print(f"🔏 Tokens assinados: chave {keys[0][0]}, validade {ttl}s, "
+          f"revogação {'sqlite' if db_path else 'local'}")
+    return True
+
+def start_cleanup_thread():
+    """Inicia a limpeza periódica no processo atual (threads não sobrevivem ao fork)"""
+    cleanup_thread = threading.Thread(target=cleanup_sessions, daemon=True)
+    cleanup_thread.start()
+
+def serve(engine, port, workers, backlog, sock=None, reuse_port=False):
+    """Roda o servidor do motor escolhido até ser interrompido"""
+    # Conexões persistentes: segundos ociosos e requisições por conexão
+    keepalive_timeout = float(os.environ.get('KEEPALIVE_TIMEOUT', 5))
+    max_requests = int(os.environ.get('KEEPALIVE_MAX_REQUESTS', 100))
+    
+    if engine == 'async':
+        # No modo async, WORKERS dimensiona o executor de tarefas bloqueantes
+        workers = workers or 8
+    # Uma conexão SQLite por thread que pode acessar o banco ao mesmo tempo
+    from backend.server import BelleHTTPRequestHandler
+    BelleHTTPRequestHandler.db.pool.max_size = int(os.environ.get('DB_POOL_SIZE', 0)) or max(workers, 1)
+    
+    if engine == 'async':
+        from backend.async_server import start_async_server
+        start_async_server(port, workers=workers, backlog=backlog,
+                           sock=sock, reuse_port=reuse_port,
+                           keepalive_timeout=keepalive_timeout, max_requests=max_requests)
+    else:
+        start_server(port, workers=workers, backlog=backlog,
+                     sock=sock, reuse_port=reuse_port,
+                     keepalive_timeout=keepalive_timeout, max_requests=max_requests)
+
 def signal_handler(signum, frame):
     """Manipula sinais do sistema para encerramento gracioso"""
     print("\n🛑 Encerrando servidor...")
@@ -57,8 +350,46 @@ def main():
     if not setup_database():
         sys.exit(1)
     
-    cleanup_thread = threading.Thread(target=cleanup_sessions, daemon=True)
-    cleanup_thread.start()
+    if not setup_password_hashing():
+        sys.exit(1)
+    
+    setup_profile_cache()
+    setup_static_cache()
+    if not setup_catalog():
+        sys.exit(1)
+    if not setup_checkout():
+        sys.exit(1)
+    if not setup_request_limits():
+        sys.exit(1)
+    if not setup_rate_limits():
+        sys.exit(1)
+    if not setup_access_log():
+        sys.exit(1)
+    
+    #definir porta
+    port = int(os.environ.get('PORT', 8000))
+    # classic = BelleHTTPRequestHandler, async = motor asyncio
+    engine = os.environ.get('SERVER_ENGINE', 'classic').lower()
+    # WORKERS=0 mantém o atendimento sequencial original
+    workers = int(os.environ.get('WORKERS', 0))
+    backlog = int(os.environ.get('BACKLOG', 128))
+    # PROCESSES>1 liga o modo pre-fork (um servidor por processo)
+    processes = int(os.environ.get('PROCESSES', 1))
+    reuse_port = os.environ.get('REUSE_PORT', '1') == '1'
+    
+    if engine not in ('classic', 'async'):
+        print(f"❌ SERVER_ENGINE inválido: {engine} (use classic ou async)")
+        sys.exit(1)
+    
+    if not setup_slow_profiler(engine):
+        sys.exit(1)
+    
+    session_backend = setup_sessions(processes)
+    if session_backend is None or not setup_tokens(session_backend):
+        sys.exit(1)
+    
+    if processes <= 1:
+        start_cleanup_thread()
     print("🧹 Sistema de limpeza automática de sessões iniciado")
     
     print("\n📋 Informações do Sistema:")
@@ -73,6 +404,14 @@ def main():
     print("   • POST /api/logout - Logout de usuário")
     print("   • GET /api/profile - Dados do perfil")
     print("   • GET /api/check-auth - Verificar autenticação")
+    print("   • GET /api/server-stats - Estatísticas de conexões")
+    print("   • GET /api/metrics - Métricas (Prometheus)")
+    print("   • GET /api/products - Catálogo paginado (e /api/products/<id>)")
+    print("   • GET /api/search?q= - Busca por relevância")
+    print("   • GET /api/suggest?q= - Sugestões enquanto se digita")
+    print("   • GET/POST /api/cart - Carrinho (lotes de operações)")
+    print("   • POST /api/checkout - Reserva o carrinho e cria o pedido")
+    print("   • GET /api/orders/<id> - Pedido (POST .../confirm e .../cancel)")
     
     print("\n📱 Páginas Disponíveis:")
     print("   • / - Página principal")
@@ -80,14 +419,28 @@ def main():
     print("   • /cadastro.html - Cadastro")
     print("   • /profile.html - Perfil do usuário")
     
-    #definir porta
-    port = int(os.environ.get('PORT', 8000))
-    
-    print(f"\n🚀 Iniciando servidor na porta {port}...")
+    print(f"\n🚀 Iniciando servidor ({engine}) na porta {port}...")
     print("=" * 50)
     
     try:
-        start_server(port)
+        if processes > 1:
+            from backend.prefork import PreforkSupervisor
+            supervisor = PreforkSupervisor(
+                port,
+                processes,
+                serve=lambda sock, reuse: serve(engine, port, workers, backlog, sock, reuse),
+                backlog=backlog,
+                reuse_port=reuse_port,
+                # cada worker limpa as próprias sessões
+                on_worker_start=lambda index: start_cleanup_thread()
+            )
+            mode = "SO_REUSEPORT" if supervisor.reuse_port else "socket herdado"
+            print(f"🔀 Modo pre-fork: {processes} processos ({mode})")
+            if session_backend == 'memory':
+                print("⚠️  Sessões ficam na memória de cada processo")
+            supervisor.run()
+        else:
+            serve(engine, port, workers, backlog)
     except KeyboardInterrupt:
         print("\n🛑 Servidor encerrado pelo usuário")
     except Exception as e:
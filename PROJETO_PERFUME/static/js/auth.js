@@ -53,6 +53,10 @@ class BelleAuth {
 
             if (result.success) {
                 this.showSuccess(result.message);
+                // Carrinho montado antes do login passa para a conta
+                if (typeof carrinhoManager !== 'undefined') {
+                    await carrinhoManager.mesclarAoEntrar();
+                }
                 // Redirecionar para página principal após 1 segundo
                 setTimeout(() => {
                     window.location.href = '/';
@@ -1,6 +1,14 @@
 class CarrinhoManager {
     constructor() {
         this.carrinho = this.carregarCarrinho();
+        // Sincronização com o servidor: alterações viram operações com seq e vão em lote
+        this.dispositivo = this.obterDispositivo();
+        this.seq = parseInt(localStorage.getItem('carrinho_seq') || '0', 10);
+        this.pendentes = JSON.parse(localStorage.getItem('carrinho_pendentes') || '[]');
+        this.logado = null; // null = ainda não sabemos (as operações ficam guardadas)
+        this.intervaloEnvio = 400;
+        this.envioAgendado = null;
+        this.enviando = false;
     }
 
     carregarCarrinho() {
@@ -12,6 +20,179 @@ class CarrinhoManager {
         localStorage.setItem('carrinho', JSON.stringify(this.carrinho));
     }
 
+    obterDispositivo() {
+        let dispositivo = localStorage.getItem('carrinho_dispositivo');
+        if (!dispositivo) {
+            dispositivo = this.gerarId();
+            localStorage.setItem('carrinho_dispositivo', dispositivo);
+        }
+        return dispositivo;
+    }
+
+    gerarId() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+
+    salvarPendentes() {
+        localStorage.setItem('carrinho_seq', String(this.seq));
+        localStorage.setItem('carrinho_pendentes', JSON.stringify(this.pendentes));
+    }
+
+    registrarOperacao(op, id, qty) {
+        if (this.logado === false) {
+            return;
+        }
+        // clear/set/remove definem o estado final: operações pendentes anteriores deixam de importar
+        if (op === 'clear') {
+            this.pendentes = [];
+        } else if (op === 'set' || op === 'remove') {
+            this.pendentes = this.pendentes.filter(pendente => pendente.id !== id);
+        }
+        this.pendentes.push({ seq: ++this.seq, op: op, id: id, qty: qty });
+        this.salvarPendentes();
+        this.agendarEnvio();
+    }
+
+    agendarEnvio() {
+        // vários cliques seguidos viram um único envio
+        clearTimeout(this.envioAgendado);
+        this.envioAgendado = setTimeout(() => this.sincronizar(), this.intervaloEnvio);
+    }
+
+    async sincronizar() {
+        if (this.enviando) {
+            this.agendarEnvio();
+            return;
+        }
+        if (this.pendentes.length === 0 || this.logado === false) {
+            return;
+        }
+        const lote = this.pendentes.slice(0, 100);
+        this.enviando = true;
+        try {
+            const response = await fetch('/api/cart', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ dispositivo: this.dispositivo, ops: lote }),
+                keepalive: true
+            });
+            if (response.status === 401) {
+                this.logado = false;
+                this.pendentes = [];
+                this.salvarPendentes();
+                return;
+            }
+            if (response.status === 400) {
+                // lote recusado por inteiro: reenviar não adiantaria
+                this.pendentes = this.pendentes.filter(pendente => !lote.includes(pendente));
+                this.salvarPendentes();
+                return;
+            }
+            if (response.status === 503) {
+                // servidor ocupado: o mesmo lote (mesmos seq) é reenviado depois do Retry-After
+                const espera = Number(response.headers.get('Retry-After')) || 1;
+                setTimeout(() => this.sincronizar(), espera * 1000);
+                return;
+            }
+            if (!response.ok) {
+                return;
+            }
+            const result = await response.json();
+            this.logado = true;
+            this.pendentes = this.pendentes.filter(pendente => pendente.seq > result.data.ack);
+            this.salvarPendentes();
+            if (this.pendentes.length === 0) {
+                this.adotarCarrinho(result.data.cart);
+            } else {
+                this.agendarEnvio();
+            }
+        } catch (error) {
+            // sem conexão: as operações ficam guardadas para o próximo envio
+        } finally {
+            this.enviando = false;
+        }
+    }
+
+    async carregarDoServidor() {
+        try {
+            const response = await fetch('/api/cart');
+            if (!response.ok) {
+                this.logado = false;
+                this.pendentes = [];
+                this.salvarPendentes();
+                return;
+            }
+            this.logado = true;
+            const result = await response.json();
+            if (this.pendentes.length > 0) {
+                await this.sincronizar();
+            } else {
+                this.adotarCarrinho(result.data.cart);
+            }
+        } catch (error) {
+            // offline: continua com o carrinho local
+        }
+    }
+
+    async mesclarAoEntrar() {
+        // no login o carrinho local entra no do servidor (fica a maior quantidade de cada produto)
+        this.logado = true;
+        clearTimeout(this.envioAgendado);
+        this.pendentes = this.carrinho.map(item => ({
+            seq: ++this.seq, op: 'merge', id: item.id, qty: Math.min(item.quantidade, 99)
+        }));
+        this.salvarPendentes();
+        if (this.pendentes.length > 0) {
+            await this.sincronizar();
+        } else {
+            await this.carregarDoServidor();
+        }
+    }
+
+    adotarCarrinho(cart) {
+        // o servidor é a referência: preços e nomes vêm do catálogo
+        this.carrinho = cart.items.map(item => ({
+            id: item.id,
+            nome: item.nome,
+            descricao: item.descricao,
+            preco: item.preco,
+            quantidade: item.quantidade,
+            imagem: item.imagem
+        }));
+        this.salvarCarrinho();
+        this.atualizarContadorCarrinho();
+        document.dispatchEvent(new CustomEvent('carrinho-atualizado'));
+    }
+
+    async finalizarCompra() {
+        if (this.logado === false) {
+            return { success: false, message: 'Faça login para finalizar a compra' };
+        }
+        clearTimeout(this.envioAgendado);
+        await this.sincronizar();
+        if (this.pendentes.length > 0) {
+            return { success: false, message: 'Não foi possível salvar o carrinho. Tente novamente.' };
+        }
+
+        // a mesma chave é reenviada até uma resposta definitiva: nada de pedido em dobro
+        let chave = sessionStorage.getItem('pedido_chave');
+        if (!chave) {
+            chave = this.gerarId();
+            sessionStorage.setItem('pedido_chave', chave);
+        }
+        const response = await fetch('/api/checkout', {
+            method: 'POST',
+            headers: { 'Idempotency-Key': chave }
+        });
+        if (response.status !== 503) {
+            sessionStorage.removeItem('pedido_chave');
+        }
+        return response.json();
+    }
+
     adicionarProduto(produto) {
         const produtoExistente = this.carrinho.find(item => item.id === produto.id);
         
@@ -23,6 +204,7 @@ class CarrinhoManager {
         
         this.salvarCarrinho();
         this.atualizarContadorCarrinho();
+        this.registrarOperacao('add', produto.id, produto.quantidade);
         return true;
     }
 
@@ -30,6 +212,7 @@ class CarrinhoManager {
         this.carrinho = this.carrinho.filter(item => item.id !== produtoId);
         this.salvarCarrinho();
         this.atualizarContadorCarrinho();
+        this.registrarOperacao('remove', produtoId);
     }
 
     atualizarQuantidade(produtoId, novaQuantidade) {
@@ -38,6 +221,7 @@ class CarrinhoManager {
             produto.quantidade = novaQuantidade;
             this.salvarCarrinho();
             this.atualizarContadorCarrinho();
+            this.registrarOperacao('set', produtoId, novaQuantidade);
             return true;
         }
         return false;
@@ -61,6 +245,7 @@ class CarrinhoManager {
         this.carrinho = [];
         this.salvarCarrinho();
         this.atualizarContadorCarrinho();
+        this.registrarOperacao('clear');
     }
 
     atualizarContadorCarrinho() {
@@ -144,4 +329,12 @@ function mostrarNotificacao(mensagem, tipo = 'sucesso') {
 
 document.addEventListener('DOMContentLoaded', function() {
     carrinhoManager.atualizarContadorCarrinho();
+    carrinhoManager.carregarDoServidor();
+});
+
+// alterações ainda não enviadas saem antes de trocar de página
+window.addEventListener('pagehide', function() {
+    if (carrinhoManager.pendentes.length > 0) {
+        carrinhoManager.sincronizar();
+    }
 });